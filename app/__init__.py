@@ -2,22 +2,45 @@ from flask import Flask
 from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
 
+from app import (assets, compression, db_pool, db_routing,
+                 instrumentation, tenancy)
+from app.services.cache_service import Cache
 from config import Config
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': db_routing.RoutingSession})
 migrate = Migrate()
+cache = Cache()
 
 
 def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = \
+        db_pool.engine_options(app.config)
 
     db.init_app(app)
+    db_pool.init_app(app, db)
+    db_routing.init_app(app)
     migrate.init_app(app, db)
+    cache.init_app(app)
+    tenancy.init_app(app)
+    instrumentation.init_app(app, db)
+    # registered after instrumentation so the time it takes is counted
+    compression.init_app(app)
+    assets.init_app(app)
 
     from app.routes import bp as main_bp
     app.register_blueprint(main_bp)
 
+    from app.api import bp as api_bp
+    app.register_blueprint(api_bp)
+
+    from app.cli import bp as cli_bp
+    app.register_blueprint(cli_bp)
+
+    from app.services import todo_service, write_queue
+    write_queue.init_app(app, before_writes=todo_service.bump_revisions)
+
     return app
 
 
@@ -0,0 +1,235 @@
+from flask import (Blueprint, Response, current_app, jsonify, request,
+                   stream_with_context, url_for)
+
+from app.exceptions.exceptions import (TodoNotFoundException,
+                                       TodoValidationError)
+from app.services import export_service, job_service, todo_service
+
+bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+def todo_to_dict(todo):
+    """
+    Returns the JSON representation of a todo.
+
+    Args:
+        todo (ToDo): The todo item to represent.
+
+    Returns:
+        dict: The id, task and description of the todo.
+    """
+    return {'id': todo.id, 'task': todo.task,
+            'description': todo.description}
+
+
+def job_to_dict(job):
+    """
+    Returns the JSON representation of a job.
+
+    Args:
+        job (Job): The job to represent.
+
+    Returns:
+        dict: The id, name, status, result, error and times of the job.
+    """
+    def isoformat(value):
+        return None if value is None else value.isoformat()
+
+    return {'id': job.id, 'name': job.name, 'status': job.status,
+            'result': job.result, 'error': job.error,
+            'created_at': isoformat(job.created_at),
+            'started_at': isoformat(job.started_at),
+            'finished_at': isoformat(job.finished_at)}
+
+
+def error_response(status, message, **extra):
+    response = jsonify(error=message, **extra)
+    response.status_code = status
+    return response
+
+
+def _json_batch(key):
+    """Reads the list under key from the JSON body, enforcing the limit."""
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict) or \
+            not isinstance(payload.get(key), list):
+        return None, error_response(400, f'Expected a JSON object with a '
+                                    f'"{key}" list.')
+    batch = payload[key]
+    max_batch = current_app.config['API_MAX_BATCH_SIZE']
+    if len(batch) > max_batch:
+        return None, error_response(
+            413, f'Batches are limited to {max_batch} items.')
+    return batch, None
+
+
+def _limit():
+    """Reads the page size from the query string, capped at the limit."""
+    limit = request.args.get('limit', type=int)
+    if limit is None:
+        return None
+    return max(1, min(limit, current_app.config['API_MAX_BATCH_SIZE']))
+
+
+def _page():
+    """Reads the 1-based number of a search page from the query string."""
+    return max(1, request.args.get('page', 1, type=int))
+
+
+def _respond_async():
+    """Tells whether the client prefers the request to run as a job."""
+    return 'respond-async' in request.headers.get('Prefer', '')
+
+
+def _job_accepted(name, *args):
+    """Queues a job and answers 202 with the URL to poll it at."""
+    job_id = job_service.enqueue(name, *args)
+    response = jsonify(job_id=job_id)
+    response.status_code = 202
+    response.headers['Location'] = url_for('api.get_job', job_id=job_id)
+    response.headers['Preference-Applied'] = 'respond-async'
+    return response
+
+
+def _validation_error(e):
+    return error_response(400, e.message, errors=e.errors)
+
+
+def _not_found(e):
+    return error_response(404, e.message, ids=e.todo_id)
+
+
+@bp.route('/todos', methods=['GET'])
+def list_todos():
+    search_query = request.args.get('q')
+    if search_query:
+        page = todo_service.get_filtered_todos(
+            search_query, page=_page(), per_page=_limit())
+        return jsonify(todos=[todo_to_dict(todo) for todo in page.items],
+                       next_page=page.next_page, prev_page=page.prev_page)
+
+    page = todo_service.get_todos_page(
+        after=request.args.get('after', type=int),
+        before=request.args.get('before', type=int),
+        per_page=_limit())
+    return jsonify(todos=[todo_to_dict(todo) for todo in page.items],
+                   next_cursor=page.next_cursor,
+                   prev_cursor=page.prev_cursor)
+
+
+@bp.route('/todos/export', methods=['GET'])
+def export_todos():
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in export_service.EXPORT_FORMATS:
+        return error_response(400, f'Unsupported export format: '
+                              f'{export_format}')
+    chunks = export_service.export_todos(export_format)
+    return Response(
+        stream_with_context(chunks),
+        mimetype=export_service.EXPORT_FORMATS[export_format],
+        headers={'Content-Disposition':
+                 f'attachment; filename=todos.{export_format}'})
+
+
+@bp.route('/todos/<int:todo_id>', methods=['GET'])
+def get_todo(todo_id):
+    todo = todo_service.find_todo(todo_id)
+    if todo is None:
+        return error_response(404, 'Todo item not found', ids=todo_id)
+    return jsonify(todo_to_dict(todo))
+
+
+@bp.route('/todos', methods=['POST'])
+def create_todo():
+    item = request.get_json(silent=True)
+    try:
+        todo_id, = todo_service.bulk_add_todos([item])
+    except TodoValidationError as e:
+        return _validation_error(e)
+    response = jsonify(id=todo_id, task=item['task'],
+                       description=item.get('description'))
+    response.status_code = 201
+    response.headers['Location'] = url_for('api.get_todo', todo_id=todo_id)
+    return response
+
+
+@bp.route('/todos/<int:todo_id>', methods=['PUT'])
+def update_todo(todo_id):
+    item = request.get_json(silent=True)
+    if isinstance(item, dict):
+        item = dict(item, id=todo_id)
+    try:
+        todo_service.bulk_update_todos([item])
+    except TodoValidationError as e:
+        return _validation_error(e)
+    except TodoNotFoundException as e:
+        return _not_found(e)
+    return jsonify(id=todo_id, task=item['task'],
+                   description=item.get('description'))
+
+
+@bp.route('/todos/<int:todo_id>', methods=['DELETE'])
+def delete_todo(todo_id):
+    if not todo_service.bulk_delete_todos([todo_id]):
+        return error_response(404, 'Todo item not found', ids=todo_id)
+    return '', 204
+
+
+@bp.route('/todos/bulk', methods=['POST'])
+def bulk_create_todos():
+    items, error = _json_batch('todos')
+    if error:
+        return error
+    if _respond_async():
+        return _job_accepted('todos.bulk_add', items)
+    try:
+        ids = todo_service.bulk_add_todos(items)
+    except TodoValidationError as e:
+        return _validation_error(e)
+    response = jsonify(ids=ids)
+    response.status_code = 201
+    return response
+
+
+@bp.route('/todos/bulk', methods=['PUT'])
+def bulk_update_todos():
+    items, error = _json_batch('todos')
+    if error:
+        return error
+    if _respond_async():
+        return _job_accepted('todos.bulk_update', items)
+    try:
+        updated = todo_service.bulk_update_todos(items)
+    except TodoValidationError as e:
+        return _validation_error(e)
+    except TodoNotFoundException as e:
+        return _not_found(e)
+    return jsonify(updated=updated)
+
+
+@bp.route('/todos/bulk', methods=['DELETE'])
+def bulk_delete_todos():
+    ids, error = _json_batch('ids')
+    if error:
+        return error
+    if not all(isinstance(todo_id, int) for todo_id in ids):
+        return error_response(400, 'Todo ids must be integers.')
+    if _respond_async():
+        return _job_accepted('todos.bulk_delete', ids)
+    return jsonify(deleted=todo_service.bulk_delete_todos(ids))
+
+
+@bp.route('/jobs/<int:job_id>', methods=['GET'])
+def get_job(job_id):
+    job = job_service.get_job(job_id)
+    if job is None:
+        return error_response(404, 'Job not found', ids=job_id)
+    return jsonify(job_to_dict(job))
+
+
+@bp.route('/stats', methods=['GET'])
+def stats():
+    replicas = current_app.extensions.get('db_replicas')
+    return jsonify(pool=current_app.extensions['pool_stats'].stats(),
+                   cache=current_app.extensions['cache'].stats(),
+                   replicas=replicas.stats() if replicas else {})
@@ -0,0 +1,239 @@
+import asyncio
+from urllib.parse import parse_qsl
+
+from asgiref.sync import ThreadSensitiveContext
+from asgiref.wsgi import WsgiToAsgi
+from werkzeug.datastructures import Headers, MultiDict
+from werkzeug.exceptions import HTTPException
+
+from app import tenancy
+from app.api import todo_to_dict
+from app.services import async_todo_service, event_service
+
+
+def _limit(args, max_batch):
+    limit = args.get('limit', type=int)
+    if limit is None:
+        return None
+    return max(1, min(limit, max_batch))
+
+
+async def list_todos(app, args, owner_id):
+    """The asyncio counterpart of api.list_todos."""
+    per_page = _limit(args, app.config['API_MAX_BATCH_SIZE'])
+    search_query = args.get('q')
+    if search_query:
+        page = await async_todo_service.get_filtered_todos(
+            owner_id, search_query,
+            page=max(1, args.get('page', 1, type=int)),
+            per_page=per_page)
+        return 200, {'todos': [todo_to_dict(todo) for todo in page.items],
+                     'next_page': page.next_page,
+                     'prev_page': page.prev_page}
+
+    page = await async_todo_service.get_todos_page(
+        owner_id, after=args.get('after', type=int),
+        before=args.get('before', type=int), per_page=per_page)
+    return 200, {'todos': [todo_to_dict(todo) for todo in page.items],
+                 'next_cursor': page.next_cursor,
+                 'prev_cursor': page.prev_cursor}
+
+
+async def get_todo(app, args, owner_id, todo_id):
+    """The asyncio counterpart of api.get_todo."""
+    todo = await async_todo_service.find_todo(owner_id, todo_id)
+    if todo is None:
+        return 404, {'error': 'Todo item not found', 'ids': todo_id}
+    return 200, todo_to_dict(todo)
+
+
+def events(app, args, headers, owner_id):
+    """The asyncio counterpart of routes.events."""
+    if not app.config['EVENTS_ENABLED']:
+        return None
+    last_event_id = event_service.parse_event_id(
+        headers.get('Last-Event-ID') or args.get('last_event_id'))
+    return async_todo_service.stream_events(owner_id, last_event_id)
+
+
+# blueprint endpoints answered on the event loop, by their asyncio handlers
+ASYNC_HANDLERS = {
+    'api.list_todos': list_todos,
+    'api.get_todo': get_todo,
+}
+
+# blueprint endpoints streamed from the event loop, by functions returning
+# an async iterator of the chunks, or None to leave the request to Flask
+STREAM_HANDLERS = {
+    'main.events': events,
+}
+
+
+def _args(scope):
+    return MultiDict(parse_qsl(
+        scope.get('query_string', b'').decode('latin-1'),
+        keep_blank_values=True))
+
+
+class AsgiApp:
+    """
+    Serves a Flask app to an ASGI server such as uvicorn.
+
+    Requests to the endpoints of ASYNC_HANDLERS are answered on the event
+    loop through async_todo_service, so a slow database holds no thread
+    and one process serves any number of them concurrently. Every other
+    request runs the Flask app as usual in a thread of its own, and the
+    asyncio handlers skip the Flask request hooks, such as the Server-Timing
+    headers.
+
+    The streams of STREAM_HANDLERS, such as the server-sent events, are
+    also sent from the event loop, so an open stream costs a coroutine
+    rather than a thread.
+
+    Args:
+        flask_app (Flask): The app to serve.
+        handlers (dict): The asyncio handlers by endpoint name.
+        streams (dict): The stream handlers by endpoint name.
+    """
+
+    def __init__(self, flask_app, handlers=None, streams=None):
+        self.flask_app = flask_app
+        self.handlers = ASYNC_HANDLERS if handlers is None else handlers
+        self.streams = STREAM_HANDLERS if streams is None else streams
+        self.wsgi_app = WsgiToAsgi(flask_app)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] == 'http':
+            match = self.match(scope, self.handlers)
+            if match is not None:
+                await self.respond(scope, send, *match)
+                return
+            match = self.match(scope, self.streams)
+            if match is not None and \
+                    await self.stream(scope, receive, send, *match):
+                return
+        # each request gets its own thread rather than sharing asgiref's
+        # single thread for sync code, which would serialize them
+        async with ThreadSensitiveContext():
+            await self.wsgi_app(scope, receive, send)
+
+    def match(self, scope, handlers):
+        """Finds the handler and view arguments of a request."""
+        if scope['method'] not in ('GET', 'HEAD'):
+            return None
+        path = scope['path']
+        root_path = scope.get('root_path', '')
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+        adapter = self.flask_app.url_map.bind(
+            self.flask_app.config.get('SERVER_NAME') or 'localhost')
+        try:
+            endpoint, view_args = adapter.match(path, method='GET')
+        except HTTPException:
+            return None
+        handler = handlers.get(endpoint)
+        if handler is None:
+            return None
+        return handler, view_args
+
+    def owner_id(self, scope):
+        """Reads the owner of a request as tenancy does for Flask."""
+        owner_header = self.flask_app.config['OWNER_HEADER']
+        if not owner_header:
+            return tenancy.DEFAULT_OWNER_ID
+        name = owner_header.lower().encode('latin-1')
+        value = next((value.decode('latin-1')
+                      for key, value in scope['headers'] if key == name),
+                     None)
+        return tenancy.parse_owner_id(value)
+
+    async def respond(self, scope, send, handler, view_args):
+        args = _args(scope)
+        owner_id = self.owner_id(scope)
+        with self.flask_app.app_context():
+            if owner_id is None:
+                status, payload = 400, {
+                    'error': 'Missing or invalid owner header.'}
+            else:
+                status, payload = await handler(self.flask_app, args,
+                                                owner_id, **view_args)
+            # the same JSON as jsonify in the Flask views
+            response = self.flask_app.json.response(payload)
+        response.headers['X-Content-Type-Options'] = 'nosniff'
+
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': [(name.lower().encode('latin-1'),
+                                 value.encode('latin-1'))
+                                for name, value in response.headers]})
+        body = b'' if scope['method'] == 'HEAD' else response.get_data()
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def stream(self, scope, receive, send, handler, view_args):
+        """
+        Sends the chunks of a stream handler as they come, until the stream
+        ends or the client goes away.
+
+        Returns:
+            bool: False if the handler left the request to Flask.
+        """
+        owner_id = self.owner_id(scope)
+        if owner_id is None:
+            # the same 400 as the asyncio handlers, which are not called
+            await self.respond(scope, send, handler, view_args)
+            return True
+        headers = Headers([(name.decode('latin-1'), value.decode('latin-1'))
+                           for name, value in scope['headers']])
+        with self.flask_app.app_context():
+            chunks = handler(self.flask_app, _args(scope), headers,
+                             owner_id, **view_args)
+            if chunks is None:
+                return False
+            await send({'type': 'http.response.start', 'status': 200,
+                        'headers': [
+                            (b'content-type',
+                             b'text/event-stream; charset=utf-8'),
+                            (b'x-content-type-options', b'nosniff')] + [
+                            (name.lower().encode('latin-1'),
+                             value.encode('latin-1'))
+                            for name, value in
+                            event_service.STREAM_HEADERS.items()]})
+            if scope['method'] == 'HEAD':
+                await chunks.aclose()
+                await send({'type': 'http.response.body', 'body': b''})
+                return True
+
+            disconnected = asyncio.Event()
+
+            async def watch():
+                while (await receive())['type'] != 'http.disconnect':
+                    pass
+                disconnected.set()
+
+            watcher = asyncio.ensure_future(watch())
+            try:
+                async for chunk in chunks:
+                    if disconnected.is_set():
+                        break
+                    if chunk:
+                        await send({'type': 'http.response.body',
+                                    'body': chunk.encode('utf-8'),
+                                    'more_body': True})
+                else:
+                    await send({'type': 'http.response.body', 'body': b''})
+            finally:
+                watcher.cancel()
+                await chunks.aclose()
+        return True
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await async_todo_service.dispose_engine(self.flask_app)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
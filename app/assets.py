@@ -0,0 +1,199 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+
+from flask import (Blueprint, current_app, request, send_from_directory,
+                   url_for)
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MANIFEST = 'manifest.json'
+EXTENSIONS = ('.css', '.js')
+# precompressed variants, in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+bp = Blueprint('assets', __name__)
+
+
+def minify_css(css):
+    """
+    Strips the comments and the whitespace that is not needed from a
+    stylesheet, keeping /*! license */ comments.
+
+    Strings are not treated apart, which is enough for the app's own
+    stylesheets. Vendored .min files are left as they are.
+    """
+    css = re.sub(r'/\*(?!!).*?\*/', '', css, flags=re.S)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    css = re.sub(r':\s+', ':', css)
+    return css.replace(';}', '}').strip()
+
+
+def fingerprint(path, data):
+    """Adds a hash of the contents to a file name, before its extension."""
+    stem, extension = posixpath.splitext(path)
+    return f'{stem}.{hashlib.sha256(data).hexdigest()[:12]}{extension}'
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as file:
+        file.write(data)
+
+
+def _remove_build(output_folder):
+    """
+    Removes the files of the previous build of output_folder, those listed
+    in its manifest, and the folders they leave empty. Anything else in
+    the folder is kept.
+    """
+    path = os.path.join(output_folder, MANIFEST)
+    if not os.path.isfile(path):
+        return
+    with open(path, encoding='utf-8') as file:
+        manifest = json.load(file)
+    folders = set()
+    for built in manifest.values():
+        target = safe_join(output_folder, built)
+        if target is None:
+            continue
+        for suffix in ('',) + tuple(suffix for _, suffix in ENCODINGS):
+            if os.path.isfile(target + suffix):
+                os.remove(target + suffix)
+        folders.add(os.path.dirname(target))
+    os.remove(path)
+    # the deepest first, so a parent is empty once its children are gone
+    for folder in sorted(folders, key=len, reverse=True):
+        while folder != output_folder and os.path.isdir(folder) and \
+                not os.listdir(folder):
+            os.rmdir(folder)
+            folder = os.path.dirname(folder)
+
+
+def build(source_folder, output_folder):
+    """
+    Builds the stylesheets and scripts of source_folder into output_folder.
+
+    Each one is minified unless it already is, written under a name with
+    the hash of its contents, so it can be cached forever, next to gzip
+    and, if the brotli package is installed, brotli compressed copies.
+    Only the files of the previous build, listed in its manifest.json, are
+    removed from the output folder first. It and the folders of any other
+    build, holding a manifest.json, are skipped in the source folder.
+
+    Args:
+        source_folder (str): The static folder.
+        output_folder (str): The folder to build into.
+
+    Returns:
+        dict: The manifest, the built file name of each source file by its
+            path relative to source_folder, also written to manifest.json.
+
+    Raises:
+        ValueError: If the output folder is the source folder or holds it.
+    """
+    output_folder = os.path.abspath(output_folder)
+    source = os.path.abspath(source_folder)
+    if os.path.commonpath([output_folder, source]) == output_folder:
+        raise ValueError(f'Cannot build into {output_folder}, '
+                         f'it holds the sources in {source}')
+    _remove_build(output_folder)
+
+    manifest = {}
+    for root, dirs, files in os.walk(source_folder):
+        dirs[:] = sorted(
+            name for name in dirs
+            if os.path.abspath(os.path.join(root, name)) != output_folder and
+            not os.path.isfile(os.path.join(root, name, MANIFEST)))
+        for name in sorted(files):
+            if not name.endswith(EXTENSIONS):
+                continue
+            source = os.path.join(root, name)
+            path = os.path.relpath(source, source_folder) \
+                .replace(os.sep, '/')
+            with open(source, 'rb') as file:
+                data = file.read()
+            if name.endswith('.css') and not name.endswith('.min.css'):
+                data = minify_css(data.decode('utf-8')).encode('utf-8')
+
+            built = fingerprint(path, data)
+            target = os.path.join(output_folder, *built.split('/'))
+            _write(target, data)
+            variants = {'.gz': gzip.compress(data, 9, mtime=0)}
+            if brotli is not None:
+                variants['.br'] = brotli.compress(data)
+            for suffix, compressed in variants.items():
+                if len(compressed) < len(data):
+                    _write(target + suffix, compressed)
+            manifest[path] = built
+
+    _write(os.path.join(output_folder, MANIFEST),
+           json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    return manifest
+
+
+def asset_url(filename):
+    """
+    Returns the URL of a static file, that of its built copy once the
+    assets are built.
+
+    Args:
+        filename (str): The path of the file within the static folder.
+    """
+    built = current_app.extensions['assets'].get(filename)
+    if built is None:
+        return url_for('static', filename=filename)
+    return url_for('assets.asset', filename=built)
+
+
+@bp.route('/assets/<path:filename>')
+def asset(filename):
+    """
+    Serves a built asset, precompressed if the client accepts it, to be
+    cached without revalidation as its name changes with its contents.
+    """
+    folder = current_app.config['ASSETS_FOLDER']
+    mimetype = mimetypes.guess_type(filename)[0]
+    for encoding, suffix in ENCODINGS:
+        path = safe_join(folder, filename + suffix)
+        if request.accept_encodings[encoding] and path is not None and \
+                os.path.isfile(path):
+            response = send_from_directory(folder, filename + suffix,
+                                           mimetype=mimetype,
+                                           max_age=IMMUTABLE_MAX_AGE)
+            response.content_encoding = encoding
+            break
+    else:
+        response = send_from_directory(folder, filename,
+                                       max_age=IMMUTABLE_MAX_AGE)
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def init_app(app):
+    """
+    Serves the assets built by `flask assets build` into ASSETS_FOLDER.
+
+    The manifest is read once, so the app has to be restarted after a
+    build. Without one, templates link the static files as they are.
+    """
+    manifest = {}
+    path = os.path.join(app.config['ASSETS_FOLDER'], MANIFEST)
+    if os.path.isfile(path):
+        with open(path, encoding='utf-8') as file:
+            manifest = json.load(file)
+    app.extensions['assets'] = manifest
+    app.add_template_global(asset_url)
+    app.register_blueprint(bp)
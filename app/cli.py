@@ -0,0 +1,130 @@
+import time
+
+import click
+from flask import Blueprint, current_app
+
+from app import assets, tenancy
+from app.services import (event_service, export_service, import_service,
+                          job_service, todo_service)
+
+bp = Blueprint('cli', __name__, cli_group=None)
+
+
+@bp.cli.group()
+def todos():
+    """Todo data commands."""
+    pass
+
+
+@todos.command()
+@click.option('--format', 'export_format', default='ndjson',
+              type=click.Choice(list(export_service.EXPORT_FORMATS)),
+              help='Format of the exported todos.')
+@click.option('--output', '-o', default='-', type=click.Path(dir_okay=False),
+              help='File to write to, standard output by default.')
+@click.option('--batch-size', default=1000, show_default=True,
+              help='Number of rows fetched from the database at once.')
+@click.option('--owner', 'owner_id', default=tenancy.DEFAULT_OWNER_ID,
+              type=click.IntRange(min=1), show_default=True,
+              help='ID of the owner of the todos.')
+def export(export_format, output, batch_size, owner_id):
+    """Export every todo of an owner as NDJSON or CSV."""
+    with tenancy.as_owner(owner_id):
+        chunks = export_service.export_todos(export_format, batch_size)
+    if output == '-':
+        click.get_text_stream('stdout').writelines(chunks)
+        return
+    # the csv module writes its own line endings
+    with open(output, 'w', encoding='utf-8', newline='') as file:
+        file.writelines(chunks)
+
+
+@todos.command('import')
+@click.argument('file', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'import_format', default=None,
+              type=click.Choice(import_service.IMPORT_FORMATS),
+              help='Format of the file, guessed from its extension by '
+              'default.')
+@click.option('--chunk-size', default=5000, show_default=True,
+              help='Number of todos inserted per transaction.')
+@click.option('--owner', 'owner_id', default=tenancy.DEFAULT_OWNER_ID,
+              type=click.IntRange(min=1), show_default=True,
+              help='ID of the owner of the todos.')
+def import_(file, import_format, chunk_size, owner_id):
+    """Import todos for an owner from an NDJSON or CSV file."""
+    if import_format is None:
+        import_format = 'csv' if file.lower().endswith('.csv') else 'ndjson'
+
+    with open(file, encoding='utf-8', newline='') as records_file:
+        records = import_service.read_records(records_file, import_format)
+        with tenancy.as_owner(owner_id):
+            result = import_service.import_todos(records, chunk_size)
+
+    for line_number, error in result.errors:
+        click.echo(f'line {line_number}: {error}', err=True)
+    if result.failed > len(result.errors):
+        click.echo(f'... and {result.failed - len(result.errors)} more '
+                   'errors', err=True)
+    rate = result.imported / result.elapsed if result.elapsed else 0
+    click.echo(f'Imported {result.imported} todos in {result.elapsed:.2f}s '
+               f'({rate:.0f} rows/s), {result.failed} failed.')
+
+
+@todos.command()
+@click.option('--older-than', default=0.0, show_default=True,
+              type=click.FloatRange(min=0),
+              help='Only purge todos deleted at least this many seconds ago.')
+@click.option('--batch-size', default=1000, show_default=True,
+              type=click.IntRange(min=1),
+              help='Number of todos deleted per transaction.')
+@click.option('--events-older-than', default=3600.0, show_default=True,
+              type=click.FloatRange(min=0),
+              help='Also prune the live update events recorded at least '
+              'this many seconds ago.')
+def purge(older_than, batch_size, events_older_than):
+    """Delete the soft deleted todos and the old events of every owner."""
+    started = time.perf_counter()
+    purged = todo_service.purge_todos(older_than, batch_size)
+    pruned = event_service.prune_events(events_older_than, batch_size)
+    click.echo(f'Purged {purged} deleted todos and {pruned} events in '
+               f'{time.perf_counter() - started:.2f}s.')
+
+
+@bp.cli.group()
+def jobs():
+    """Background job commands."""
+    pass
+
+
+@jobs.command()
+@click.option('--poll-interval', default=None, type=click.FloatRange(min=0),
+              help='Seconds between polls of an empty queue, '
+              'JOBS_POLL_INTERVAL by default.')
+@click.option('--burst', is_flag=True,
+              help='Exit once the queue is empty.')
+def worker(poll_interval, burst):
+    """Run the queued jobs until stopped."""
+    if poll_interval is None:
+        poll_interval = current_app.config['JOBS_POLL_INTERVAL']
+    ran = job_service.work(poll_interval, burst)
+    click.echo(f'Ran {ran} jobs.')
+
+
+@bp.cli.group('assets')
+def assets_cli():
+    """Static asset commands."""
+    pass
+
+
+@assets_cli.command()
+def build():
+    """Minify, fingerprint and precompress the static assets."""
+    output_folder = current_app.config['ASSETS_FOLDER']
+    try:
+        manifest = assets.build(current_app.static_folder, output_folder)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    for path, built in sorted(manifest.items()):
+        click.echo(f'{path} -> {built}')
+    click.echo(f'Built {len(manifest)} assets into {output_folder}, '
+               'restart the app to serve them.')
@@ -0,0 +1,109 @@
+import gzip
+import zlib
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def _encoding():
+    """Picks the encoding of the response, brotli over gzip."""
+    if brotli is not None and request.accept_encodings['br']:
+        return 'br'
+    if request.accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def _compress(data, encoding, level, quality):
+    if encoding == 'br':
+        return brotli.compress(data, quality=quality)
+    return gzip.compress(data, level, mtime=0)
+
+
+def _compress_stream(chunks, encoding, level, quality):
+    """
+    Compresses a streamed body chunk by chunk.
+
+    Each chunk is flushed on its own, so the client gets it as soon as it
+    is generated rather than once the compressor's buffer fills up.
+    """
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=quality)
+        compress, finish = compressor.process, compressor.finish
+        flush = compressor.flush
+    else:
+        # a gzip header and trailer around the deflate stream
+        compressor = zlib.compressobj(level, zlib.DEFLATED,
+                                      16 + zlib.MAX_WBITS)
+        compress, finish = compressor.compress, compressor.flush
+
+        def flush():
+            return compressor.flush(zlib.Z_SYNC_FLUSH)
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            if chunk:
+                yield compress(chunk) + flush()
+        yield finish()
+    finally:
+        # lets stream_with_context and file wrappers clean up
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+def compress_response(response):
+    """
+    Compresses a response with the best encoding the client accepts.
+
+    Only the COMPRESSION_MIMETYPES are compressed. A response whose body is
+    in memory has to be at least COMPRESSION_MIN_SIZE bytes and shrink,
+    while a streamed response is compressed as it is generated. Responses
+    that are already encoded, partial, files sent by send_file or marked
+    no-transform are left alone.
+    """
+    config = current_app.config
+    if response.status_code < 200 or \
+            response.status_code in (204, 206, 304) or \
+            response.mimetype not in config['COMPRESSION_MIMETYPES'] or \
+            'Content-Encoding' in response.headers or \
+            response.direct_passthrough or \
+            response.cache_control.no_transform:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = _encoding()
+    if encoding is None:
+        return response
+    level = config['COMPRESSION_GZIP_LEVEL']
+    quality = config['COMPRESSION_BROTLI_QUALITY']
+
+    if response.is_streamed:
+        response.response = _compress_stream(response.response, encoding,
+                                             level, quality)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < config['COMPRESSION_MIN_SIZE']:
+            return response
+        compressed = _compress(data, encoding, level, quality)
+        if len(compressed) >= len(data):
+            return response
+        response.set_data(compressed)
+
+    response.content_encoding = encoding
+    # the compressed bytes differ, but they still match the same validators
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_app(app):
+    """Compresses the responses when COMPRESSION_ENABLED is set."""
+    if app.config['COMPRESSION_ENABLED']:
+        app.after_request(compress_response)
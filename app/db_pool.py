@@ -0,0 +1,159 @@
+import threading
+
+import sqlalchemy as sa
+
+# async drivers used by the ASGI mode, installed separately
+ASYNC_DRIVERS = {'sqlite': 'sqlite+aiosqlite',
+                 'postgresql': 'postgresql+asyncpg'}
+
+
+def engine_options(config):
+    """
+    Builds the engine options from the DB_POOL_* settings.
+
+    SQLite connections are local files or memory, so they keep SQLAlchemy's
+    default pool and only server databases get the tuned pool. Options set
+    directly in SQLALCHEMY_ENGINE_OPTIONS take precedence.
+
+    Args:
+        config (dict): The application configuration.
+
+    Returns:
+        dict: Keyword arguments for create_engine.
+    """
+    options = config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+    url = sa.engine.make_url(config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() == 'sqlite':
+        return dict(options)
+    return {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+        **options,
+    }
+
+
+def create_async_engine(config):
+    """
+    Creates an asyncio engine for the database of SQLALCHEMY_DATABASE_URI.
+
+    The driver is swapped for its asyncio counterpart, aiosqlite for SQLite
+    and asyncpg for PostgreSQL, which have to be installed, and server
+    databases get the same pool settings as the sync engine. SQLite opens a
+    connection per session, so in-memory databases cannot be shared.
+
+    Args:
+        config (dict): The application configuration.
+
+    Returns:
+        AsyncEngine: The engine.
+
+    Raises:
+        ValueError: If the database has no supported asyncio driver.
+    """
+    # only needed by the ASGI mode, which needs greenlet as well
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    url = sa.engine.make_url(config['SQLALCHEMY_DATABASE_URI'])
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f'No asyncio driver for {backend} databases')
+    url = url.set(drivername=ASYNC_DRIVERS[backend])
+    if backend == 'sqlite':
+        return create_async_engine(url, poolclass=sa.pool.NullPool)
+    return create_async_engine(url, **engine_options(config))
+
+
+def sqlite_pragmas(config):
+    """
+    Builds the PRAGMAs of the SQLite tuning profile from the SQLITE_*
+    settings.
+
+    WAL lets readers carry on while a write commits, and synchronous=NORMAL
+    only syncs the WAL at checkpoints, which is still safe against
+    corruption but may lose the last commits on power loss. busy_timeout
+    makes a writer wait for the file lock instead of failing with
+    "database is locked".
+
+    Args:
+        config (dict): The application configuration.
+
+    Returns:
+        dict: The PRAGMA values by name, empty if the profile is off.
+    """
+    if not config['SQLITE_TUNING']:
+        return {}
+    return {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': config['SQLITE_BUSY_TIMEOUT'],
+        'cache_size': -config['SQLITE_CACHE_SIZE_KB'],
+        'mmap_size': config['SQLITE_MMAP_SIZE'],
+    }
+
+
+def _pragma_setter(pragmas):
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+    return set_pragmas
+
+
+class PoolStats:
+    """
+    Counts connection pool events of an engine for sizing workers.
+
+    Args:
+        engine (Engine): The engine whose pool is watched.
+    """
+
+    EVENTS = ('connect', 'checkout', 'checkin', 'invalidate')
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.counts = dict.fromkeys(self.EVENTS, 0)
+        self._lock = threading.Lock()
+        for event in self.EVENTS:
+            sa.event.listen(engine, event, self._counter(event))
+
+    def _counter(self, event):
+        def count(*args):
+            with self._lock:
+                self.counts[event] += 1
+        return count
+
+    def stats(self):
+        """
+        Returns the current state of the pool and its event counters.
+
+        Returns:
+            dict: The pool class, its size, checked in, checked out and
+                overflow connections where the pool tracks them, and the
+                number of connects, checkouts, checkins and invalidated
+                connections since start up.
+        """
+        pool = self.engine.pool
+        stats = {'pool': type(pool).__name__}
+        for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+            if hasattr(pool, name):
+                stats[name] = getattr(pool, name)()
+        with self._lock:
+            stats.update(self.counts)
+        return stats
+
+
+def init_app(app, db):
+    """
+    Starts counting the pool events of the app's database engine and
+    applies the SQLite tuning profile to each new SQLite connection.
+    """
+    with app.app_context():
+        engine = db.engine
+    app.extensions['pool_stats'] = PoolStats(engine)
+    pragmas = sqlite_pragmas(app.config)
+    if engine.dialect.name == 'sqlite' and pragmas:
+        sa.event.listen(engine, 'connect', _pragma_setter(pragmas))
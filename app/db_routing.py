@@ -0,0 +1,191 @@
+import contextvars
+import functools
+import threading
+import time
+
+import sqlalchemy as sa
+from flask import current_app, has_request_context, session
+from flask_sqlalchemy.session import Session
+
+from app import db_pool
+
+STICKY_SESSION_KEY = '_db_primary_until'
+
+_reading = contextvars.ContextVar('reading_from_replica', default=False)
+
+
+def read_replica(function):
+    """
+    Decorates a read-only service function so its SELECTs may run on a
+    replica. Functions whose results fill the shared cache should not be
+    decorated, as a lagging replica would keep stale data cached.
+    """
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        token = _reading.set(True)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _reading.reset(token)
+    return wrapper
+
+
+def reads_replica():
+    """
+    Tells whether the reads of read_replica functions may go to a replica,
+    that is whether there are replicas and the client has not written
+    recently, see stick_to_primary.
+    """
+    return bool(current_app.extensions.get('db_replicas')) and \
+        not _is_sticky()
+
+
+def _is_sticky():
+    """Tells whether the client wrote recently enough to read its writes."""
+    return has_request_context() and \
+        session.get(STICKY_SESSION_KEY, 0) > time.time()
+
+
+class ReplicaSet:
+    """
+    Hands out the replica engines round robin, skipping unhealthy ones.
+
+    A replica is checked with a SELECT 1 before its first use and then at
+    most every check_interval seconds, and one that fails a check or drops
+    a connection is skipped until the next check.
+
+    Args:
+        engines (list): The replica engines.
+        check_interval (float): Seconds between checks of a replica.
+    """
+
+    def __init__(self, engines, check_interval=10):
+        self.engines = engines
+        self.check_interval = check_interval
+        self._next = 0
+        self._checked = [None] * len(engines)
+        self._healthy = [False] * len(engines)
+        self._lock = threading.Lock()
+        for index, engine in enumerate(engines):
+            sa.event.listen(engine, 'handle_error', self._on_error(index))
+
+    def _on_error(self, index):
+        def on_error(context):
+            # a lost connection or a failure to connect, not a bad query
+            if context.is_disconnect or context.connection is None:
+                self.mark_down(index)
+        return on_error
+
+    def mark_down(self, index):
+        with self._lock:
+            self._healthy[index] = False
+            self._checked[index] = time.monotonic()
+
+    def _check(self, index):
+        try:
+            with self.engines[index].connect() as connection:
+                connection.execute(sa.text('SELECT 1'))
+            healthy = True
+        except sa.exc.DBAPIError:
+            healthy = False
+        with self._lock:
+            self._healthy[index] = healthy
+            self._checked[index] = time.monotonic()
+        return healthy
+
+    def choose(self):
+        """
+        Returns the next healthy replica engine.
+
+        Returns:
+            Engine: The replica, or None if none of them is healthy.
+        """
+        for _ in range(len(self.engines)):
+            with self._lock:
+                index = self._next
+                self._next = (self._next + 1) % len(self.engines)
+                checked = self._checked[index]
+                healthy = self._healthy[index]
+            due = checked is None or \
+                time.monotonic() - checked >= self.check_interval
+            if due:
+                healthy = self._check(index)
+            if healthy:
+                return self.engines[index]
+        return None
+
+    def stats(self):
+        """Returns whether each replica passed its last check."""
+        with self._lock:
+            return {engine.url.render_as_string(): healthy
+                    for engine, healthy in zip(self.engines, self._healthy)}
+
+
+class RoutingSession(Session):
+    """
+    The session of db, sending the reads of read_replica functions to a
+    replica and everything else to the primary database.
+
+    Reads stay on the primary while the session has flushed changes, and
+    for DB_REPLICA_STICKY_SECONDS after the client's last commit of a write
+    so it reads its own writes. The stickiness lasts across requests through
+    the Flask session cookie.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and _reading.get() and not self._flushing and \
+                isinstance(clause, sa.Select) and \
+                not self.info.get('wrote') and not _is_sticky():
+            replicas = self._replicas()
+            engine = replicas.choose() if replicas else None
+            if engine is not None:
+                return engine
+
+        engine = super().get_bind(mapper, clause, bind, **kwargs)
+        if self._flushing or isinstance(clause, sa.sql.dml.UpdateBase):
+            self.info['wrote'] = True
+        return engine
+
+    def _replicas(self):
+        return current_app.extensions.get('db_replicas')
+
+
+def stick_to_primary():
+    """
+    Keeps the reads of the current client on the primary for
+    DB_REPLICA_STICKY_SECONDS, so it reads the write it just committed.
+
+    Writes committed by the request's session call it themselves, writes
+    committed for the request on another thread, such as by the write
+    queue, must call it from the request once they are committed.
+    """
+    if has_request_context():
+        session[STICKY_SESSION_KEY] = \
+            time.time() + current_app.config['DB_REPLICA_STICKY_SECONDS']
+
+
+@sa.event.listens_for(RoutingSession, 'after_commit')
+def _after_commit(db_session):
+    if db_session.info.pop('wrote', False):
+        stick_to_primary()
+
+
+@sa.event.listens_for(RoutingSession, 'after_rollback')
+def _after_rollback(db_session):
+    db_session.info.pop('wrote', None)
+
+
+def init_app(app):
+    """
+    Creates an engine for each of the SQLALCHEMY_REPLICA_URIS, with the
+    same pool settings as the primary. They are kept out of
+    SQLALCHEMY_BINDS, which would also create and migrate tables on them.
+    """
+    engines = []
+    for uri in app.config['SQLALCHEMY_REPLICA_URIS']:
+        config = {**app.config, 'SQLALCHEMY_DATABASE_URI': uri}
+        engines.append(sa.create_engine(uri,
+                                        **db_pool.engine_options(config)))
+    if engines:
+        app.extensions['db_replicas'] = ReplicaSet(
+            engines, app.config['DB_REPLICA_CHECK_INTERVAL'])
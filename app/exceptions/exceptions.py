@@ -8,3 +8,15 @@ class TodoNotFoundException(Exception):
 
     def __str__(self):
         return f'{self.message}: ID {self.todo_id}'
+
+
+class TodoValidationError(ValueError):
+    """Exception raised when todos in a batch fail validation."""
+
+    def __init__(self, errors, message="Invalid todos in batch"):
+        self.errors = errors
+        self.message = message
+        super().__init__(self.message)
+
+    def __str__(self):
+        return f'{self.message}: {len(self.errors)} errors'
@@ -0,0 +1,282 @@
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+import sqlalchemy as sa
+from flask import (Response, before_render_template, current_app, g,
+                   has_request_context, request, template_rendered)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                    5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 25, 50, 100)
+PHASES = ('sql', 'service', 'render')
+
+
+class RequestTimings:
+    """
+    The queries and the time spent in each phase of the current request.
+
+    Service calls and renders may nest, only the outermost call of each is
+    timed so nested calls are not counted twice.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.seconds = dict.fromkeys(PHASES, 0.0)
+        self._depth = dict.fromkeys(PHASES, 0)
+        self._entered = dict.fromkeys(PHASES, 0.0)
+
+    def enter(self, phase):
+        if self._depth[phase] == 0:
+            self._entered[phase] = time.perf_counter()
+        self._depth[phase] += 1
+
+    def exit(self, phase):
+        self._depth[phase] -= 1
+        if self._depth[phase] == 0:
+            self.seconds[phase] += time.perf_counter() - self._entered[phase]
+
+    def server_timing(self, total):
+        """Formats the timings as the value of a Server-Timing header."""
+        return ', '.join([
+            f'db;desc="{self.queries} queries";'
+            f"dur={self.seconds['sql'] * 1000:.2f}",
+            f"service;dur={self.seconds['service'] * 1000:.2f}",
+            f"render;dur={self.seconds['render'] * 1000:.2f}",
+            f'total;dur={total * 1000:.2f}',
+        ])
+
+
+def current_timings():
+    """
+    Returns the timings of the current request.
+
+    Returns:
+        RequestTimings: The timings, or None outside of a request or when
+            instrumentation is off.
+    """
+    if not has_request_context():
+        return None
+    return g.get('request_timings')
+
+
+@contextmanager
+def timed(phase):
+    """Times a block as part of a phase of the current request."""
+    timings = current_timings()
+    if timings is None:
+        yield
+        return
+    timings.enter(phase)
+    try:
+        yield
+    finally:
+        timings.exit(phase)
+
+
+def service_call(function):
+    """Decorates a service function so its calls are timed."""
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        timings = current_timings()
+        if timings is None:
+            return function(*args, **kwargs)
+        timings.enter('service')
+        try:
+            return function(*args, **kwargs)
+        finally:
+            timings.exit('service')
+    return wrapper
+
+
+class Histogram:
+    """A Prometheus histogram of one label set, without its own lock."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+    def lines(self, name, labels):
+        for bound, count in zip(self.buckets, self.counts):
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {count}'
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {self.count}'
+        yield f'{name}_sum{{{labels}}} {self.sum}'
+        yield f'{name}_count{{{labels}}} {self.count}'
+
+
+class Metrics:
+    """
+    Aggregates the request timings of this process by endpoint.
+
+    Every worker process keeps its own metrics, so each one has to be
+    scraped, as with the pool stats.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {}
+        self.durations = {}
+        self.queries = {}
+        self.phase_seconds = {}
+
+    def record(self, endpoint, method, status, timings, total):
+        with self._lock:
+            key = (endpoint, method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            if endpoint not in self.durations:
+                self.durations[endpoint] = Histogram(DURATION_BUCKETS)
+                self.queries[endpoint] = Histogram(QUERY_BUCKETS)
+                self.phase_seconds[endpoint] = dict.fromkeys(PHASES, 0.0)
+            self.durations[endpoint].observe(total)
+            self.queries[endpoint].observe(timings.queries)
+            for phase, seconds in timings.seconds.items():
+                self.phase_seconds[endpoint][phase] += seconds
+
+    def render(self, extra=None):
+        """
+        Renders the metrics in the Prometheus text exposition format.
+
+        Args:
+            extra (dict): Further counters by name, with their help text and
+                value, such as the cache and pool counters.
+
+        Returns:
+            str: The metrics document.
+        """
+        lines = []
+        with self._lock:
+            lines += ['# HELP todo_requests_total Requests served.',
+                      '# TYPE todo_requests_total counter']
+            for (endpoint, method, status), count in \
+                    sorted(self.requests.items()):
+                lines.append(f'todo_requests_total{{endpoint="{endpoint}",'
+                             f'method="{method}",status="{status}"}} {count}')
+
+            lines += ['# HELP todo_request_duration_seconds Time taken by '
+                      'requests.',
+                      '# TYPE todo_request_duration_seconds histogram']
+            for endpoint, histogram in sorted(self.durations.items()):
+                lines += histogram.lines('todo_request_duration_seconds',
+                                         f'endpoint="{endpoint}"')
+
+            lines += ['# HELP todo_request_queries SQL statements executed '
+                      'per request.',
+                      '# TYPE todo_request_queries histogram']
+            for endpoint, histogram in sorted(self.queries.items()):
+                lines += histogram.lines('todo_request_queries',
+                                         f'endpoint="{endpoint}"')
+
+            lines += ['# HELP todo_request_phase_seconds_total Time spent '
+                      'in SQL, service calls and template rendering.',
+                      '# TYPE todo_request_phase_seconds_total counter']
+            for endpoint, phases in sorted(self.phase_seconds.items()):
+                for phase, seconds in phases.items():
+                    lines.append(
+                        f'todo_request_phase_seconds_total{{endpoint='
+                        f'"{endpoint}",phase="{phase}"}} {seconds}')
+
+        for name, (help_text, value) in (extra or {}).items():
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter',
+                      f'{name} {value}']
+        return '\n'.join(lines) + '\n'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context,
+                           executemany):
+    if current_timings() is not None:
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    timings = current_timings()
+    started = conn.info.get('query_started')
+    if timings is None or not started:
+        return
+    timings.queries += 1
+    timings.seconds['sql'] += time.perf_counter() - started.pop()
+
+
+def _query_failed(context):
+    started = context.connection.info.get('query_started') \
+        if context.connection is not None else None
+    if started:
+        started.pop()
+
+
+def _before_render(sender, template, context, **extra):
+    timings = current_timings()
+    if timings is not None:
+        timings.enter('render')
+
+
+def _rendered(sender, template, context, **extra):
+    timings = current_timings()
+    if timings is not None:
+        timings.exit('render')
+
+
+def _start_request():
+    g.request_timings = RequestTimings()
+
+
+def _finish_request(response):
+    timings = current_timings()
+    if timings is None:
+        return response
+    total = time.perf_counter() - timings.started
+    response.headers['Server-Timing'] = timings.server_timing(total)
+    endpoint = request.url_rule.endpoint if request.url_rule else 'unmatched'
+    current_app.extensions['metrics'].record(
+        endpoint, request.method, response.status_code, timings, total)
+    return response
+
+
+def metrics():
+    extra = {}
+    cache_stats = current_app.extensions['cache'].stats()
+    extra['todo_cache_hits_total'] = ('Cache lookups that hit.',
+                                      cache_stats['hits'])
+    extra['todo_cache_misses_total'] = ('Cache lookups that missed.',
+                                        cache_stats['misses'])
+    pool_stats = current_app.extensions['pool_stats'].stats()
+    for event in ('connect', 'checkout', 'invalidate'):
+        extra[f'todo_db_pool_{event}_total'] = (
+            f'Connection pool {event} events.', pool_stats[event])
+    return Response(current_app.extensions['metrics'].render(extra),
+                    mimetype='text/plain; version=0.0.4')
+
+
+def init_app(app, db):
+    """
+    Turns on request instrumentation when INSTRUMENTATION_ENABLED is set.
+
+    Each response then gets a Server-Timing header with the number of SQL
+    statements and the time spent in SQL, service calls and rendering, and
+    the totals by endpoint are served at /metrics for Prometheus.
+    """
+    if not app.config['INSTRUMENTATION_ENABLED']:
+        return
+    app.extensions['metrics'] = Metrics()
+    with app.app_context():
+        sa.event.listen(db.engine, 'before_cursor_execute',
+                        _before_cursor_execute)
+        sa.event.listen(db.engine, 'after_cursor_execute',
+                        _after_cursor_execute)
+        sa.event.listen(db.engine, 'handle_error', _query_failed)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_rendered, app)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.add_url_rule('/metrics', 'metrics', metrics)
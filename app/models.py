@@ -1,7 +1,23 @@
+from datetime import datetime, timezone
+
 import sqlalchemy as sa
 from sqlalchemy.orm import Mapped, mapped_column, validates
 
 from app import db
+from app.tenancy import DEFAULT_OWNER_ID
+
+TASK_MAX_LENGTH = 32
+DESCRIPTION_MAX_LENGTH = 256
+
+
+def _check_length(name, value, max_length):
+    if value and len(value) > max_length:
+        raise ValueError(f"{name} exceeds maximum length of {max_length} characters")  # noqa
+
+
+def utcnow():
+    """Returns the current UTC time as the naive datetime the columns store."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
 
 
 class ToDo(db.Model):
@@ -10,21 +26,46 @@ class ToDo(db.Model):
 
     Attributes:
         id (int): The unique identifier of the to-do item.
+        owner_id (int): The ID of the team or user the to-do item belongs
+            to, see tenancy.
         task (str): The task description of the to-do item.
         description (str): The optional description of the to-do item.
+        updated_at (datetime): When the to-do item was last added or
+            changed, in UTC.
+        deleted_at (datetime): When the to-do item was soft deleted, in UTC,
+            or None while it is live. Tombstones are hidden from every query
+            until `flask todos purge` deletes them.
 
     Methods:
         validate_description: Validates the length of the description attribute.
         validate_task: Validates the length of the task attribute.
+        check_fields: Validates a task and description outside of a model.
         __repr__: Returns a string representation of the to-do item.
     """
 
     __tablename__ = 'to_do'
+    # every query is scoped by owner, this keeps a listing within the rows
+    # of that owner, as the search indexes below do for a search. Listings
+    # only index the live rows, and the purge only the tombstones.
+    __table_args__ = (
+        sa.Index('ix_to_do_owner_id_id_live', 'owner_id', 'id',
+                 sqlite_where=sa.text('deleted_at IS NULL'),
+                 postgresql_where=sa.text('deleted_at IS NULL')),
+        sa.Index('ix_to_do_deleted_at', 'deleted_at',
+                 sqlite_where=sa.text('deleted_at IS NOT NULL'),
+                 postgresql_where=sa.text('deleted_at IS NOT NULL')),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
+    owner_id: Mapped[int] = mapped_column(
+        nullable=False, server_default=sa.text(str(DEFAULT_OWNER_ID)))
     task: Mapped[str] = mapped_column(
-        sa.VARCHAR(32), index=True, nullable=False)
-    description: Mapped[str] = mapped_column(sa.VARCHAR(256), nullable=True)
+        sa.VARCHAR(TASK_MAX_LENGTH), nullable=False)
+    description: Mapped[str] = mapped_column(
+        sa.VARCHAR(DESCRIPTION_MAX_LENGTH), nullable=True)
+    updated_at: Mapped[datetime] = mapped_column(
+        default=utcnow, onupdate=utcnow, nullable=True)
+    deleted_at: Mapped[datetime] = mapped_column(nullable=True)
 
     @validates('description')
     def validate_description(self, key, description):
@@ -41,9 +82,7 @@ class ToDo(db.Model):
         Returns:
             str: The validated description.
         """
-        max_length = 256
-        if description and len(description) > max_length:
-            raise ValueError(f"Description exceeds maximum length of {max_length} characters")  # noqa
+        _check_length('Description', description, DESCRIPTION_MAX_LENGTH)
         return description
 
     @validates('task')
@@ -61,11 +100,32 @@ class ToDo(db.Model):
         Returns:
             str: The validated task.
         """
-        max_length = 32
-        if task and len(task) > max_length:
-            raise ValueError(f"Task exceeds maximum length of {max_length} characters")  # noqa
+        _check_length('Task', task, TASK_MAX_LENGTH)
         return task
 
+    @staticmethod
+    def check_fields(task, description):
+        """
+        Validates a task and description that bypass the attribute
+        validators, such as values written by bulk statements.
+
+        Args:
+            task (str): The value of the task attribute.
+            description (str): The value of the description attribute.
+
+        Raises:
+            ValueError: If the task is empty, either value is not a string
+                or exceeds its maximum length.
+        """
+        if not task:
+            raise ValueError('Task cannot be empty.')
+        if not isinstance(task, str):
+            raise ValueError('Task must be a string.')
+        if description is not None and not isinstance(description, str):
+            raise ValueError('Description must be a string.')
+        _check_length('Task', task, TASK_MAX_LENGTH)
+        _check_length('Description', description, DESCRIPTION_MAX_LENGTH)
+
     def __repr__(self):
         """
         Returns a string representation of the to-do item.
@@ -74,3 +134,148 @@ class ToDo(db.Model):
             str: The string representation of the to-do item.
         """
         return f'<ToDo {self.task}>'
+
+
+class Revision(db.Model):
+    """
+    A counter bumped in the same transaction as every write to a table.
+
+    Together with the time of the last bump it versions the whole table, or
+    the rows of one owner, so listings can be validated without reading any
+    of its rows.
+
+    Attributes:
+        name (str): The name of the versioned table, followed by the owner
+            ID for the to_do revisions.
+        value (int): The number of writes made to the table.
+        updated_at (datetime): When the table was last written, in UTC.
+    """
+
+    __tablename__ = 'revision'
+
+    name: Mapped[str] = mapped_column(sa.VARCHAR(64), primary_key=True)
+    value: Mapped[int] = mapped_column(nullable=False, default=0)
+    updated_at: Mapped[datetime] = mapped_column(
+        nullable=False, default=utcnow)
+
+    def __repr__(self):
+        return f'<Revision {self.name} {self.value}>'
+
+
+class TodoEvent(db.Model):
+    """
+    A change to the todos of an owner, streamed to the clients of the owner
+    as a server-sent event, see event_service.
+
+    Attributes:
+        id (int): The unique identifier of the event, also its SSE ID.
+        owner_id (int): The owner of the todo that changed.
+        kind (str): One of added, updated, deleted, or reset when too many
+            todos changed to list them.
+        todo_id (int): The todo that changed, None for a reset.
+        created_at (datetime): When the change was made, in UTC.
+    """
+
+    __tablename__ = 'todo_event'
+    # every client reads the events of its owner after the last it got
+    __table_args__ = (
+        sa.Index('ix_todo_event_owner_id_id', 'owner_id', 'id'),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    owner_id: Mapped[int] = mapped_column(nullable=False)
+    kind: Mapped[str] = mapped_column(sa.VARCHAR(16), nullable=False)
+    todo_id: Mapped[int] = mapped_column(nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        nullable=False, default=utcnow)
+
+    def __repr__(self):
+        return f'<TodoEvent {self.id} {self.kind} {self.todo_id}>'
+
+
+class Job(db.Model):
+    """
+    A call of a slow service function queued for a worker process, see
+    job_service.
+
+    Attributes:
+        id (int): The unique identifier of the job.
+        owner_id (int): The owner the job works for, and who may poll it.
+        name (str): The name of the function to call, a key of
+            job_service.JOBS.
+        args (list): The JSON arguments of the call.
+        status (str): One of queued, running, done and failed.
+        result: The JSON result of the call once done.
+        error (str): The error of the call once failed.
+        created_at (datetime): When the job was queued, in UTC.
+        started_at (datetime): When a worker took the job, in UTC.
+        finished_at (datetime): When the job was done or failed, in UTC.
+    """
+
+    __tablename__ = 'job'
+    # workers take the oldest queued job first
+    __table_args__ = (
+        sa.Index('ix_job_status_id', 'status', 'id'),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    owner_id: Mapped[int] = mapped_column(nullable=False)
+    name: Mapped[str] = mapped_column(sa.VARCHAR(64), nullable=False)
+    args: Mapped[list] = mapped_column(sa.JSON, nullable=False)
+    status: Mapped[str] = mapped_column(sa.VARCHAR(16), nullable=False)
+    result: Mapped[object] = mapped_column(sa.JSON, nullable=True)
+    error: Mapped[str] = mapped_column(sa.Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        nullable=False, default=utcnow)
+    started_at: Mapped[datetime] = mapped_column(nullable=True)
+    finished_at: Mapped[datetime] = mapped_column(nullable=True)
+
+    def __repr__(self):
+        return f'<Job {self.id} {self.name} {self.status}>'
+
+
+# Full-text search indexes over task and description, keyed by owner so a
+# search only walks the entries of the owner's todos. These are created by
+# the migrations, the listeners below mirror them for db.create_all().
+FTS_TABLE = 'to_do_fts'
+
+SQLITE_SEARCH_DDL = [
+    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+    "task, description, owner_id, content='to_do', content_rowid='id')",
+    f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON to_do BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, task, description, owner_id) "
+    "VALUES (new.id, new.task, new.description, new.owner_id); END",
+    f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON to_do BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, task, description, "
+    "owner_id) "
+    "VALUES ('delete', old.id, old.task, old.description, old.owner_id); "
+    "END",
+    f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF task, description, "
+    "owner_id ON to_do BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, task, description, "
+    "owner_id) "
+    "VALUES ('delete', old.id, old.task, old.description, old.owner_id); "
+    f"INSERT INTO {FTS_TABLE}(rowid, task, description, owner_id) "
+    "VALUES (new.id, new.task, new.description, new.owner_id); END",
+]
+
+POSTGRESQL_SEARCH_DDL = [
+    "ALTER TABLE to_do ADD COLUMN search_vector tsvector GENERATED ALWAYS AS "
+    "(setweight(to_tsvector('simple', coalesce(task, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'B')) "
+    "STORED",
+    # btree_gin lets the owner ID be a key of the GIN index
+    "CREATE EXTENSION IF NOT EXISTS btree_gin",
+    "CREATE INDEX ix_to_do_owner_id_search_vector ON to_do "
+    "USING GIN (owner_id, search_vector)",
+]
+
+for statement in SQLITE_SEARCH_DDL:
+    sa.event.listen(ToDo.__table__, 'after_create',
+                    sa.DDL(statement).execute_if(dialect='sqlite'))
+sa.event.listen(ToDo.__table__, 'before_drop',
+                sa.DDL(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+                .execute_if(dialect='sqlite'))
+for statement in POSTGRESQL_SEARCH_DDL:
+    sa.event.listen(ToDo.__table__, 'after_create',
+                    sa.DDL(statement).execute_if(dialect='postgresql'))
@@ -1,23 +1,139 @@
-from flask import Blueprint, redirect, render_template, request, url_for
+import hashlib
+import time
+from datetime import datetime, timezone
 
+from flask import (Blueprint, Response, abort, current_app,
+                   get_flashed_messages, make_response, redirect,
+                   render_template, request, session, stream_with_context,
+                   url_for)
+from werkzeug.http import is_resource_modified
+
+from app import tenancy
 from app.forms import SearchForm, ToDoForm
-from app.services import todo_service
+from app.services import event_service, fragment_service, todo_service
 
 bp = Blueprint('main', __name__)
 
 
+def _listing_validators(revision, updated_at):
+    """
+    Builds the ETag and Last-Modified of the listing without loading it.
+
+    Besides the owner, the revision of its todos and the query string, the
+    page embeds
+    the CSRF token of the search form, which is tied to the session and
+    expires. The ETag covers the session's token and the half of the token
+    lifetime it was rendered in, so a revalidated page never carries a
+    token that is stale or belongs to another session.
+    """
+    last_modified = updated_at.replace(tzinfo=timezone.utc)
+    parts = [str(tenancy.current_owner_id()), str(revision),
+             request.full_path]
+
+    if current_app.config.get('WTF_CSRF_ENABLED', True):
+        field_name = current_app.config.get('WTF_CSRF_FIELD_NAME',
+                                            'csrf_token')
+        parts.append(session.get(field_name, ''))
+        time_limit = current_app.config.get('WTF_CSRF_TIME_LIMIT', 3600)
+        if time_limit:
+            period = time_limit // 2
+            bucket = int(time.time()) // period * period
+            parts.append(str(bucket))
+            last_modified = max(last_modified, datetime.fromtimestamp(
+                bucket, timezone.utc))
+
+    etag = hashlib.sha1(':'.join(parts).encode()).hexdigest()
+    return etag, last_modified
+
+
 @bp.route('/', methods=['GET', 'POST'])
 @bp.route('/index', methods=['GET', 'POST'])
 def index():
+    # a GET whose copy is current is answered before the listing is loaded
+    # or rendered, pages showing flashed messages are never revalidated, nor
+    # pages read from a replica, which may be older than the revision
+    validators = last_event_id = revision = None
+    if request.method == 'GET':
+        # read before the listing, so the page reflects every event up to
+        # the last one and its live updates start from there
+        revision, updated_at, last_event_id = \
+            todo_service.get_revision_state()
+        if not current_app.config['EVENTS_ENABLED']:
+            last_event_id = None
+    if request.method == 'GET' and '_flashes' not in session and \
+            not todo_service.listing_reads_replica(request.args.get('q')):
+        validators = _listing_validators(revision, updated_at)
+        etag, last_modified = validators
+        if not is_resource_modified(request.environ, etag=etag,
+                                    last_modified=last_modified):
+            response = make_response('', 304)
+            _set_validators(response, *validators)
+            return response
+
     form = SearchForm()
-    todos = todo_service.get_all_todos()
+    page = search_page = None
 
+    # settle on the final filter first so only one listing query runs
+    search_query = request.args.get('q')
     if form.validate_on_submit():
         search_query = form.search.data
-        if search_query:
-            todos = todo_service.get_filtered_todos(search_query)
 
-    return render_template('index.html', title='To Do', todos=todos, form=form)
+    if search_query:
+        form.search.data = search_query
+        search_page = todo_service.get_filtered_todos(
+            search_query,
+            page=max(1, request.args.get('page', 1, type=int)))
+        todos = search_page.items
+    else:
+        page = todo_service.get_todos_page(
+            after=request.args.get('after', type=int),
+            before=request.args.get('before', type=int),
+            revision=revision)
+        todos = page.items
+
+    response = make_response(render_template(
+        'index.html', title='To Do',
+        todo_rows=fragment_service.render_todo_rows(todos), page=page,
+        search_page=search_page, search_query=search_query, form=form,
+        last_event_id=last_event_id))
+    # the listing may have flashed an error, which must not be revalidated
+    if validators is not None and not get_flashed_messages():
+        _set_validators(response, *validators)
+    return response
+
+
+def _set_validators(response, etag, last_modified):
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+
+
+@bp.route('/events')
+def events():
+    """
+    Streams the changes to the owner's todos as server-sent events, from
+    the Last-Event-ID the client reconnects with, else the last_event_id
+    of the page it was loaded by.
+    """
+    if not current_app.config['EVENTS_ENABLED']:
+        abort(404)
+    last_event_id = event_service.parse_event_id(
+        request.headers.get('Last-Event-ID') or
+        request.args.get('last_event_id'))
+    return Response(
+        stream_with_context(event_service.stream_events(
+            tenancy.current_owner_id(), last_event_id)),
+        mimetype='text/event-stream', headers=event_service.STREAM_HEADERS)
+
+
+@bp.route('/todos/<int:todo_id>/row')
+def todo_row(todo_id):
+    """Renders the listing row of a todo, for the live updates."""
+    todo = todo_service.find_todo(todo_id)
+    if todo is None:
+        abort(404)
+    return fragment_service.render_todo_rows([todo])
 
 
 @bp.route('/add', methods=['GET', 'POST'])
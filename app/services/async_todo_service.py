@@ -0,0 +1,179 @@
+import asyncio
+import time
+
+from flask import current_app
+
+from app import cache, db_pool
+from app.models import ToDo
+from app.services import event_service, todo_service
+
+logger = todo_service.logger
+
+
+def _session():
+    """
+    Opens an AsyncSession on the app's asyncio engine.
+
+    The engine is created on first use, so the asyncio drivers are only
+    needed when this module is used, and lives in the event loop of the
+    ASGI server until dispose_engine is awaited.
+    """
+    # imported here for the same reason as the engine
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+    engine = current_app.extensions.get('async_engine')
+    if engine is None:
+        engine = db_pool.create_async_engine(current_app.config)
+        current_app.extensions['async_engine'] = engine
+    return AsyncSession(engine, expire_on_commit=False)
+
+
+async def dispose_engine(app):
+    """Closes the connections of the app's asyncio engine, if it has one."""
+    engine = app.extensions.pop('async_engine', None)
+    if engine is not None:
+        await engine.dispose()
+
+
+async def _call_cache(name, *args):
+    """
+    Calls a method of the todo cache, on a thread of the loop's default
+    executor when the backend is shared, as a Redis client blocks on the
+    network. The memory backend is called in place.
+    """
+    backend = cache.todos
+    method = getattr(backend, name)
+    if not backend.shared:
+        return method(*args)
+    # asyncio.to_thread needs Python 3.9
+    return await asyncio.get_running_loop().run_in_executor(
+        None, method, *args)
+
+
+async def _cache_revision(session, owner_id):
+    """Reads the revision of the cache keys, see todo_service."""
+    return await session.scalar(
+        todo_service.revision_statement(owner_id)) or 0
+
+
+async def find_todo(owner_id, todo_id):
+    """
+    Looks up a todo of an owner through the same read-through cache as
+    todo_service.find_todo, without blocking the event loop on the database.
+
+    Args:
+        owner_id (int): The owner of the todo item.
+        todo_id (int): The ID of the todo item to look up.
+
+    Returns:
+        ToDo: The todo item, detached from any session, or None if the owner
+            has none.
+    """
+    async with _session() as session:
+        key = row = None
+        if cache.caches_todos:
+            key = todo_service.TODO_CACHE_KEY.format(
+                owner_id, await _cache_revision(session, owner_id), todo_id)
+            row = await _call_cache('get', key)
+        if row is not None:
+            todo = todo_service.todo_from_row(row, owner_id)
+        else:
+            todo = await session.get(ToDo, todo_id)
+            if todo is not None and (todo.owner_id != owner_id or
+                                     todo.deleted_at is not None):
+                todo = None
+            if todo is not None and key is not None:
+                await _call_cache('set', key, todo_service.cache_row(todo))
+    logger.info('Getting to_do: id=%s', todo_id)
+    return todo
+
+
+async def get_todos_page(owner_id, after=None, before=None, per_page=None):
+    """
+    Retrieves one keyset page of an owner's todos, see
+    todo_service.get_todos_page.
+
+    Pages are cached under the same keys as the sync service, so both
+    serve the same entries.
+
+    Returns:
+        TodoPage: The todos on the page with the cursors of the next and
+            previous pages.
+    """
+    per_page = per_page or current_app.config['TODOS_PER_PAGE']
+    async with _session() as session:
+        key = entry = None
+        if cache.caches_todos:
+            key = todo_service.page_cache_key(
+                owner_id, await _cache_revision(session, owner_id), after,
+                before, per_page)
+            entry = await _call_cache('get', key)
+        if entry is None:
+            rows = (await session.execute(todo_service.page_statement(
+                owner_id, after, before, per_page))).all()
+            entry = todo_service.page_entry(rows, after, before, per_page)
+            if key is not None:
+                await _call_cache('set', key, entry)
+
+    page = todo_service.page_from_entry(entry)
+    logger.info('Getting page of to_do after=%s before=%s: %d items',
+                after, before, len(page.items))
+    return page
+
+
+async def get_filtered_todos(owner_id, search_query, page=1, per_page=None):
+    """
+    Retrieves a page of an owner's todos matching the search query, best
+    match first, see todo_service.get_filtered_todos.
+
+    Returns:
+        SearchPage: The matching todos on the page with the numbers of the
+            next and previous pages.
+    """
+    per_page = per_page or current_app.config['TODOS_PER_PAGE']
+    rows = []
+    async with _session() as session:
+        statement = todo_service.search_page_statement(
+            owner_id, search_query, page, per_page,
+            session.bind.dialect.name)
+        if statement is not None:
+            rows = (await session.execute(statement)).all()
+
+    result = todo_service.search_page_from_rows(rows, page, per_page)
+    logger.info('Getting filtered to_do: %d items', len(result.items))
+    return result
+
+
+async def stream_events(owner_id, last_event_id=None):
+    """
+    Streams the changes to the todos of an owner as server-sent events, see
+    event_service.stream_events, waiting on the event loop between polls
+    rather than in a thread.
+
+    Yields:
+        str: Chunks of the stream, empty after a poll that found nothing,
+            so the server can check whether the client is still there.
+    """
+    config = current_app.config
+    started = last_sent = time.monotonic()
+    async with _session() as session:
+        resume = (await session.execute(event_service.resume_statement(
+            owner_id, last_event_id or 0))).one()
+    after_id, preamble = event_service.open_stream(last_event_id, *resume)
+    yield preamble
+
+    while time.monotonic() - started < config['EVENTS_MAX_DURATION']:
+        async with _session() as session:
+            rows = (await session.execute(
+                event_service.events_statement(owner_id, after_id))).all()
+        if rows:
+            after_id = rows[-1].id
+            last_sent = time.monotonic()
+            yield ''.join(event_service.format_event(*row) for row in rows)
+            continue
+        if time.monotonic() - last_sent >= config['EVENTS_HEARTBEAT']:
+            last_sent = time.monotonic()
+            yield event_service.HEARTBEAT
+        else:
+            yield ''
+        await asyncio.sleep(config['EVENTS_POLL_INTERVAL'])
@@ -0,0 +1,276 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+
+class BaseCache:
+    """
+    Base class of the cache backends, counting hits and misses of lookups.
+
+    Backends store JSON serialisable values, None is never stored and is
+    returned for missing and expired keys.
+    """
+
+    # whether every process of the app sees the same entries
+    shared = False
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        Looks up a key, counting the lookup as a hit or a miss.
+
+        Args:
+            key (str): The key to look up.
+
+        Returns:
+            The cached value, or None if the key is not cached.
+        """
+        value = self.peek(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def get_many(self, keys):
+        """
+        Looks up several keys at once, counting each lookup.
+
+        Args:
+            keys (list): The keys to look up.
+
+        Returns:
+            list: The cached values in the order of the keys, None for the
+                keys that are not cached.
+        """
+        values = self.peek_many(keys)
+        hits = sum(value is not None for value in values)
+        self.hits += hits
+        self.misses += len(values) - hits
+        return values
+
+    def stats(self):
+        """
+        Returns the hit and miss counters of the cache for monitoring.
+
+        Returns:
+            dict: The number of hits and misses and the hit ratio.
+        """
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0}
+
+    def peek(self, key):
+        """Returns the cached value of a key without counting the lookup."""
+        raise NotImplementedError
+
+    def peek_many(self, keys):
+        """Returns the cached values of several keys without counting."""
+        return [self.peek(key) for key in keys]
+
+    def set(self, key, value):
+        """Caches a value under a key."""
+        raise NotImplementedError
+
+    def delete(self, *keys):
+        """Removes keys from the cache."""
+        raise NotImplementedError
+
+    def keys(self, prefix=''):
+        """Returns the cached keys that start with a prefix."""
+        raise NotImplementedError
+
+    def clear(self):
+        """Removes every key from the cache."""
+        raise NotImplementedError
+
+
+class NullCache(BaseCache):
+    """A cache that stores nothing, used to turn caching off."""
+
+    # nothing it holds can go stale
+    shared = True
+
+    def peek(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+    def delete(self, *keys):
+        pass
+
+    def keys(self, prefix=''):
+        return []
+
+    def clear(self):
+        pass
+
+
+class LRUCache(BaseCache):
+    """
+    An in-process cache evicting the least recently used key when full.
+
+    Args:
+        max_entries (int): The number of keys kept before evicting.
+        ttl (float): The number of seconds a value stays cached.
+    """
+
+    def __init__(self, max_entries=1024, ttl=300):
+        super().__init__()
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def peek(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def keys(self, prefix=''):
+        with self._lock:
+            return [key for key in self._entries if key.startswith(prefix)]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisCache(BaseCache):
+    """
+    A cache shared between processes through a Redis compatible server.
+
+    Args:
+        client: A redis.Redis client, or any object with the same get,
+            mget, set, delete and scan_iter methods.
+        ttl (int): The number of seconds a value stays cached.
+        prefix (str): The prefix namespacing the keys of this application.
+    """
+
+    shared = True
+
+    def __init__(self, client, ttl=300, prefix='todo-app:'):
+        super().__init__()
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def peek(self, key):
+        raw = self.client.get(self.prefix + key)
+        return None if raw is None else json.loads(raw)
+
+    def peek_many(self, keys):
+        if not keys:
+            return []
+        raws = self.client.mget([self.prefix + key for key in keys])
+        return [None if raw is None else json.loads(raw) for raw in raws]
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, json.dumps(value), ex=self.ttl)
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*[self.prefix + key for key in keys])
+
+    def keys(self, prefix=''):
+        keys = self.client.scan_iter(match=self.prefix + prefix + '*')
+        return [(key.decode() if isinstance(key, bytes) else key)
+                [len(self.prefix):] for key in keys]
+
+    def clear(self):
+        self.delete(*self.keys())
+
+
+def create_cache(config):
+    """
+    Creates the cache backend selected by the CACHE_BACKEND setting.
+
+    Args:
+        config (dict): The application configuration.
+
+    Returns:
+        BaseCache: The configured cache backend.
+
+    Raises:
+        ValueError: If CACHE_BACKEND names an unknown backend.
+    """
+    backend = config['CACHE_BACKEND']
+    if backend == 'memory':
+        return LRUCache(config['CACHE_MAX_ENTRIES'], config['CACHE_TTL'])
+    if backend == 'redis':
+        # only needed when the redis backend is selected
+        import redis
+        return RedisCache(redis.Redis.from_url(config['CACHE_REDIS_URL']),
+                          config['CACHE_TTL'])
+    if backend == 'null':
+        return NullCache()
+    raise ValueError(f'Unknown cache backend: {backend}')
+
+
+class Cache:
+    """
+    Flask extension giving access to the cache backend of the current app.
+
+    Entries made of immutable content, such as the rendered rows keyed by
+    the time of their last write, are cached in the backend whatever it is.
+    Entries that writes invalidate, the todos and the listing pages, are
+    keyed by the revision of their owner's todos, see
+    todo_service.TODO_CACHE_KEY, which costs a query per lookup. They are
+    cached in a backend shared by every process, or in the memory backend
+    when CACHE_LOCAL_TODOS is set, every process then keeping its own
+    copies.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = create_cache(app.config)
+        app.extensions['cache'] = backend
+        app.extensions['todo_cache'] = backend \
+            if backend.shared or app.config['CACHE_LOCAL_TODOS'] \
+            else NullCache()
+
+    @property
+    def backend(self):
+        return current_app.extensions['cache']
+
+    @property
+    def todos(self):
+        """The backend of the entries keyed by the todos' revision."""
+        return current_app.extensions['todo_cache']
+
+    @property
+    def caches_todos(self):
+        """Tells whether the todos and pages are cached, see todos."""
+        return not isinstance(self.todos, NullCache)
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
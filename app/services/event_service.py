@@ -0,0 +1,229 @@
+import json
+import time
+from datetime import timedelta
+
+import sqlalchemy as sa
+from flask import current_app
+
+from app import db
+from app.models import TodoEvent, utcnow
+from app.services.logger_service import setup_logger
+
+logger = setup_logger()
+
+ADDED = 'added'
+UPDATED = 'updated'
+DELETED = 'deleted'
+# too many todos changed at once, clients reload instead
+RESET = 'reset'
+
+STREAM_HEADERS = {
+    'Cache-Control': 'no-cache',
+    # lets the events through nginx as they are sent
+    'X-Accel-Buffering': 'no',
+}
+HEARTBEAT = ': keep-alive\n\n'
+# milliseconds clients wait before reconnecting once a stream ends
+RETRY = 1000
+
+
+def record_events(owner_id, kind, todo_ids):
+    """
+    Records that todos of an owner changed, in the transaction that changes
+    them, so the event is committed if and only if the change is.
+
+    It must be called after the owner's revision was bumped in the
+    transaction: the revision row stays locked until the commit, so the
+    events of an owner commit in the order of their IDs and a client that
+    read up to an ID never misses a later event.
+
+    Args:
+        owner_id (int): The owner of the todos.
+        kind (str): ADDED, UPDATED or DELETED.
+        todo_ids (list): The IDs of the todos, or None if they are not
+            known. Unknown IDs or more than EVENTS_MAX_BATCH of them are
+            recorded as one RESET event.
+    """
+    config = current_app.config
+    if not config['EVENTS_ENABLED']:
+        return
+    if todo_ids is not None:
+        todo_ids = list(todo_ids)
+        if not todo_ids:
+            return
+    if todo_ids is None or len(todo_ids) > config['EVENTS_MAX_BATCH']:
+        rows = [{'owner_id': owner_id, 'kind': RESET, 'todo_id': None}]
+    else:
+        rows = [{'owner_id': owner_id, 'kind': kind, 'todo_id': todo_id}
+                for todo_id in todo_ids]
+    db.session.execute(sa.insert(TodoEvent), rows)
+
+
+def events_statement(owner_id, after_id, limit=100):
+    """Builds the query of the events of an owner after an event ID."""
+    return sa.select(TodoEvent.id, TodoEvent.kind, TodoEvent.todo_id) \
+        .where(TodoEvent.owner_id == owner_id, TodoEvent.id > after_id) \
+        .order_by(TodoEvent.id).limit(limit)
+
+
+def latest_statement(owner_id):
+    """Builds the query of the ID of the last event of an owner."""
+    return sa.select(sa.func.max(TodoEvent.id)) \
+        .where(TodoEvent.owner_id == owner_id)
+
+
+def resume_statement(owner_id, after_id):
+    """
+    Builds the query of the IDs of the last and oldest events kept of an
+    owner, and of the number of events, of any owner, kept between
+    after_id and the oldest, see open_stream.
+    """
+    oldest = sa.select(sa.func.min(TodoEvent.id)) \
+        .where(TodoEvent.owner_id == owner_id).scalar_subquery()
+    kept = sa.select(sa.func.count()).select_from(TodoEvent) \
+        .where(TodoEvent.id > after_id, TodoEvent.id < oldest) \
+        .scalar_subquery()
+    return sa.select(latest_statement(owner_id).scalar_subquery(), oldest,
+                     kept)
+
+
+def latest_event_id(owner_id):
+    """
+    Returns the ID of the last event of an owner, 0 before the first one.
+
+    A listing loaded after reading it reflects every event up to that ID,
+    so its clients can subscribe from there.
+    """
+    return db.session.scalar(latest_statement(owner_id)) or 0
+
+
+def parse_event_id(value):
+    """Parses a Last-Event-ID, returning None if it is not valid."""
+    try:
+        event_id = int(value)
+    except (TypeError, ValueError):
+        return None
+    return event_id if event_id >= 0 else None
+
+
+def format_event(event_id, kind, todo_id):
+    """Formats an event as a server-sent event."""
+    return f'id: {event_id}\nevent: {kind}\n' \
+        f'data: {json.dumps({"id": todo_id})}\n\n'
+
+
+def open_stream(last_event_id, latest_id, oldest_id, kept):
+    """
+    Starts a stream of events.
+
+    Args:
+        last_event_id (int): The ID of the last event the client got, None
+            to start from now.
+        latest_id (int): The ID of the last event of the owner, None if
+            there is none, see resume_statement.
+        oldest_id (int): The ID of the oldest event kept of the owner, None
+            if there is none.
+        kept (int): The number of events kept between last_event_id and
+            oldest_id.
+
+    Returns:
+        tuple: The ID to stream the events after, and the first chunk of
+            the stream, which also holds a RESET event if events the
+            client missed may have been pruned.
+    """
+    preamble = f'retry: {RETRY}\n\n'
+    latest_id = latest_id or 0
+    if last_event_id is None:
+        return latest_id, preamble
+    # a client that got the owner's last event missed nothing, one that got
+    # an event older than the oldest kept missed the owner's events pruned
+    # in between, if any: the IDs of the events of all the owners follow
+    # each other, so a gap in them is where events were pruned
+    if last_event_id < latest_id and oldest_id is not None \
+            and kept < oldest_id - last_event_id - 1:
+        preamble += format_event(latest_id, RESET, None)
+        return latest_id, preamble
+    return last_event_id, preamble
+
+
+def stream_events(owner_id, last_event_id=None):
+    """
+    Streams the changes to the todos of an owner as server-sent events.
+
+    The event table is polled every EVENTS_POLL_INTERVAL seconds, so a
+    change shows up within about that time on every client, whichever
+    process made it. A comment is sent every EVENTS_HEARTBEAT seconds
+    without events to keep proxies from closing the connection, and the
+    stream ends after EVENTS_MAX_DURATION seconds, the client reconnecting
+    with its Last-Event-ID.
+
+    Each stream served by the WSGI app holds a worker thread, serve the
+    app through app.asgi to hold none, see async_todo_service.
+
+    Args:
+        owner_id (int): The owner whose changes are streamed.
+        last_event_id (int): The ID of the last event the client got.
+
+    Yields:
+        str: Chunks of the stream.
+    """
+    config = current_app.config
+    poll_interval = config['EVENTS_POLL_INTERVAL']
+    started = last_sent = time.monotonic()
+    after_id, preamble = open_stream(last_event_id, *db.session.execute(
+        resume_statement(owner_id, last_event_id or 0)).one())
+    # the connection goes back to the pool between polls
+    db.session.commit()
+    yield preamble
+
+    while time.monotonic() - started < config['EVENTS_MAX_DURATION']:
+        rows = db.session.execute(events_statement(owner_id, after_id)) \
+            .all()
+        db.session.commit()
+        if rows:
+            after_id = rows[-1].id
+            last_sent = time.monotonic()
+            yield ''.join(format_event(*row) for row in rows)
+            continue
+        if time.monotonic() - last_sent >= config['EVENTS_HEARTBEAT']:
+            last_sent = time.monotonic()
+            yield HEARTBEAT
+        time.sleep(poll_interval)
+
+
+def prune_events(older_than=3600, batch_size=1000):
+    """
+    Deletes the events recorded at least older_than seconds ago, the
+    oldest first, one batch per transaction.
+
+    The last event of each owner is always kept, so a client that missed
+    pruned events is told to reload, see open_stream, and SQLite never
+    hands out the last ID again.
+
+    Returns:
+        int: The number of events deleted.
+    """
+    cutoff = utcnow() - timedelta(seconds=older_than)
+    pruned = 0
+    while True:
+        try:
+            # events are recorded in time order, the oldest come first by
+            # primary key without an index on the time
+            last_ids = sa.select(sa.func.max(TodoEvent.id)) \
+                .group_by(TodoEvent.owner_id)
+            rows = db.session.execute(
+                sa.select(TodoEvent.id, TodoEvent.created_at)
+                .where(TodoEvent.id.not_in(last_ids))
+                .order_by(TodoEvent.id).limit(batch_size)).all()
+            ids = [row.id for row in rows if row.created_at < cutoff]
+            if ids:
+                db.session.execute(
+                    sa.delete(TodoEvent).where(TodoEvent.id.in_(ids)))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        pruned += len(ids)
+        if len(ids) < batch_size:
+            logger.info('Pruned %d todo events', pruned)
+            return pruned
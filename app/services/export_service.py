@@ -0,0 +1,96 @@
+import csv
+import io
+import json
+
+import sqlalchemy as sa
+
+from app import db, tenancy
+from app.models import ToDo
+
+EXPORT_FIELDS = ('id', 'task', 'description')
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def iter_todo_rows(owner_id, batch_size=1000):
+    """
+    Streams every todo of an owner from the database, ordered by ID.
+
+    The rows are fetched through a server-side cursor in batches of
+    batch_size, so only one batch is held in memory at a time.
+
+    Args:
+        owner_id (int): The owner of the todos.
+        batch_size (int): The number of rows fetched from the cursor at once.
+
+    Yields:
+        Row: The id, task and description of each todo.
+    """
+    statement = sa.select(ToDo.id, ToDo.task, ToDo.description) \
+        .where(ToDo.owner_id == owner_id, ToDo.deleted_at.is_(None)) \
+        .order_by(ToDo.id) \
+        .execution_options(yield_per=batch_size)
+    yield from db.session.execute(statement)
+
+
+def _chunked(lines, chunk_size):
+    lines = iter(lines)
+    # the first line goes out on its own so the client gets the first byte
+    # straight away, later lines are joined to cut per-chunk overhead
+    first = next(lines, None)
+    if first is None:
+        return
+    yield first
+
+    buffer, size = [], 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            yield ''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def _ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(dict(row._mapping)) + '\n'
+
+
+def _csv_lines(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    yield buffer.getvalue()
+    for row in rows:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(row)
+        yield buffer.getvalue()
+
+
+def export_todos(export_format, batch_size=1000, chunk_size=64 * 1024):
+    """
+    Streams every todo of the current owner serialised as NDJSON or CSV.
+
+    Args:
+        export_format (str): Either 'ndjson' or 'csv'.
+        batch_size (int): The number of rows fetched from the database at
+            once.
+        chunk_size (int): The size in characters of the chunks yielded.
+
+    Yields:
+        str: Chunks of the serialised todos.
+
+    Raises:
+        ValueError: If the export format is not supported.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f'Unsupported export format: {export_format}')
+    lines = _ndjson_lines if export_format == 'ndjson' else _csv_lines
+    # the owner is read now, the rows may be generated out of the request
+    rows = iter_todo_rows(tenancy.current_owner_id(), batch_size)
+    return _chunked(lines(rows), chunk_size)
@@ -0,0 +1,44 @@
+from flask import current_app
+from markupsafe import Markup
+
+from app import cache, instrumentation
+
+ROW_TEMPLATE = '_todo_row.html'
+ROW_FRAGMENT_KEY = 'fragment:todo_row:{}:{}'
+
+
+def render_todo_rows(todos):
+    """
+    Renders the table rows of a todo listing from cached HTML fragments.
+
+    Each row is cached under the todo's ID and the time it was last
+    written, so a write makes only that row render again, the fragments of
+    the other todos are reused. Fragments must not depend on the user, as
+    they are shared by every request.
+
+    Args:
+        todos (list): The todos to render, in listing order.
+
+    Returns:
+        Markup: The concatenated row HTML, safe to output in a template.
+    """
+    keys = [None if todo.updated_at is None else
+            ROW_FRAGMENT_KEY.format(todo.id, todo.updated_at.isoformat())
+            for todo in todos]
+    cached = iter(cache.get_many([key for key in keys if key is not None]))
+
+    template = None
+    rows = []
+    for todo, key in zip(todos, keys):
+        fragment = None if key is None else next(cached)
+        if fragment is None:
+            # render the row alone, outside of render_template, which would
+            # send the template signals and rerun the context processors
+            if template is None:
+                template = current_app.jinja_env.get_template(ROW_TEMPLATE)
+            with instrumentation.timed('render'):
+                fragment = template.render(todo=todo)
+            if key is not None:
+                cache.set(key, fragment)
+        rows.append(fragment)
+    return Markup(''.join(rows))
@@ -0,0 +1,120 @@
+import csv
+import json
+import time
+from collections import namedtuple
+
+import sqlalchemy as sa
+
+from app import db, tenancy
+from app.models import ToDo
+from app.services import event_service, todo_service
+from app.services.todo_service import logger
+
+IMPORT_FORMATS = ('ndjson', 'csv')
+
+ImportResult = namedtuple(
+    'ImportResult', ['imported', 'failed', 'errors', 'elapsed'])
+
+
+def read_records(file, import_format):
+    """
+    Reads todo records one at a time from an NDJSON or CSV file.
+
+    CSV files need a header row with a task column and may have a
+    description column, other columns such as the id of an export are
+    ignored.
+
+    Args:
+        file: A text file opened for reading, with newline='' for CSV.
+        import_format (str): Either 'ndjson' or 'csv'.
+
+    Yields:
+        tuple: The line number of each record and the record as a dict, or
+            the error message when the line cannot be parsed.
+
+    Raises:
+        ValueError: If the import format is not supported.
+    """
+    if import_format == 'ndjson':
+        for line_number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except ValueError:
+                yield line_number, 'Line is not valid JSON.'
+    elif import_format == 'csv':
+        reader = csv.DictReader(file)
+        for record in reader:
+            yield reader.line_num, record
+    else:
+        raise ValueError(f'Unsupported import format: {import_format}')
+
+
+def _insert_chunk(rows, owner_id):
+    table = ToDo.__table__
+    todo_service.bump_revision(owner_id)
+    if db.engine.dialect.insert_executemany_returning:
+        ids = db.session.scalars(
+            sa.insert(table).returning(table.c.id), rows).all()
+        event_service.record_events(owner_id, event_service.ADDED, ids)
+    else:
+        db.session.execute(sa.insert(table), rows)
+        event_service.record_events(owner_id, event_service.ADDED, None)
+    db.session.commit()
+
+
+def import_todos(records, chunk_size=5000, max_errors=100):
+    """
+    Validates and inserts todo records of the current owner, committing
+    them in chunks.
+
+    Records are checked against the same limits as the ToDo model and the
+    valid ones are inserted with one batched Core INSERT per chunk, so a
+    failure part way through keeps the chunks committed before it.
+
+    Args:
+        records: An iterable of (line number, record) pairs, as yielded by
+            read_records.
+        chunk_size (int): The number of todos inserted per transaction.
+        max_errors (int): The number of error messages kept for the report.
+
+    Returns:
+        ImportResult: The number of imported and failed records, the first
+            max_errors (line number, message) errors and the seconds taken.
+    """
+    start = time.perf_counter()
+    owner_id = tenancy.current_owner_id()
+    imported = failed = 0
+    errors, chunk = [], []
+
+    for line_number, record in records:
+        try:
+            if isinstance(record, str):
+                raise ValueError(record)
+            if not isinstance(record, dict):
+                raise ValueError('Record must be an object.')
+            task = record.get('task')
+            description = record.get('description') or None
+            ToDo.check_fields(task, description)
+        except ValueError as e:
+            failed += 1
+            if len(errors) < max_errors:
+                errors.append((line_number, str(e)))
+            continue
+
+        chunk.append({'owner_id': owner_id, 'task': task,
+                      'description': description})
+        if len(chunk) >= chunk_size:
+            _insert_chunk(chunk, owner_id)
+            imported += len(chunk)
+            chunk = []
+
+    if chunk:
+        _insert_chunk(chunk, owner_id)
+        imported += len(chunk)
+
+    elapsed = time.perf_counter() - start
+    logger.info('Imported %d to_do in %.2fs, %d failed',
+                imported, elapsed, failed)
+    return ImportResult(imported, failed, errors, elapsed)
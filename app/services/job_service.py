@@ -0,0 +1,145 @@
+import time
+
+import sqlalchemy as sa
+
+from app import db, tenancy
+from app.models import Job, utcnow
+from app.services import todo_service
+from app.services.logger_service import setup_logger
+
+logger = setup_logger()
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+# the service functions that can run as jobs, by name; they are called with
+# the JSON arguments of the job as the job's owner and must commit their
+# own writes
+JOBS = {
+    'todos.bulk_add': todo_service.bulk_add_todos,
+    'todos.bulk_update': todo_service.bulk_update_todos,
+    'todos.bulk_delete': todo_service.bulk_delete_todos,
+    'todos.purge': todo_service.purge_todos,
+}
+
+
+def enqueue(name, *args):
+    """
+    Queues a call of a service function for a worker of `flask jobs worker`.
+
+    Args:
+        name (str): The name of the function in JOBS.
+        *args: Its arguments, which must be serialisable to JSON.
+
+    Returns:
+        int: The ID of the job, to poll it with get_job.
+
+    Raises:
+        ValueError: If no job has that name.
+    """
+    if name not in JOBS:
+        raise ValueError(f'Unknown job: {name}')
+    job = Job(owner_id=tenancy.current_owner_id(), name=name,
+              args=list(args), status=QUEUED)
+    try:
+        db.session.add(job)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    logger.info('Queued job: id=%s name=%s', job.id, name)
+    return job.id
+
+
+def get_job(job_id):
+    """
+    Looks up a job of the current owner.
+
+    Returns:
+        Job: The job, or None if the owner has none with that ID.
+    """
+    job = db.session.get(Job, job_id)
+    if job is None or job.owner_id != tenancy.current_owner_id():
+        return None
+    return job
+
+
+def claim_job():
+    """
+    Takes the oldest queued job for this worker.
+
+    The job is only taken if it is still queued when it is marked as
+    running, so concurrent workers never run the same job. On PostgreSQL
+    the jobs locked by other workers are skipped rather than waited for.
+
+    Returns:
+        Job: The job taken, or None if none is queued.
+    """
+    try:
+        while True:
+            job_id = db.session.scalar(
+                sa.select(Job.id).where(Job.status == QUEUED)
+                .order_by(Job.id).limit(1)
+                .with_for_update(skip_locked=True))
+            if job_id is None:
+                db.session.commit()
+                return None
+            result = db.session.execute(
+                sa.update(Job).where(Job.id == job_id, Job.status == QUEUED)
+                .values(status=RUNNING, started_at=utcnow()))
+            db.session.commit()
+            if result.rowcount:
+                return db.session.get(Job, job_id)
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def run_job(job):
+    """Runs a job taken by claim_job and records its result or error."""
+    started = time.perf_counter()
+    try:
+        with tenancy.as_owner(job.owner_id):
+            result = JOBS[job.name](*job.args)
+    except Exception as e:
+        db.session.rollback()
+        logger.error('Error running job: id=%s name=%s: %s', job.id,
+                     job.name, e)
+        job.status, job.error = FAILED, str(e)
+    else:
+        logger.info('Ran job: id=%s name=%s in %.2fs', job.id, job.name,
+                    time.perf_counter() - started)
+        job.status, job.result = DONE, result
+    job.finished_at = utcnow()
+    db.session.commit()
+
+
+def work(poll_interval=1.0, burst=False):
+    """
+    Runs the queued jobs one after another, waiting poll_interval seconds
+    whenever the queue is empty.
+
+    A job left running by a worker that died is not retried. The writes of
+    the jobs only invalidate the caches this process sees, which is why
+    todos and pages are only cached in a shared backend, see
+    cache_service.Cache, and the revision is never cached.
+
+    Args:
+        poll_interval (float): Seconds between polls of an empty queue.
+        burst (bool): Return once the queue is empty instead of waiting.
+
+    Returns:
+        int: The number of jobs run, in burst mode.
+    """
+    ran = 0
+    while True:
+        job = claim_job()
+        if job is None:
+            if burst:
+                return ran
+            time.sleep(poll_interval)
+            continue
+        run_job(job)
+        ran += 1
@@ -1,12 +1,105 @@
+import atexit
 import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 
-def setup_logger(name='werkzeug', log_file='app.log', level=logging.INFO):
+class BoundedQueueHandler(QueueHandler):
+    """
+    Hands log records over to a background listener through a bounded queue.
+
+    Records are queued as they are, so the message is only formatted on the
+    listener thread. When the queue is full the record is dropped and counted
+    rather than blocking the request that logged it.
+
+    The listener is started by the first record of each process, as its
+    thread does not survive a fork, such as that of the workers of
+    `gunicorn --preload`: a forked process queues its records to a new
+    queue and listener of its own.
+    """
+
+    def __init__(self, log_queue, listener=None):
+        super().__init__(log_queue)
+        self.listener = listener
+        self.dropped = 0
+        self._pid = None
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        # called by handle with the handler's lock held
+        if self.listener is not None and self._pid != os.getpid():
+            self._start_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start_listener(self):
+        if self._pid is not None:
+            # forked, the queue may hold records of the parent
+            self.queue = queue.Queue(maxsize=self.queue.maxsize)
+            self.listener = _LogListener(self.queue, *self.listener.handlers)
+        self._pid = os.getpid()
+        self.listener.start()
+        atexit.register(self.listener.stop)
+
+
+class _LogListener(QueueListener):
+    def start(self):
+        self._pid = os.getpid()
+        super().start()
+
+    def stop(self):
+        # stopped once at exit, and possibly earlier by whoever owns it,
+        # but only by the process that started it
+        if self._thread is not None and self._pid == os.getpid():
+            super().stop()
+
+
+def setup_logger(name='werkzeug', log_file='app.log', level=logging.INFO,
+                 max_bytes=10 * 1024 * 1024, backup_count=5,
+                 queue_size=10000):
+    """
+    Sets up a logger that writes to a size-rotated file off the caller's
+    thread.
+
+    Args:
+        name (str): The name of the logger to set up.
+        log_file (str): The path of the log file.
+        level (int): The minimum level of the records to log.
+        max_bytes (int): The size at which the log file is rotated.
+        backup_count (int): The number of rotated log files to keep.
+        queue_size (int): The number of records that can wait to be written
+            before new records are dropped.
+
+    Set up again with the same log file, the logger is returned as it is,
+    so the modules that each set it up share one handler and only its
+    listener writes and rotates the file.
+
+    Returns:
+        Logger: The configured logger.
+    """
     logger = logging.getLogger(name)
-    handler = logging.FileHandler(log_file)
+    path = os.path.abspath(log_file)
+    for handler in logger.handlers:
+        if isinstance(handler, BoundedQueueHandler) and \
+                handler.listener is not None and \
+                any(getattr(target, 'baseFilename', None) == path
+                    for target in handler.listener.handlers):
+            return logger
+
+    file_handler = RotatingFileHandler(log_file, maxBytes=max_bytes,
+                                       backupCount=backup_count, delay=True)
     formatter = logging.Formatter(
         '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-    handler.setFormatter(formatter)
+    file_handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    handler = BoundedQueueHandler(
+        log_queue, _LogListener(log_queue, file_handler))
     logger.addHandler(handler)
     logger.setLevel(level)
     return logger
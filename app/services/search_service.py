@@ -0,0 +1,72 @@
+import re
+
+import sqlalchemy as sa
+
+from app.models import FTS_TABLE, ToDo
+
+_fts = sa.table(FTS_TABLE, sa.column('rowid'))
+_search_vector = sa.literal_column('to_do.search_vector')
+
+
+def search_terms(search_query):
+    """
+    Splits a search query into the words that are matched against the index.
+
+    Args:
+        search_query (str): The raw search query entered by the user.
+
+    Returns:
+        list: The words of the query, with any search syntax stripped out.
+    """
+    return re.findall(r'\w+', search_query or '')
+
+
+def search_statement(owner_id, search_query, dialect_name):
+    """
+    Builds a ranked full-text search over the tasks and descriptions of an
+    owner's todos.
+
+    Every word of the query must prefix-match a word of the task or the
+    description. Matches in the task rank above matches in the description.
+    SQLite is served by the FTS5 table and PostgreSQL by the GIN indexed
+    tsvector column, both keyed by owner, other databases fall back to an
+    unindexed LIKE scan.
+
+    Args:
+        owner_id (int): The owner whose todos are searched.
+        search_query (str): The search query to match todos against.
+        dialect_name (str): The name of the database dialect in use.
+
+    Returns:
+        Select: A statement selecting the matching todos, best match first.
+        None: If the query contains no searchable words.
+    """
+    terms = search_terms(search_query)
+    if not terms:
+        return None
+    owned = ToDo.owner_id == owner_id
+
+    if dialect_name == 'sqlite':
+        fts = sa.literal_column(FTS_TABLE)
+        # the owner's entries are matched first, the words only in the task
+        # and description columns
+        match = f'owner_id : "{int(owner_id)}" AND {{task description}} : (' \
+            + ' '.join(f'"{term}"*' for term in terms) + ')'
+        return sa.select(ToDo) \
+            .join(_fts, _fts.c.rowid == ToDo.id) \
+            .where(fts.op('MATCH')(match), owned) \
+            .order_by(sa.func.bm25(fts, 2.0, 1.0, 0.0), ToDo.id)
+
+    if dialect_name == 'postgresql':
+        query = sa.func.to_tsquery(sa.literal_column("'simple'"),
+                                   ' & '.join(f'{term}:*' for term in terms))
+        return sa.select(ToDo) \
+            .where(owned, _search_vector.op('@@')(query)) \
+            .order_by(sa.func.ts_rank(_search_vector, query).desc(), ToDo.id)
+
+    return sa.select(ToDo) \
+        .where(owned,
+               sa.or_(ToDo.task.contains(search_query, autoescape=True),
+                      ToDo.description.contains(search_query,
+                                                autoescape=True))) \
+        .order_by(ToDo.id)
@@ -2,7 +2,6 @@ import unittest
 from unittest.mock import patch
 
 from app.exceptions.exceptions import TodoNotFoundException
-from app.models import ToDo
 from app.services.todo_service import edit_todo, get_todo_by_id
 
 
@@ -13,7 +12,7 @@ class EditTodoTestCase(unittest.TestCase):
         todo_id = 1
         task = 'New Task'
         description = 'New Description'
-        todo = ToDo.query.get.return_value
+        todo = mock_db.session.get.return_value
         mock_session = mock_db.session.return_value
 
         # Act
@@ -30,7 +29,7 @@ class EditTodoTestCase(unittest.TestCase):
         todo_id = 1
         task = 'New Task'
         description = 'New Description'
-        ToDo.query.get.return_value = None
+        mock_db.session.get.return_value = None
         mock_session = mock_db.session.return_value
 
         # Act
@@ -47,7 +46,7 @@ class EditTodoTestCase(unittest.TestCase):
         todo_id = 1
         task = ''
         description = 'New Description'
-        todo = ToDo.query.get.return_value
+        todo = mock_db.session.get.return_value
         mock_session = mock_db.session.return_value
 
         # Act
@@ -64,7 +63,7 @@ class EditTodoTestCase(unittest.TestCase):
         todo_id = 1
         task = 'New Task'
         description = 'New Description'
-        ToDo.query.get.side_effect = TodoNotFoundException(todo_id)
+        mock_db.session.get.side_effect = TodoNotFoundException(todo_id)
         mock_session = mock_db.session.return_value
 
         # Act
@@ -86,7 +85,7 @@ class GetTodoByIdTestCase(unittest.TestCase):
     def test_get_todo_by_id_success(self, mock_db):
         # Arrange
         todo_id = 1
-        todo = ToDo.query.get.return_value
+        todo = mock_db.session.get.return_value
 
         # Act
         result = get_todo_by_id(todo_id)
@@ -98,7 +97,7 @@ class GetTodoByIdTestCase(unittest.TestCase):
     def test_get_todo_by_id_todo_not_found(self, mock_db):
         # Arrange
         todo_id = 1
-        ToDo.query.get.return_value = None
+        mock_db.session.get.return_value = None
 
         # Act
         result = get_todo_by_id(todo_id)
@@ -1,17 +1,348 @@
-from flask import flash
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+
+from flask import current_app, flash
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.exc import OperationalError, StatementError
+from sqlalchemy.orm import make_transient_to_detached
 
-from app import db
-from app.exceptions.exceptions import TodoNotFoundException
-from app.models import ToDo
+from app import cache, db, db_routing, instrumentation, tenancy
+from app.exceptions.exceptions import (TodoNotFoundException,
+                                       TodoValidationError)
+from app.models import Revision, ToDo, TodoEvent, utcnow
+from app.services import event_service, search_service, write_queue
 from app.services.logger_service import setup_logger
 
 logger = setup_logger()
 
+TodoPage = namedtuple('TodoPage', ['items', 'next_cursor', 'prev_cursor'])
+SearchPage = namedtuple('SearchPage', ['items', 'next_page', 'prev_page'])
+# a read-only todo of a listing, a tuple without the per-instance state and
+# attribute instrumentation of a ToDo, which is only loaded to be written
+TodoRow = namedtuple('TodoRow', ['id', 'task', 'description', 'updated_at'])
+# the columns listings are queried with, the time of the last write keys
+# the row's cached fragment, see fragment_service
+LISTING_COLUMNS = (ToDo.id, ToDo.task, ToDo.description, ToDo.updated_at)
+
+# cache keys are formatted with the owner ID and the revision of its todos
+# first, so every owner has its own entries and a write, which bumps the
+# revision, leaves the entries of the older revisions to expire unread
+# rather than deleting them: a copy filled late, after the write, can only
+# land under the revision it was read at
+TODO_CACHE_KEY = 'todo:{}:{}:{}'
+PAGE_CACHE_KEY = 'todos:page:{}:{}:{}:{}:{}'
+# the time of a revision no todo was written to yet
+EPOCH = datetime(1970, 1, 1)
+
+
+def page_cache_key(owner_id, revision, after, before, per_page):
+    return PAGE_CACHE_KEY.format(owner_id, revision, after, before, per_page)
+
+
+def cache_row(todo):
+    updated_at = todo.updated_at
+    return [todo.id, todo.task, todo.description,
+            None if updated_at is None else updated_at.isoformat()]
+
+
+def listing_row(row):
+    """Builds the TodoRow of a cached row, see cache_row."""
+    id, task, description, updated_at = row
+    return TodoRow(id, task, description, None if updated_at is None
+                   else datetime.fromisoformat(updated_at))
+
+
+def todo_from_row(row, owner_id):
+    id, task, description, updated_at = row
+    return ToDo(id=id, owner_id=owner_id, task=task, description=description,
+                updated_at=None if updated_at is None
+                else datetime.fromisoformat(updated_at))
+
+
+@instrumentation.service_call
+def find_todo(todo_id):
+    """
+    Looks up a todo of the current owner through the read-through cache.
+
+    A cached todo is attached to the session as a persistent object without
+    querying the database, so it can also be edited or deleted from there.
+    Unlike get_todo_by_id, a missing todo is not reported to the user.
+
+    Args:
+        todo_id (int): The ID of the todo item to look up.
+
+    Returns:
+        ToDo: The todo item with the specified ID, or None if the owner has
+            none.
+    """
+    owner_id = tenancy.current_owner_id()
+    key = row = None
+    if cache.caches_todos:
+        key = TODO_CACHE_KEY.format(owner_id, get_cache_revision(owner_id),
+                                    todo_id)
+        row = cache.todos.get(key)
+    if row is None:
+        todo = db.session.get(ToDo, todo_id)
+        # the todo of another owner, or a deleted one, is as good as missing
+        if todo is None or todo.owner_id != owner_id or \
+                todo.deleted_at is not None:
+            return None
+        if key is not None:
+            cache.todos.set(key, cache_row(todo))
+        return todo
+
+    todo = todo_from_row(row, owner_id)
+    make_transient_to_detached(todo)
+    return db.session.merge(todo, load=False)
+
+
+def _revision_name(owner_id):
+    return f'{ToDo.__tablename__}:{owner_id}'
+
+
+def bump_revision(owner_id=None):
+    """
+    Bumps the revision of an owner's todos in the current transaction.
+
+    The revision row is created by the owner's first write and then locked
+    until the transaction ends, so concurrent writes are ordered and every
+    committed write yields a new revision. It is bumped before the writes,
+    which then record their events under the lock, see
+    event_service.record_events.
+
+    The cached todos and pages of the owner are keyed by the revision, see
+    TODO_CACHE_KEY, so bumping it is all a write needs to invalidate them.
+    Writes made outside of this module must bump it before committing.
+
+    Args:
+        owner_id (int): The owner written to, the current owner by default.
+    """
+    if owner_id is None:
+        owner_id = tenancy.current_owner_id()
+    values = {'name': _revision_name(owner_id), 'value': 1,
+              'updated_at': utcnow()}
+    dialect_name = db.engine.dialect.name
+    if dialect_name in ('sqlite', 'postgresql'):
+        dialect_insert = sqlite_insert if dialect_name == 'sqlite' \
+            else postgresql_insert
+        insert = dialect_insert(Revision).values(values)
+        db.session.execute(insert.on_conflict_do_update(
+            index_elements=[Revision.name],
+            set_={'value': Revision.value + 1,
+                  'updated_at': insert.excluded.updated_at}))
+        return
+    result = db.session.execute(
+        sa.update(Revision).where(Revision.name == values['name'])
+        .values(value=Revision.value + 1, updated_at=values['updated_at']))
+    if result.rowcount == 0:
+        db.session.execute(sa.insert(Revision).values(values))
+
+
+def bump_revisions(writes):
+    """
+    Bumps the revision of every owner about to be written by a batch of the
+    write queue, whose operations all take the owner ID as first argument.
+    """
+    # in the same order in every transaction, so they cannot deadlock
+    for owner_id in sorted({args[0] for args in writes}):
+        bump_revision(owner_id)
+
+
+@instrumentation.service_call
+def get_revision_state():
+    """
+    Reads the revision of the current owner's todos with the ID of their
+    last event, see event_service, in one query.
+
+    The row is read from the database every time rather than cached, as a
+    write made by another process, such as another worker, the jobs worker
+    or an import, would not invalidate the copy cached by this one. It is
+    a single row looked up by its primary key.
+
+    Returns:
+        tuple: The revision number, the naive UTC datetime of the last
+            write to the owner's todos and the ID of their last event, 0,
+            EPOCH and 0 before the first write.
+    """
+    owner_id = tenancy.current_owner_id()
+    last_event_id = sa.select(sa.func.max(TodoEvent.id)) \
+        .where(TodoEvent.owner_id == owner_id).scalar_subquery()
+    row = db.session.execute(
+        sa.select(Revision.value, Revision.updated_at, last_event_id)
+        .where(Revision.name == _revision_name(owner_id))).first()
+    value, updated_at, event_id = row or (0, EPOCH, 0)
+    return value, updated_at, event_id or 0
+
+
+def revision_statement(owner_id):
+    """Builds the query of the revision number of an owner's todos."""
+    return sa.select(Revision.value) \
+        .where(Revision.name == _revision_name(owner_id))
+
+
+def get_cache_revision(owner_id):
+    """
+    Reads the revision the owner's cached todos and pages are keyed by, see
+    TODO_CACHE_KEY.
+
+    It must be read before the todos it keys are loaded, so they are at
+    least as recent as the revision.
+    """
+    return db.session.scalar(revision_statement(owner_id)) or 0
+
+
+def get_revision():
+    """
+    Retrieves the revision of the current owner's todos, see
+    get_revision_state.
 
+    Only the revision row is read, so it is cheap enough to validate a
+    listing before any todo is loaded.
+
+    Returns:
+        tuple: The revision number and the naive UTC datetime of the last
+            write to the owner's todos, 0 and EPOCH before the first one.
+    """
+    value, updated_at, _ = get_revision_state()
+    return value, updated_at
+
+
+def get_last_event_id():
+    """
+    Retrieves the ID of the last event of the current owner's todos, see
+    event_service, 0 before the first one.
+
+    A listing loaded after reading it reflects every event up to it, so its
+    live updates miss no event.
+    """
+    return get_revision_state()[2]
+
+
+def _write(operation, *args):
+    """
+    Runs a write operation in a transaction that also bumps the revision.
+
+    The operation takes the owner ID as first argument. With
+    DB_WRITE_QUEUE_ENABLED the operation runs on the write queue,
+    group committed with the writes of concurrent requests, otherwise it
+    is committed in the request's session.
+
+    Returns:
+        The result of the operation, once committed.
+    """
+    write_queue = current_app.extensions.get('write_queue')
+    if write_queue is None:
+        bump_revisions([args])
+        result = operation(*args)
+        db.session.commit()
+        return result
+    # end the request's own transaction first, without WAL an open read
+    # would hold off the writer's commit
+    db.session.commit()
+    result = write_queue.submit(operation, *args)
+    # committed on the writer thread, out of the request
+    db_routing.stick_to_primary()
+    return result
+
+
+def _insert_todos(rows):
+    """
+    Inserts todos in one batched INSERT, returning their IDs in order.
+
+    The revisions of their owners must be bumped first.
+    """
+    if db.engine.dialect.insert_executemany_returning:
+        # IDs are handed out in row order, sorting them matches them to
+        # the rows without the row-at-a-time inserts that asking for
+        # RETURNING in parameter order costs on SQLite
+        ids = sorted(db.session.scalars(
+            sa.insert(ToDo).returning(ToDo.id), rows))
+    else:
+        todos = [ToDo(**row) for row in rows]
+        db.session.add_all(todos)
+        db.session.flush()
+        ids = [todo.id for todo in todos]
+    inserted = {}
+    for row, todo_id in zip(rows, ids):
+        inserted.setdefault(row['owner_id'], []).append(todo_id)
+    for owner_id, owner_todo_ids in inserted.items():
+        event_service.record_events(owner_id, event_service.ADDED,
+                                    owner_todo_ids)
+    return ids
+
+
+def _insert_todo_batch(writes):
+    return _insert_todos([
+        {'owner_id': owner_id, 'task': task, 'description': description}
+        for owner_id, task, description in writes])
+
+
+@write_queue.batched(_insert_todo_batch)
+def _insert_todo(owner_id, task, description):
+    todo = ToDo(owner_id=owner_id, task=task, description=description)
+    db.session.add(todo)
+    db.session.flush()
+    event_service.record_events(owner_id, event_service.ADDED, [todo.id])
+    return todo.id
+
+
+def _delete_statement(owner_id, *criteria):
+    """
+    Builds the statement deleting the owner's todos matching criteria.
+
+    With SOFT_DELETE_ENABLED the todos are only marked as deleted, an UPDATE
+    of their own rows that leaves the index entries in place, and
+    `flask todos purge` deletes them later, see purge_todos.
+    """
+    criteria = (ToDo.owner_id == owner_id, ToDo.deleted_at.is_(None),
+                *criteria)
+    if current_app.config['SOFT_DELETE_ENABLED']:
+        return sa.update(ToDo).where(*criteria).values(deleted_at=utcnow())
+    return sa.delete(ToDo).where(*criteria)
+
+
+def _delete_todo(owner_id, todo_id):
+    # a single statement, its row count tells whether the todo existed
+    result = db.session.execute(
+        _delete_statement(owner_id, ToDo.id == todo_id))
+    if result.rowcount == 0:
+        raise TodoNotFoundException(todo_id)
+    event_service.record_events(owner_id, event_service.DELETED, [todo_id])
+
+
+def _update_todo(owner_id, todo_id, task, description):
+    # a single UPDATE, its row count tells whether the todo existed
+    result = db.session.execute(
+        sa.update(ToDo)
+        .where(ToDo.id == todo_id, ToDo.owner_id == owner_id,
+               ToDo.deleted_at.is_(None))
+        .values(task=task, description=description))
+    if result.rowcount == 0:
+        raise TodoNotFoundException(todo_id)
+    event_service.record_events(owner_id, event_service.UPDATED, [todo_id])
+
+
+def _log_insert(future):
+    error = future.exception()
+    if error is not None:
+        logger.error('Error inserting to_do: %s', error)
+    else:
+        logger.info('Inserted to_do: id=%s', future.result())
+
+
+@instrumentation.service_call
 def add_todo(task, description):
     """
-    Adds a new ToDo item to the database.
+    Adds a new ToDo item of the current owner to the database.
+
+    With DB_WRITE_BEHIND_ENABLED the insert is buffered and committed with
+    the other inserts of the next DB_WRITE_BEHIND_MAX_ITEMS or
+    DB_WRITE_BEHIND_LINGER_MS. Unless DB_WRITE_BEHIND_ACK is set this
+    returns before the commit, so the todo may not be listed yet and is
+    lost if the process dies first.
 
     Args:
         task (str): The task name.
@@ -20,41 +351,319 @@ def add_todo(task, description):
     Returns:
         None
     """
+    owner_id = tenancy.current_owner_id()
     try:
-        todo = ToDo(task=task, description=description)
-        db.session.add(todo)
-        db.session.commit()
-        logger.info(f'Inserted to_do: {todo}')
+        write_behind = current_app.extensions.get('write_behind')
+        if write_behind is None:
+            todo_id = _write(_insert_todo, owner_id, task, description)
+        else:
+            # checked here as the batched INSERT skips the model validators
+            ToDo.check_fields(task, description)
+            db.session.commit()
+            future = write_behind.enqueue(_insert_todo, owner_id, task,
+                                          description)
+            if not current_app.config['DB_WRITE_BEHIND_ACK']:
+                future.add_done_callback(_log_insert)
+                return
+            todo_id = future.result()
+            db_routing.stick_to_primary()
+        logger.info('Inserted to_do: id=%s', todo_id)
 
     except Exception as e:
         db.session.rollback()
-        logger.error(f'Error inserting to_do: {e}')
+        logger.error('Error inserting to_do: %s', e)
         flash('An error occurred while processing your request. Check logs for more information.',
               'error')
 
 
+def _validate_batch(items, fields):
+    """
+    Validates a batch of todo dicts, collecting the errors of every item.
+
+    Returns:
+        list: The items as dicts of exactly the given fields, missing
+            fields set to None.
+
+    Raises:
+        TodoValidationError: If any item is invalid.
+    """
+    rows, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            if not isinstance(item, dict):
+                raise ValueError('Todo must be an object.')
+            row = {field: item.get(field) for field in fields}
+            if 'id' in row and not isinstance(row['id'], int):
+                raise ValueError('Todo id must be an integer.')
+            ToDo.check_fields(row['task'], row['description'])
+            rows.append(row)
+        except ValueError as e:
+            errors.append({'index': index, 'error': str(e)})
+    if errors:
+        raise TodoValidationError(errors)
+    return rows
+
+
+@instrumentation.service_call
+def bulk_add_todos(items):
+    """
+    Adds many todos of the current owner in a single transaction with one
+    batched INSERT.
+
+    Args:
+        items (list): Dicts with the task and optional description of each
+            todo to add.
+
+    Returns:
+        list: The IDs of the added todos, in the order of the items.
+
+    Raises:
+        TodoValidationError: If any item is invalid, nothing is added.
+    """
+    owner_id = tenancy.current_owner_id()
+    rows = [{**row, 'owner_id': owner_id}
+            for row in _validate_batch(items, ('task', 'description'))]
+    if not rows:
+        return []
+    try:
+        bump_revision(owner_id)
+        ids = _insert_todos(rows)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    logger.info('Inserted %d to_do in batch', len(ids))
+    return ids
+
+
+@instrumentation.service_call
+def bulk_update_todos(items):
+    """
+    Updates many todos of the current owner in a single transaction with
+    one batched UPDATE.
+
+    Args:
+        items (list): Dicts with the id of each todo to update and its new
+            task and optional description, as with edit_todo.
+
+    Returns:
+        int: The number of updated todos.
+
+    Raises:
+        TodoValidationError: If any item is invalid, nothing is updated.
+        TodoNotFoundException: If any of the todos does not exist or belongs
+            to another owner, nothing is updated.
+    """
+    owner_id = tenancy.current_owner_id()
+    rows = _validate_batch(items, ('id', 'task', 'description'))
+    ids = [row['id'] for row in rows]
+    if not ids:
+        return 0
+    try:
+        bump_revision(owner_id)
+        # the UPDATE by primary key only touches the todos found here
+        found = set(db.session.scalars(sa.select(ToDo.id).where(
+            ToDo.id.in_(ids), ToDo.owner_id == owner_id,
+            ToDo.deleted_at.is_(None))))
+        missing = sorted(set(ids) - found)
+        if missing:
+            raise TodoNotFoundException(missing)
+        db.session.execute(sa.update(ToDo), rows)
+        event_service.record_events(owner_id, event_service.UPDATED, ids)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    logger.info('Updated %d to_do in batch', len(ids))
+    return len(ids)
+
+
+@instrumentation.service_call
+def bulk_delete_todos(todo_ids):
+    """
+    Deletes many todos of the current owner in a single statement, see
+    _delete_statement.
+
+    Args:
+        todo_ids (list): The IDs of the todos to delete. IDs of todos that
+            do not exist or belong to another owner are ignored.
+
+    Returns:
+        int: The number of deleted todos.
+    """
+    owner_id = tenancy.current_owner_id()
+    todo_ids = list(todo_ids)
+    if not todo_ids:
+        return 0
+    dialect = db.engine.dialect
+    try:
+        bump_revision(owner_id)
+        statement = _delete_statement(owner_id, ToDo.id.in_(todo_ids))
+        if dialect.delete_returning and dialect.update_returning:
+            deleted = db.session.scalars(
+                statement.returning(ToDo.id)).all()
+            count = len(deleted)
+        else:
+            count = db.session.execute(statement).rowcount
+            # the todos that were not deleted are not listed anyway, so
+            # their events are no-ops for the clients
+            deleted = todo_ids if count else []
+        event_service.record_events(owner_id, event_service.DELETED,
+                                    deleted)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    logger.info('Deleted %d to_do in batch', count)
+    return count
+
+
+@instrumentation.service_call
+@db_routing.read_replica
 def get_all_todos():
     """
-    Retrieves all todos from the database.
+    Retrieves all todos of the current owner from the database.
+
+    Only the listed columns are queried, into rows that are neither tracked
+    by the session nor instrumented, see get_todo_by_id for a todo to edit.
 
     Returns:
-        A list of all todos in the database.
+        A list of the rows of all todos of the owner, ordered by ID.
     """
     try:
-        result = ToDo.query.all()
-        logger.info(f'Getting all from to_do: {result}')
+        result = db.session.execute(sa.select(*LISTING_COLUMNS).where(
+            ToDo.owner_id == tenancy.current_owner_id(),
+            ToDo.deleted_at.is_(None)).order_by(ToDo.id)).all()
+        logger.info('Getting all from to_do: %d items', len(result))
         return result
 
     except Exception as e:
-        logger.error(f'Error getting todos: {e}')
+        logger.error('Error getting todos: %s', e)
         flash('An error occurred while processing your request. Check logs for more information.',
               'error')
         return []
 
 
+@instrumentation.service_call
+def get_todos_page(after=None, before=None, per_page=None, revision=None):
+    """
+    Retrieves one page of the current owner's todos ordered by ID using
+    keyset pagination.
+
+    Pages are located with a range on the (owner_id, id) index rather than
+    an OFFSET, so a page deep into the table costs the same as the first,
+    whatever the number of todos of other owners. They are cached when the
+    todos are, see cache_service.Cache, and otherwise read from a replica
+    if there is one.
+
+    Args:
+        after (int): Only return todos with an ID greater than this cursor.
+        before (int): Only return todos with an ID lower than this cursor.
+        per_page (int): The maximum number of todos on the page. Defaults
+            to the TODOS_PER_PAGE setting.
+        revision (int): The revision of the owner's todos if it was just
+            read, see get_cache_revision.
+
+    Returns:
+        TodoPage: The todos on the page with the cursors of the next and
+            previous pages, which are None when there is no such page.
+    """
+    per_page = per_page or current_app.config['TODOS_PER_PAGE']
+    owner_id = tenancy.current_owner_id()
+    try:
+        if cache.caches_todos:
+            if revision is None:
+                revision = get_cache_revision(owner_id)
+            key = page_cache_key(owner_id, revision, after, before, per_page)
+            entry = cache.todos.get(key)
+            if entry is None:
+                entry = _load_page(owner_id, after, before, per_page)
+                cache.todos.set(key, entry)
+        else:
+            entry = _load_uncached_page(owner_id, after, before, per_page)
+
+        page = page_from_entry(entry)
+        logger.info('Getting page of to_do after=%s before=%s: %d items',
+                    after, before, len(page.items))
+        return page
+
+    except Exception as e:
+        logger.error('Error getting page of todos: %s', e)
+        flash('An error occurred while processing your request. Check logs for more information.',
+              'error')
+        return TodoPage([], None, None)
+
+
+def listing_reads_replica(search_query=None):
+    """
+    Tells whether the listing, or the results of search_query, would be
+    read from a replica, which may lag behind the revision of the primary,
+    see get_todos_page and get_filtered_todos.
+    """
+    if not search_query and cache.caches_todos:
+        return False
+    return db_routing.reads_replica()
+
+
+def page_statement(owner_id, after, before, per_page):
+    """Builds the query of a keyset page, see get_todos_page."""
+    statement = sa.select(*LISTING_COLUMNS) \
+        .where(ToDo.owner_id == owner_id, ToDo.deleted_at.is_(None))
+    if before is not None:
+        # walk backwards from the cursor so the limit applies to the rows
+        # nearest to it, page_entry restores ascending order
+        return statement.where(ToDo.id < before) \
+            .order_by(ToDo.id.desc()).limit(per_page + 1)
+    if after is not None:
+        statement = statement.where(ToDo.id > after)
+    return statement.order_by(ToDo.id).limit(per_page + 1)
+
+
+def page_entry(rows, after, before, per_page):
+    """
+    Turns the rows queried by page_statement into a cacheable page entry.
+    """
+    if before is not None:
+        items = rows[:per_page][::-1]
+        has_prev = len(rows) > per_page
+        has_next = True
+    else:
+        items = rows[:per_page]
+        has_prev = after is not None
+        has_next = len(rows) > per_page
+
+    next_cursor = prev_cursor = None
+    if has_next:
+        next_cursor = items[-1].id if items else before - 1
+    if has_prev:
+        prev_cursor = items[0].id if items else after + 1
+
+    return {'rows': [cache_row(todo) for todo in items],
+            'next': next_cursor, 'prev': prev_cursor}
+
+
+def _load_page(owner_id, after, before, per_page):
+    rows = db.session.execute(
+        page_statement(owner_id, after, before, per_page)).all()
+    return page_entry(rows, after, before, per_page)
+
+
+@db_routing.read_replica
+def _load_uncached_page(owner_id, after, before, per_page):
+    # a page that is not cached cannot keep a lagging replica's rows
+    return _load_page(owner_id, after, before, per_page)
+
+
+def page_from_entry(entry):
+    """Builds the TodoPage of a cached page entry."""
+    return TodoPage([listing_row(row) for row in entry['rows']],
+                    entry['next'], entry['prev'])
+
+
+@instrumentation.service_call
 def delete_todo(todo_id):
     """
-    Deletes a todo item from the database.
+    Deletes a todo item of the current owner from the database.
 
     Args:
         todo_id (int): The ID of the todo item to be deleted.
@@ -68,25 +677,21 @@ def delete_todo(todo_id):
     Raises:
         TodoNotFoundException: If the todo item with the given ID does not exist.
     """
+    owner_id = tenancy.current_owner_id()
     try:
-        todo = ToDo.query.get(todo_id)
-
-        if (todo is None):
-            raise TodoNotFoundException(todo_id)
-
-        db.session.delete(todo)
-        db.session.commit()
-        logger.info(f'Deleted to_do: {todo}')
+        _write(_delete_todo, owner_id, todo_id)
+        logger.info('Deleted to_do: id=%s', todo_id)
 
     except TodoNotFoundException as e:
-        logger.error(e.__str__())
+        logger.error('%s', e)
         flash('Cannot delete a non-existing todo.', 'error')
         db.session.rollback()
 
 
+@instrumentation.service_call
 def edit_todo(todo_id, task, description):
     """
-    Edit a todo item with the given todo_id.
+    Edit a todo item of the current owner with the given todo_id.
 
     Args:
         todo_id (int): The ID of the todo item to be edited.
@@ -103,29 +708,64 @@ def edit_todo(todo_id, task, description):
         TodoNotFoundException: If the todo item with the given todo_id does not exist.
         ValueError: If the task is empty.
     """
+    owner_id = tenancy.current_owner_id()
     try:
-        todo = ToDo.query.get(todo_id)
-
-        if (todo is None):
-            raise TodoNotFoundException(todo_id)
-        if not task:
-            raise ValueError('Task cannot be empty.')
-
-        todo.task = task
-        todo.description = description
-        db.session.commit()
-        logger.info(f'Updated to_do: {todo}')
+        ToDo.check_fields(task, description)
+        _write(_update_todo, owner_id, todo_id, task, description)
+        logger.info('Updated to_do: id=%s', todo_id)
 
     except TodoNotFoundException as e:
-        logger.error(e.__str__())
+        logger.error('%s', e)
         flash('Cannot edit a non-existing todo.', 'error')
         db.session.rollback()
     except ValueError as e:
-        logger.error(f'Error updating to_do: {e}')
+        logger.error('Error updating to_do: %s', e)
         flash(e.__str__(), 'error')
         db.session.rollback()
 
 
+def purge_todos(older_than=0, batch_size=1000):
+    """
+    Deletes the todos of every owner that were soft deleted at least
+    older_than seconds ago.
+
+    The tombstones are found through their own partial index and deleted
+    batch_size at a time, one transaction per batch, so no transaction
+    holds many row locks for long and the purge can run beside the app.
+    Tombstones are never listed nor cached, so the revisions and the
+    caches are left alone.
+
+    Args:
+        older_than (float): The age in seconds of the youngest tombstone
+            purged.
+        batch_size (int): The number of todos deleted per transaction.
+
+    Returns:
+        int: The number of todos purged.
+    """
+    cutoff = utcnow() - timedelta(seconds=older_than)
+    purged = 0
+    while True:
+        try:
+            ids = db.session.scalars(
+                sa.select(ToDo.id)
+                .where(ToDo.deleted_at.is_not(None),
+                       ToDo.deleted_at <= cutoff)
+                .order_by(ToDo.deleted_at).limit(batch_size)).all()
+            if not ids:
+                db.session.commit()
+                return purged
+            result = db.session.execute(sa.delete(ToDo).where(
+                ToDo.id.in_(ids), ToDo.deleted_at.is_not(None)))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        purged += result.rowcount
+        logger.info('Purged %d deleted to_do', result.rowcount)
+
+
+@instrumentation.service_call
 def get_todo_by_id(todo_id):
     """
     Retrieve a todo item by its ID.
@@ -141,41 +781,85 @@ def get_todo_by_id(todo_id):
         TodoNotFoundException: If the todo item with the specified ID does not exist.
     """
     try:
-        todo = ToDo.query.get(todo_id)
+        todo = find_todo(todo_id)
 
         if (todo is None):
             raise TodoNotFoundException(todo_id)
 
-        logger.info(f'Getting to_do: {todo}')
+        logger.info('Getting to_do: id=%s', todo_id)
         return todo
 
     except TodoNotFoundException as e:
-        logger.error(e.__str__())
+        logger.error('%s', e)
         flash('Cannot get a non-existing todo.', 'error')
         return None
 
 
-def get_filtered_todos(search_query):
+@instrumentation.service_call
+@db_routing.read_replica
+def get_filtered_todos(search_query, page=1, per_page=None):
     """
-    Retrieves all todos from the database that match the search query.
+    Retrieves a page of the current owner's todos that match the search
+    query, best match first.
+
+    The query is matched against both the task and the description through
+    the database's full-text index, see search_service.search_statement.
 
     Args:
         search_query (str): The search query to filter todos.
+        page (int): The 1-based number of the page of results to return.
+        per_page (int): The maximum number of todos on the page. Defaults
+            to the TODOS_PER_PAGE setting.
 
     Returns:
-        A list of todos that match the search query.
+        SearchPage: The matching todos on the page with the numbers of the
+            next and previous pages, which are None when there is no such
+            page.
     """
+    per_page = per_page or current_app.config['TODOS_PER_PAGE']
     try:
-        result = ToDo.query.filter(ToDo.task.contains(search_query)).all()
-        logger.info(f'Getting filtered to_do: {result}')
+        statement = search_page_statement(
+            tenancy.current_owner_id(), search_query, page, per_page,
+            db.engine.dialect.name)
+        rows = []
+        if statement is not None:
+            rows = db.session.execute(statement).all()
+
+        result = search_page_from_rows(rows, page, per_page)
+        logger.info('Getting filtered to_do: %d items', len(result.items))
         return result
 
     except OperationalError as e:
-        logger.error(f'Error connecting to the database: {e}')
+        logger.error('Error connecting to the database: %s', e)
         flash('A database connection error occurred. Please try again later.', 'error')
-        return []
+        return SearchPage([], None, None)
     except StatementError as e:
-        logger.error(f'Error getting filtered todos: {e}')
+        logger.error('Error getting filtered todos: %s', e)
         flash('An error occurred while processing your request. Check logs for more information.',
               'error')
-        return []
+        return SearchPage([], None, None)
+
+
+def search_page_statement(owner_id, search_query, page, per_page,
+                          dialect_name):
+    """
+    Builds the query of a page of an owner's search results, see
+    get_filtered_todos.
+
+    Returns:
+        Select: The query, or None if the search query has no terms.
+    """
+    statement = search_service.search_statement(owner_id, search_query,
+                                                dialect_name)
+    if statement is None:
+        return None
+    return statement.with_only_columns(*LISTING_COLUMNS) \
+        .where(ToDo.deleted_at.is_(None)) \
+        .limit(per_page + 1).offset((page - 1) * per_page)
+
+
+def search_page_from_rows(rows, page, per_page):
+    """Builds the SearchPage of the rows queried by search_page_statement."""
+    next_page = page + 1 if len(rows) > per_page else None
+    prev_page = page - 1 if page > 1 else None
+    return SearchPage(rows[:per_page], next_page, prev_page)
@@ -0,0 +1,187 @@
+import atexit
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from app import db
+from app.services.logger_service import setup_logger
+
+logger = setup_logger()
+
+
+def batched(many):
+    """
+    Decorates a write operation so that the writes of a batch which all
+    call it run as one call of many instead, such as one batched INSERT.
+
+    Args:
+        many: Called with the list of the args of the writes, it returns
+            the list of their results in the same order.
+    """
+    def decorator(operation):
+        operation.many = many
+        return operation
+    return decorator
+
+
+class WriteQueue:
+    """
+    Runs database writes on a single writer thread, group committing them.
+
+    Writes queued while the writer is busy are run together in one
+    transaction with one commit, so concurrent requests share the cost of
+    a commit and never contend for the SQLite write lock. A write that
+    fails makes its batch roll back and rerun one write per transaction,
+    so only the failing write reports its error.
+
+    With a linger the writer waits up to that long for more writes before
+    committing, trading the latency of each write for fewer, larger
+    transactions.
+
+    Args:
+        app (Flask): The app whose database is written.
+        max_batch (int): The number of writes committed together at most.
+        max_size (int): The number of writes waiting before submit blocks.
+        before_writes: Called in each transaction before its writes, with
+            the list of the args of the writes.
+        linger (float): Seconds the writer waits for a batch to fill.
+        after_commit: Called on the writer thread with the list of the args
+            and the list of the results of the writes of each committed
+            batch, before the writes are acknowledged.
+    """
+
+    def __init__(self, app, max_batch=100, max_size=1000,
+                 before_writes=None, linger=0, after_commit=None):
+        self.app = app
+        self.max_batch = max_batch
+        self.before_writes = before_writes
+        self.linger = linger
+        self.after_commit = after_commit
+        self._queue = queue.Queue(max_size)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, operation, *args):
+        """
+        Queues a write and waits until it is committed.
+
+        Args:
+            operation: The function making the write in db.session, called
+                with args on the writer thread. It must not commit.
+
+        Returns:
+            The result of the operation.
+
+        Raises:
+            Exception: The exception raised by the operation or the commit.
+        """
+        return self.enqueue(operation, *args).result()
+
+    def enqueue(self, operation, *args):
+        """
+        Queues a write without waiting for it, see submit.
+
+        Returns:
+            Future: Resolved with the result of the operation once it is
+                committed, or with its exception.
+        """
+        future = Future()
+        self._start()
+        self._queue.put((operation, args, future))
+        return future
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='write-queue', daemon=True)
+                self._thread.start()
+                atexit.register(self.stop)
+
+    def stop(self):
+        """Commits the queued writes and stops the writer thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def _run(self):
+        with self.app.app_context():
+            while True:
+                batch = [self._queue.get()]
+                deadline = time.monotonic() + self.linger
+                while batch[-1] is not None and len(batch) < self.max_batch:
+                    timeout = deadline - time.monotonic()
+                    try:
+                        if timeout > 0:
+                            batch.append(self._queue.get(timeout=timeout))
+                        else:
+                            batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                stopping = batch[-1] is None
+                if stopping:
+                    batch.pop()
+                if batch:
+                    self._commit(batch)
+                if stopping:
+                    db.session.remove()
+                    return
+
+    def _apply(self, batch):
+        operation = batch[0][0]
+        many = getattr(operation, 'many', None)
+        if many is not None and \
+                all(job[0] is operation for job in batch):
+            return many([args for _, args, _ in batch])
+        return [operation(*args) for operation, args, _ in batch]
+
+    def _commit(self, batch):
+        try:
+            writes = [args for _, args, _ in batch]
+            if self.before_writes is not None:
+                self.before_writes(writes)
+            results = self._apply(batch)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            if len(batch) == 1:
+                batch[0][2].set_exception(e)
+            else:
+                for job in batch:
+                    self._commit([job])
+            return
+        if self.after_commit is not None:
+            try:
+                self.after_commit(writes, results)
+            except Exception as e:
+                # the writes are committed whatever happens here
+                logger.error('Error after committing writes: %s', e)
+        for (_, _, future), result in zip(batch, results):
+            future.set_result(result)
+
+
+def init_app(app, before_writes=None, after_inserts=None):
+    """
+    Starts queueing the todo writes when DB_WRITE_QUEUE_ENABLED is set, and
+    buffering the todo inserts when DB_WRITE_BEHIND_ENABLED is set.
+
+    Args:
+        app (Flask): The app.
+        before_writes: Called in each transaction before its writes, with
+            the args of the writes.
+        after_inserts: Called with the args and the IDs of each committed
+            batch of buffered inserts.
+    """
+    if app.config['DB_WRITE_QUEUE_ENABLED']:
+        app.extensions['write_queue'] = WriteQueue(
+            app, app.config['DB_WRITE_QUEUE_MAX_BATCH'],
+            app.config['DB_WRITE_QUEUE_SIZE'], before_writes)
+    if app.config['DB_WRITE_BEHIND_ENABLED']:
+        app.extensions['write_behind'] = WriteQueue(
+            app, app.config['DB_WRITE_BEHIND_MAX_ITEMS'],
+            app.config['DB_WRITE_BEHIND_SIZE'], before_writes,
+            linger=app.config['DB_WRITE_BEHIND_LINGER_MS'] / 1000,
+            after_commit=after_inserts)
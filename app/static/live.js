@@ -0,0 +1,109 @@
+/*
+ * Live updates of the todo listing.
+ *
+ * Subscribes to the server-sent events of the table's data-live-url and
+ * patches its rows in place: changed rows are fetched again from
+ * data-row-url, deleted ones removed, and added ones appended when the
+ * page is the last one (data-live-append). The browser reconnects by
+ * itself, sending the ID of the last event it got.
+ */
+(function () {
+  'use strict';
+
+  var table = document.querySelector('table[data-live-url]');
+  if (!table || !window.EventSource || !window.fetch) {
+    return;
+  }
+  var body = table.tBodies[0];
+  var appendAdded = table.dataset.liveAppend === 'true';
+  // rows are patched one event after the other, so a slow fetch never
+  // overwrites the row of a later event
+  var patches = Promise.resolve();
+
+  function patch(apply) {
+    patches = patches.then(apply).catch(function () {});
+  }
+
+  function findRow(id) {
+    return body.querySelector('tr[data-todo-id="' + id + '"]');
+  }
+
+  function fetchRow(id) {
+    var url = table.dataset.rowUrl.replace('/0/', '/' + id + '/');
+    return fetch(url, { credentials: 'same-origin' }).then(function (response) {
+      if (!response.ok) {
+        return null;
+      }
+      return response.text().then(function (html) {
+        var template = document.createElement('template');
+        template.innerHTML = html.trim();
+        return template.content.firstElementChild;
+      });
+    });
+  }
+
+  function todoId(event) {
+    return JSON.parse(event.data).id;
+  }
+
+  var source = new EventSource(table.dataset.liveUrl);
+
+  source.addEventListener('added', function (event) {
+    var id = todoId(event);
+    if (!appendAdded) {
+      return;
+    }
+    patch(function () {
+      if (findRow(id)) {
+        return null;
+      }
+      return fetchRow(id).then(function (row) {
+        if (row && !findRow(id)) {
+          body.appendChild(row);
+        }
+      });
+    });
+  });
+
+  source.addEventListener('updated', function (event) {
+    var id = todoId(event);
+    patch(function () {
+      if (!findRow(id)) {
+        return null;
+      }
+      return fetchRow(id).then(function (row) {
+        var current = findRow(id);
+        if (row && current) {
+          current.replaceWith(row);
+        }
+      });
+    });
+  });
+
+  source.addEventListener('deleted', function (event) {
+    var id = todoId(event);
+    patch(function () {
+      var row = findRow(id);
+      if (row) {
+        row.remove();
+      }
+    });
+  });
+
+  // a reset asks for a reload, but a page that was loaded for the same
+  // reset, from a cache say, must not reload again and again: the stream
+  // goes on after the reset's event anyway
+  source.addEventListener('reset', function (event) {
+    var key = 'todos-reset:' + table.dataset.liveUrl;
+    try {
+      if (window.sessionStorage.getItem(key) === event.lastEventId) {
+        return;
+      }
+      window.sessionStorage.setItem(key, event.lastEventId);
+    } catch (error) {
+      return;
+    }
+    source.close();
+    window.location.reload();
+  });
+}());
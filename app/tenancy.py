@@ -0,0 +1,71 @@
+import contextvars
+from contextlib import contextmanager
+
+from flask import abort, current_app, g, has_request_context, request
+
+DEFAULT_OWNER_ID = 1
+
+_owner_id = contextvars.ContextVar('owner_id', default=None)
+
+
+def current_owner_id():
+    """
+    Returns the ID of the owner whose todos are being worked on.
+
+    That is the owner set with as_owner, else the one of the current
+    request, else DEFAULT_OWNER_ID, which owns every todo of a single-team
+    deployment.
+    """
+    owner_id = _owner_id.get()
+    if owner_id is None and has_request_context():
+        owner_id = g.get('owner_id')
+    return DEFAULT_OWNER_ID if owner_id is None else owner_id
+
+
+@contextmanager
+def as_owner(owner_id):
+    """Works on the todos of an owner outside of a request, as in the CLI."""
+    token = _owner_id.set(owner_id)
+    try:
+        yield
+    finally:
+        _owner_id.reset(token)
+
+
+def parse_owner_id(value):
+    """
+    Parses the value of the OWNER_HEADER.
+
+    A request without the header did not come through the authenticating
+    proxy, so it has no owner rather than the default one.
+
+    Returns:
+        int: The owner ID, or None if the header is missing or its value is
+            not a positive integer.
+    """
+    if value is None:
+        return None
+    try:
+        owner_id = int(value)
+    except ValueError:
+        return None
+    return owner_id if owner_id > 0 else None
+
+
+def _load_owner():
+    owner_id = parse_owner_id(
+        request.headers.get(current_app.config['OWNER_HEADER']))
+    if owner_id is None:
+        abort(400, 'Missing or invalid owner header.')
+    g.owner_id = owner_id
+
+
+def init_app(app):
+    """
+    Takes the owner of each request from the OWNER_HEADER when it is set.
+
+    The header must be set by the authenticating proxy in front of the app
+    and stripped from client requests, the app trusts it as it is.
+    """
+    if app.config['OWNER_HEADER']:
+        app.before_request(_load_owner)
@@ -0,0 +1,4 @@
+from app.asgi import AsgiApp
+from todo import app
+
+asgi_app = AsgiApp(app)
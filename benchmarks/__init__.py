@@ -0,0 +1,5 @@
+"""
+Throughput and latency benchmarks of the todo service layer and routes.
+
+Run ``python -m benchmarks --help`` for the commands.
+"""
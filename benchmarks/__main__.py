@@ -0,0 +1,82 @@
+import json
+import sys
+
+import click
+
+from benchmarks import suite
+
+METRICS = ('mean_ms', 'p50_ms', 'p90_ms', 'p99_ms', 'max_ms', 'ops_per_sec')
+
+
+@click.group()
+def cli():
+    """Benchmarks of the todo service layer and routes."""
+    pass
+
+
+@cli.command()
+@click.option('--size', '-n', default=1000, show_default=True,
+              type=click.IntRange(1, 1000000),
+              help='Number of todos seeded before benchmarking.')
+@click.option('--database', default='memory', show_default=True,
+              type=click.Choice(suite.DATABASES),
+              help='In-memory SQLite or a temporary SQLite file.')
+@click.option('--cache', 'cache_backend', default='memory',
+              show_default=True, type=click.Choice(['memory', 'null']),
+              help='Cache backend, null to measure the database path.')
+@click.option('--iterations', default=200, show_default=True,
+              help='Maximum number of timed calls per benchmark.')
+@click.option('--max-seconds', default=10.0, show_default=True,
+              help='Time budget of each benchmark.')
+@click.option('--only', multiple=True,
+              help='Run only the named benchmark, can be repeated.')
+@click.option('--output', '-o', default='-', type=click.Path(dir_okay=False),
+              help='File to write the JSON results to, standard output by '
+              'default.')
+def run(size, database, cache_backend, iterations, max_seconds, only,
+        output):
+    """Seed a fresh database and benchmark it, writing JSON results."""
+    results = suite.run(size, database, cache_backend, iterations,
+                        max_seconds, only)
+    for name, result in results['results'].items():
+        click.echo(f"{name:<20} p50 {result['p50_ms']:9.3f} ms  "
+                   f"p99 {result['p99_ms']:9.3f} ms  "
+                   f"{result['ops_per_sec']:10.1f} ops/s", err=True)
+
+    text = json.dumps(results, indent=2) + '\n'
+    if output == '-':
+        click.echo(text, nl=False)
+    else:
+        with open(output, 'w', encoding='utf-8') as file:
+            file.write(text)
+
+
+@cli.command('compare')
+@click.argument('baseline', type=click.File(encoding='utf-8'))
+@click.argument('current', type=click.File(encoding='utf-8'))
+@click.option('--threshold', default=0.2, show_default=True,
+              help='Allowed slowdown, 0.2 being 20%.')
+@click.option('--metric', default='p50_ms', show_default=True,
+              type=click.Choice(METRICS), help='Result value compared.')
+def compare_(baseline, current, threshold, metric):
+    """Fail if CURRENT regressed past the threshold against BASELINE."""
+    baseline, current = json.load(baseline), json.load(current)
+    if baseline['meta']['size'] != current['meta']['size'] or \
+            baseline['meta']['database'] != current['meta']['database']:
+        click.echo('warning: the runs seeded different databases', err=True)
+
+    rows = suite.compare(baseline, current, threshold, metric)
+    for name, before, after, change, regressed in rows:
+        flag = 'REGRESSED' if regressed else 'ok'
+        click.echo(f'{name:<20} {before:12.3f} -> {after:12.3f} '
+                   f'{change:+8.1%}  {flag}')
+
+    regressions = [row[0] for row in rows if row[4]]
+    if regressions:
+        click.echo(f"{len(regressions)} benchmarks regressed past "
+                   f"{threshold:.0%}: {', '.join(regressions)}", err=True)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,245 @@
+import os
+import platform
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import sqlalchemy as sa
+from flask import url_for
+
+from app import create_app, db
+from app.models import ToDo
+from app.services import todo_service
+from config import Config
+
+DATABASES = ('memory', 'file')
+WORDS = ('buy', 'call', 'clean', 'email', 'fix', 'pay', 'read', 'review',
+         'send', 'write', 'milk', 'report', 'car', 'invoice', 'garden',
+         'book', 'doctor', 'bank', 'team', 'plan')
+SEED_CHUNK_SIZE = 10000
+
+
+class BenchmarkConfig(Config):
+    TESTING = True
+    SERVER_NAME = 'localhost.localdomain'
+    WTF_CSRF_ENABLED = False
+    # the benchmarks run in a single process
+    CACHE_LOCAL_TODOS = True
+
+
+def percentile(samples, percent):
+    """
+    Returns the nearest-rank percentile of sorted samples.
+
+    Args:
+        samples (list): The samples, sorted in ascending order.
+        percent (float): The percentile to return, from 0 to 100.
+
+    Returns:
+        float: The smallest sample that at least percent of the samples are
+            lower than or equal to.
+    """
+    rank = max(1, -(-len(samples) * percent // 100))
+    return samples[int(rank) - 1]
+
+
+def summarize(samples, elapsed):
+    """
+    Summarizes the latencies of one benchmark in milliseconds.
+
+    Args:
+        samples (list): The latency of each call in seconds.
+        elapsed (float): The seconds taken by all calls together.
+
+    Returns:
+        dict: The number of samples, the mean, p50, p90, p99 and max
+            latencies in milliseconds and the calls per second.
+    """
+    samples = sorted(sample * 1000 for sample in samples)
+    return {
+        'samples': len(samples),
+        'mean_ms': sum(samples) / len(samples),
+        'p50_ms': percentile(samples, 50),
+        'p90_ms': percentile(samples, 90),
+        'p99_ms': percentile(samples, 99),
+        'max_ms': samples[-1],
+        'ops_per_sec': len(samples) / elapsed if elapsed else 0.0,
+    }
+
+
+def measure(call, iterations, max_seconds, warmup=3):
+    """
+    Times repeated calls of a function.
+
+    Calls stop after iterations calls or once max_seconds have passed,
+    whichever comes first, but at least three calls are always timed.
+
+    Args:
+        call: The function to time, it is passed the number of the call.
+        iterations (int): The maximum number of timed calls.
+        max_seconds (float): The time budget of the timed calls.
+        warmup (int): The number of untimed calls made first.
+
+    Returns:
+        dict: The summary of the timed calls, see summarize.
+    """
+    for number in range(warmup):
+        call(number)
+
+    samples = []
+    started = time.perf_counter()
+    deadline = started + max_seconds
+    for number in range(warmup, warmup + iterations):
+        start = time.perf_counter()
+        call(number)
+        samples.append(time.perf_counter() - start)
+        if len(samples) >= 3 and time.perf_counter() > deadline:
+            break
+    return summarize(samples, time.perf_counter() - started)
+
+
+def seed(size, rng):
+    """Inserts size todos made of random words in chunked Core INSERTs."""
+    table = ToDo.__table__
+    for start in range(0, size, SEED_CHUNK_SIZE):
+        rows = [{'task': ' '.join(rng.choices(WORDS, k=3)),
+                 'description': ' '.join(rng.choices(WORDS, k=8))}
+                for _ in range(min(SEED_CHUNK_SIZE, size - start))]
+        db.session.execute(sa.insert(table), rows)
+        todo_service.bump_revision()
+        db.session.commit()
+
+
+def _service_benchmarks(size, rng):
+    deleted = rng.sample(range(1, size + 1), min(size, 10000))
+    return {
+        'get_all_todos': lambda number: todo_service.get_all_todos(),
+        'get_filtered_todos': lambda number:
+            todo_service.get_filtered_todos(rng.choice(WORDS)),
+        'add_todo': lambda number: todo_service.add_todo(
+            f'bench {number}', 'added by the benchmark'),
+        'edit_todo': lambda number: todo_service.edit_todo(
+            rng.randint(1, size), f'edit {number}', 'edited by benchmark'),
+        'delete_todo': lambda number: todo_service.delete_todo(
+            deleted[number % len(deleted)]),
+    }
+
+
+def _route_benchmarks(client, size, rng):
+    def index(number):
+        client.get(url_for('main.index'))
+
+    def add(number):
+        client.post(url_for('main.add'), data={
+            'task': f'route {number}', 'description': 'added by the route'})
+
+    def edit(number):
+        todo_id = rng.randint(1, size)
+        client.post(url_for('main.edit', todo_id=todo_id), data={
+            'task': f'route edit {number}', 'description': 'edited'})
+
+    return {'route_index': index, 'route_add': add, 'route_edit': edit}
+
+
+def run(size=1000, database='memory', cache_backend='memory',
+        iterations=200, max_seconds=10.0, only=None, random_seed=0):
+    """
+    Seeds a fresh database and benchmarks the todo service and routes.
+
+    The service calls run in a request context, the routes through the
+    Flask test client, against the same database seeded with size todos.
+
+    Args:
+        size (int): The number of todos to seed.
+        database (str): 'memory' for an in-memory SQLite database or 'file'
+            for a SQLite file in a temporary directory.
+        cache_backend (str): The CACHE_BACKEND to benchmark with.
+        iterations (int): The maximum number of timed calls per benchmark.
+        max_seconds (float): The time budget of each benchmark.
+        only (list): The names of the benchmarks to run, all by default.
+        random_seed (int): Seed of the generated todos and arguments.
+
+    Returns:
+        dict: The run settings under 'meta' and the summary of each
+            benchmark under 'results'.
+
+    Raises:
+        ValueError: If database is unknown or size is not positive.
+    """
+    if database not in DATABASES:
+        raise ValueError(f'Unknown database: {database}')
+    if size < 1:
+        raise ValueError('Size must be positive.')
+
+    with tempfile.TemporaryDirectory() as directory:
+        uri = 'sqlite://'
+        if database == 'file':
+            uri = 'sqlite:///' + os.path.join(directory, 'benchmark.db')
+        config = type('Config', (BenchmarkConfig,), {
+            'SQLALCHEMY_DATABASE_URI': uri, 'CACHE_BACKEND': cache_backend})
+        app = create_app(config)
+        rng = random.Random(random_seed)
+
+        results = {}
+        with app.app_context():
+            db.create_all()
+            started = time.perf_counter()
+            seed(size, rng)
+            seed_seconds = time.perf_counter() - started
+
+            client = app.test_client()
+            with app.test_request_context():
+                benchmarks = {**_service_benchmarks(size, rng),
+                              **_route_benchmarks(client, size, rng)}
+                for name, call in benchmarks.items():
+                    if only and name not in only:
+                        continue
+                    results[name] = measure(call, iterations, max_seconds)
+
+            db.session.remove()
+            db.engine.dispose()
+
+    return {
+        'meta': {
+            'size': size,
+            'database': database,
+            'cache_backend': cache_backend,
+            'seed_seconds': seed_seconds,
+            'python': platform.python_version(),
+            'sqlalchemy': sa.__version__,
+            'sqlite': sqlite3.sqlite_version,
+            'created_at': datetime.now(timezone.utc).isoformat(),
+        },
+        'results': results,
+    }
+
+
+def compare(baseline, current, threshold=0.2, metric='p50_ms'):
+    """
+    Compares a run against a stored baseline.
+
+    Args:
+        baseline (dict): The baseline run, as returned by run.
+        current (dict): The run to check.
+        threshold (float): The allowed slowdown, 0.2 allowing the metric to
+            grow by 20%. For ops_per_sec a drop is a slowdown.
+        metric (str): The summary value compared.
+
+    Returns:
+        list: A (name, baseline value, current value, change, regressed)
+            tuple for each benchmark in both runs, change being the
+            relative slowdown.
+    """
+    rows = []
+    for name, result in current['results'].items():
+        if name not in baseline['results']:
+            continue
+        before, after = baseline['results'][name][metric], result[metric]
+        if metric == 'ops_per_sec':
+            change = before / after - 1 if after else float('inf')
+        else:
+            change = after / before - 1 if before else 0.0
+        rows.append((name, before, after, change, change > threshold))
+    return rows
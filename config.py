@@ -7,3 +7,92 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'you-will-never-guess'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         'sqlite:///' + os.path.join(basedir, 'app.db')
+    # pool settings of server databases, see the README for sizing them
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE') or 5)
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW') or 10)
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT') or 30)
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE') or 1800)
+    DB_POOL_PRE_PING = (os.environ.get('DB_POOL_PRE_PING') or 'true') \
+        .lower() in ('1', 'true', 'yes')
+    # read replicas of the database, comma separated
+    SQLALCHEMY_REPLICA_URIS = [
+        uri.strip() for uri in
+        (os.environ.get('DATABASE_REPLICA_URLS') or '').split(',')
+        if uri.strip()]
+    DB_REPLICA_CHECK_INTERVAL = int(
+        os.environ.get('DB_REPLICA_CHECK_INTERVAL') or 10)
+    DB_REPLICA_STICKY_SECONDS = int(
+        os.environ.get('DB_REPLICA_STICKY_SECONDS') or 5)
+    # SQLite tuning profile, see db_pool.sqlite_pragmas
+    SQLITE_TUNING = (os.environ.get('SQLITE_TUNING') or 'true') \
+        .lower() in ('1', 'true', 'yes')
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT') or 5000)
+    SQLITE_CACHE_SIZE_KB = int(
+        os.environ.get('SQLITE_CACHE_SIZE_KB') or 65536)
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE') or 268435456)
+    # group commit of the todo writes, see services/write_queue.py
+    DB_WRITE_QUEUE_ENABLED = (os.environ.get('DB_WRITE_QUEUE_ENABLED') or
+                              'false').lower() in ('1', 'true', 'yes')
+    DB_WRITE_QUEUE_MAX_BATCH = int(
+        os.environ.get('DB_WRITE_QUEUE_MAX_BATCH') or 100)
+    DB_WRITE_QUEUE_SIZE = int(os.environ.get('DB_WRITE_QUEUE_SIZE') or 1000)
+    # write-behind of the todo inserts, see todo_service.add_todo
+    DB_WRITE_BEHIND_ENABLED = (os.environ.get('DB_WRITE_BEHIND_ENABLED') or
+                               'false').lower() in ('1', 'true', 'yes')
+    DB_WRITE_BEHIND_MAX_ITEMS = int(
+        os.environ.get('DB_WRITE_BEHIND_MAX_ITEMS') or 500)
+    DB_WRITE_BEHIND_LINGER_MS = int(
+        os.environ.get('DB_WRITE_BEHIND_LINGER_MS') or 50)
+    DB_WRITE_BEHIND_SIZE = int(
+        os.environ.get('DB_WRITE_BEHIND_SIZE') or 10000)
+    DB_WRITE_BEHIND_ACK = (os.environ.get('DB_WRITE_BEHIND_ACK') or
+                           'false').lower() in ('1', 'true', 'yes')
+    # where `flask assets build` writes the fingerprinted static files
+    ASSETS_FOLDER = os.environ.get('ASSETS_FOLDER') or \
+        os.path.join(basedir, 'app', 'static', 'dist')
+    # compression of the responses, see compression.compress_response
+    COMPRESSION_ENABLED = (os.environ.get('COMPRESSION_ENABLED') or
+                           'true').lower() in ('1', 'true', 'yes')
+    COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE') or 500)
+    COMPRESSION_GZIP_LEVEL = int(
+        os.environ.get('COMPRESSION_GZIP_LEVEL') or 6)
+    COMPRESSION_BROTLI_QUALITY = int(
+        os.environ.get('COMPRESSION_BROTLI_QUALITY') or 4)
+    COMPRESSION_MIMETYPES = [
+        mimetype.strip() for mimetype in (
+            os.environ.get('COMPRESSION_MIMETYPES') or
+            'text/html,text/css,text/plain,text/csv,text/javascript,'
+            'application/javascript,application/json,application/x-ndjson'
+        ).split(',') if mimetype.strip()]
+    # header naming the owner of each request, set by the authenticating
+    # proxy, see tenancy.py; without it every todo has the default owner
+    OWNER_HEADER = os.environ.get('OWNER_HEADER') or None
+    # deleting marks todos as deleted, `flask todos purge` deletes them
+    SOFT_DELETE_ENABLED = (os.environ.get('SOFT_DELETE_ENABLED') or
+                           'false').lower() in ('1', 'true', 'yes')
+    # seconds between polls of `flask jobs worker` when there is no job
+    JOBS_POLL_INTERVAL = float(os.environ.get('JOBS_POLL_INTERVAL') or 1.0)
+    # live updates of the listing, see services/event_service.py; each open
+    # listing holds a stream, which ties up a worker unless served by ASGI
+    EVENTS_ENABLED = (os.environ.get('EVENTS_ENABLED') or
+                      'false').lower() in ('1', 'true', 'yes')
+    EVENTS_POLL_INTERVAL = float(
+        os.environ.get('EVENTS_POLL_INTERVAL') or 0.25)
+    EVENTS_HEARTBEAT = float(os.environ.get('EVENTS_HEARTBEAT') or 15)
+    EVENTS_MAX_DURATION = float(
+        os.environ.get('EVENTS_MAX_DURATION') or 300)
+    EVENTS_MAX_BATCH = int(os.environ.get('EVENTS_MAX_BATCH') or 100)
+    TODOS_PER_PAGE = int(os.environ.get('TODOS_PER_PAGE') or 25)
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND') or 'memory'
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL') or \
+        'redis://localhost:6379/0'
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES') or 1024)
+    CACHE_TTL = int(os.environ.get('CACHE_TTL') or 300)
+    # cache the todos and pages in the memory backend too, only right when
+    # a single process serves and writes the database, see cache_service
+    CACHE_LOCAL_TODOS = (os.environ.get('CACHE_LOCAL_TODOS') or
+                         'false').lower() in ('1', 'true', 'yes')
+    API_MAX_BATCH_SIZE = int(os.environ.get('API_MAX_BATCH_SIZE') or 10000)
+    # Server-Timing headers and /metrics, see app/instrumentation.py
+    INSTRUMENTATION_ENABLED = (os.environ.get('INSTRUMENTATION_ENABLED') or
+                               'false').lower() in ('1', 'true', 'yes')
@@ -0,0 +1,35 @@
+"""add todo event
+
+Revision ID: 268b3ad1e6a0
+Revises: 6b28c3ef2981
+Create Date: 2026-10-18 19:47:28.530504
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '268b3ad1e6a0'
+down_revision = '6b28c3ef2981'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'todo_event',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('owner_id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.VARCHAR(length=16), nullable=False),
+        sa.Column('todo_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_todo_event_owner_id_id', 'todo_event',
+                    ['owner_id', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_todo_event_owner_id_id', table_name='todo_event')
+    op.drop_table('todo_event')
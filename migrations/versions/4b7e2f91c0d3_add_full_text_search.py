@@ -0,0 +1,57 @@
+"""add full text search
+
+Revision ID: 4b7e2f91c0d3
+Revises: cf848ee1606d
+Create Date: 2026-10-18 10:12:41.532107
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4b7e2f91c0d3'
+down_revision = 'cf848ee1606d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute("CREATE VIRTUAL TABLE to_do_fts USING fts5("
+                   "task, description, content='to_do', content_rowid='id')")
+        op.execute("CREATE TRIGGER to_do_fts_ai AFTER INSERT ON to_do BEGIN "
+                   "INSERT INTO to_do_fts(rowid, task, description) "
+                   "VALUES (new.id, new.task, new.description); END")
+        op.execute("CREATE TRIGGER to_do_fts_ad AFTER DELETE ON to_do BEGIN "
+                   "INSERT INTO to_do_fts(to_do_fts, rowid, task, description) "
+                   "VALUES ('delete', old.id, old.task, old.description); END")
+        op.execute("CREATE TRIGGER to_do_fts_au AFTER UPDATE OF task, description "
+                   "ON to_do BEGIN "
+                   "INSERT INTO to_do_fts(to_do_fts, rowid, task, description) "
+                   "VALUES ('delete', old.id, old.task, old.description); "
+                   "INSERT INTO to_do_fts(rowid, task, description) "
+                   "VALUES (new.id, new.task, new.description); END")
+        # index the rows that existed before the triggers
+        op.execute("INSERT INTO to_do_fts(to_do_fts) VALUES ('rebuild')")
+    elif dialect == 'postgresql':
+        op.execute("ALTER TABLE to_do ADD COLUMN search_vector tsvector "
+                   "GENERATED ALWAYS AS ("
+                   "setweight(to_tsvector('simple', coalesce(task, '')), 'A') || "
+                   "setweight(to_tsvector('simple', coalesce(description, '')), 'B')"
+                   ") STORED")
+        op.execute("CREATE INDEX ix_to_do_search_vector ON to_do "
+                   "USING GIN (search_vector)")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS to_do_fts_au")
+        op.execute("DROP TRIGGER IF EXISTS to_do_fts_ad")
+        op.execute("DROP TRIGGER IF EXISTS to_do_fts_ai")
+        op.execute("DROP TABLE IF EXISTS to_do_fts")
+    elif dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_to_do_search_vector")
+        op.execute("ALTER TABLE to_do DROP COLUMN IF EXISTS search_vector")
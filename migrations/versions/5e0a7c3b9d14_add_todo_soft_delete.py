@@ -0,0 +1,41 @@
+"""add todo soft delete
+
+Revision ID: 5e0a7c3b9d14
+Revises: d81f4c2a6b93
+Create Date: 2026-10-18 21:12:43.508127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e0a7c3b9d14'
+down_revision = 'd81f4c2a6b93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # plain ADD COLUMN, a batch table copy would drop the search triggers
+    op.add_column('to_do', sa.Column('deleted_at', sa.DateTime(),
+                                     nullable=True))
+    op.drop_index('ix_to_do_owner_id_id', table_name='to_do')
+    op.create_index('ix_to_do_owner_id_id_live', 'to_do', ['owner_id', 'id'],
+                    unique=False,
+                    sqlite_where=sa.text('deleted_at IS NULL'),
+                    postgresql_where=sa.text('deleted_at IS NULL'))
+    op.create_index('ix_to_do_deleted_at', 'to_do', ['deleted_at'],
+                    unique=False,
+                    sqlite_where=sa.text('deleted_at IS NOT NULL'),
+                    postgresql_where=sa.text('deleted_at IS NOT NULL'))
+
+
+def downgrade():
+    # the tombstones would come back to life without the column
+    op.execute('DELETE FROM to_do WHERE deleted_at IS NOT NULL')
+    op.drop_index('ix_to_do_deleted_at', table_name='to_do')
+    op.drop_index('ix_to_do_owner_id_id_live', table_name='to_do')
+    op.create_index('ix_to_do_owner_id_id', 'to_do', ['owner_id', 'id'],
+                    unique=False)
+    op.drop_column('to_do', 'deleted_at')
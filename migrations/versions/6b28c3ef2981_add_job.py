@@ -0,0 +1,40 @@
+"""add job
+
+Revision ID: 6b28c3ef2981
+Revises: 5e0a7c3b9d14
+Create Date: 2026-10-18 19:40:46.521897
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6b28c3ef2981'
+down_revision = '5e0a7c3b9d14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'job',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('owner_id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.VARCHAR(length=64), nullable=False),
+        sa.Column('args', sa.JSON(), nullable=False),
+        sa.Column('status', sa.VARCHAR(length=16), nullable=False),
+        sa.Column('result', sa.JSON(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_job_status_id', 'job', ['status', 'id'],
+                    unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_job_status_id', table_name='job')
+    op.drop_table('job')
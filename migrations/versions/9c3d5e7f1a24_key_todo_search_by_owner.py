@@ -0,0 +1,71 @@
+"""key todo search by owner
+
+Revision ID: 9c3d5e7f1a24
+Revises: 268b3ad1e6a0
+Create Date: 2026-10-18 21:04:55.218390
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c3d5e7f1a24'
+down_revision = '268b3ad1e6a0'
+branch_labels = None
+depends_on = None
+
+
+def _create_sqlite_search(columns):
+    values = ', '.join(f'new.{column}' for column in columns)
+    old_values = ', '.join(f'old.{column}' for column in columns)
+    names = ', '.join(columns)
+    op.execute(f"CREATE VIRTUAL TABLE to_do_fts USING fts5({names}, "
+               "content='to_do', content_rowid='id')")
+    op.execute("CREATE TRIGGER to_do_fts_ai AFTER INSERT ON to_do BEGIN "
+               f"INSERT INTO to_do_fts(rowid, {names}) "
+               f"VALUES (new.id, {values}); END")
+    op.execute("CREATE TRIGGER to_do_fts_ad AFTER DELETE ON to_do BEGIN "
+               f"INSERT INTO to_do_fts(to_do_fts, rowid, {names}) "
+               f"VALUES ('delete', old.id, {old_values}); END")
+    op.execute(f"CREATE TRIGGER to_do_fts_au AFTER UPDATE OF {names} "
+               "ON to_do BEGIN "
+               f"INSERT INTO to_do_fts(to_do_fts, rowid, {names}) "
+               f"VALUES ('delete', old.id, {old_values}); "
+               f"INSERT INTO to_do_fts(rowid, {names}) "
+               f"VALUES (new.id, {values}); END")
+    op.execute("INSERT INTO to_do_fts(to_do_fts) VALUES ('rebuild')")
+
+
+def _drop_sqlite_search():
+    op.execute("DROP TRIGGER IF EXISTS to_do_fts_au")
+    op.execute("DROP TRIGGER IF EXISTS to_do_fts_ad")
+    op.execute("DROP TRIGGER IF EXISTS to_do_fts_ai")
+    op.execute("DROP TABLE IF EXISTS to_do_fts")
+
+
+def upgrade():
+    # no query looks todos up by task
+    op.drop_index('ix_to_do_owner_id_task', table_name='to_do')
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        _drop_sqlite_search()
+        _create_sqlite_search(['task', 'description', 'owner_id'])
+    elif dialect == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS btree_gin")
+        op.execute("CREATE INDEX ix_to_do_owner_id_search_vector ON to_do "
+                   "USING GIN (owner_id, search_vector)")
+        op.execute("DROP INDEX IF EXISTS ix_to_do_search_vector")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        _drop_sqlite_search()
+        _create_sqlite_search(['task', 'description'])
+    elif dialect == 'postgresql':
+        op.execute("CREATE INDEX ix_to_do_search_vector ON to_do "
+                   "USING GIN (search_vector)")
+        op.execute("DROP INDEX IF EXISTS ix_to_do_owner_id_search_vector")
+    op.create_index('ix_to_do_owner_id_task', 'to_do', ['owner_id', 'task'],
+                    unique=False)
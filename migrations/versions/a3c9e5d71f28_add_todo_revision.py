@@ -0,0 +1,38 @@
+"""add todo revision
+
+Revision ID: a3c9e5d71f28
+Revises: 4b7e2f91c0d3
+Create Date: 2026-10-18 14:36:08.274519
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c9e5d71f28'
+down_revision = '4b7e2f91c0d3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # plain ADD COLUMN, a batch table copy would drop the search triggers
+    op.add_column('to_do', sa.Column('updated_at', sa.DateTime(),
+                                     nullable=True))
+    op.execute("UPDATE to_do SET updated_at = CURRENT_TIMESTAMP")
+
+    revision_table = op.create_table(
+        'revision',
+        sa.Column('name', sa.VARCHAR(length=64), nullable=False),
+        sa.Column('value', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+    op.execute(revision_table.insert().values(
+        name='to_do', value=0, updated_at=sa.func.current_timestamp()))
+
+
+def downgrade():
+    op.drop_table('revision')
+    op.drop_column('to_do', 'updated_at')
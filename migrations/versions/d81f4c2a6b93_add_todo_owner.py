@@ -0,0 +1,41 @@
+"""add todo owner
+
+Revision ID: d81f4c2a6b93
+Revises: a3c9e5d71f28
+Create Date: 2026-10-18 20:04:17.630218
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd81f4c2a6b93'
+down_revision = 'a3c9e5d71f28'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # plain ADD COLUMN, a batch table copy would drop the search triggers;
+    # the existing todos go to the default owner
+    op.add_column('to_do', sa.Column('owner_id', sa.Integer(),
+                                     server_default=sa.text('1'),
+                                     nullable=False))
+    op.drop_index('ix_to_do_task', table_name='to_do')
+    op.create_index('ix_to_do_owner_id_id', 'to_do', ['owner_id', 'id'],
+                    unique=False)
+    op.create_index('ix_to_do_owner_id_task', 'to_do', ['owner_id', 'task'],
+                    unique=False)
+    # the table wide revision becomes that of the default owner
+    op.execute("UPDATE revision SET name = 'to_do:1' WHERE name = 'to_do'")
+
+
+def downgrade():
+    op.execute("DELETE FROM revision "
+               "WHERE name LIKE 'to_do:%' AND name <> 'to_do:1'")
+    op.execute("UPDATE revision SET name = 'to_do' WHERE name = 'to_do:1'")
+    op.drop_index('ix_to_do_owner_id_task', table_name='to_do')
+    op.drop_index('ix_to_do_owner_id_id', table_name='to_do')
+    op.create_index('ix_to_do_task', 'to_do', ['task'], unique=False)
+    op.drop_column('to_do', 'owner_id')
@@ -1,13 +1,33 @@
+import asyncio
+import csv
+import gzip
+import importlib.util
+import io
+import json
+import logging
+import os
+import queue
+import tempfile
+import threading
+import time
 import unittest
+from contextlib import contextmanager
 from unittest.mock import patch
 
 import sqlalchemy as sa
 from flask import url_for
 from sqlalchemy.exc import OperationalError, StatementError
 
-from app import create_app, db
-from app.models import ToDo
-from app.services import todo_service
+from app import (assets, cache, compression, create_app, db, db_pool,
+                 db_routing, instrumentation, tenancy)
+from benchmarks import suite as benchmark_suite
+from app.exceptions.exceptions import TodoNotFoundException
+from app.models import ToDo, TodoEvent
+from app.tenancy import DEFAULT_OWNER_ID
+from app.services import (event_service, export_service, fragment_service,
+                          import_service, job_service, todo_service)
+from app.services.cache_service import LRUCache, NullCache, RedisCache
+from app.services.logger_service import BoundedQueueHandler, setup_logger
 from config import Config
 
 
@@ -16,6 +36,31 @@ class TestConfig(Config):
     SQLALCHEMY_DATABASE_URI = 'sqlite://'
     SERVER_NAME = 'localhost.localdomain'
     WTF_CSRF_ENABLED = False
+    # the tests run in a single process
+    CACHE_LOCAL_TODOS = True
+
+
+@contextmanager
+def count_selects(engine):
+    """Collects the SELECT statements executed on the engine."""
+    selects = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith('SELECT'):
+            selects.append(statement)
+
+    sa.event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield selects
+    finally:
+        sa.event.remove(engine, 'before_cursor_execute',
+                        before_cursor_execute)
+
+
+def logged_message(mock_log):
+    """Formats the message of the last call to a mocked log method."""
+    args = mock_log.call_args.args
+    return args[0] % args[1:]
 
 
 class ToDoModelCase(unittest.TestCase):
@@ -133,6 +178,31 @@ class FlaskRoutesTestCase(unittest.TestCase):
         self.assertIn(b'Task 1', response.data)
         self.assertNotIn(b'Task 2', response.data)
 
+    def test_index_runs_one_select(self):
+        db.session.add(ToDo(task='Task 1', description='Description 1'))
+        db.session.commit()
+
+        with count_selects(db.engine) as selects:
+            response = self.app.get(url_for('main.index'))
+
+        self.assertIn(b'Task 1', response.data)
+        # the revision the listing is validated against, then the listing
+        self.assertEqual(len(selects), 2)
+        self.assertIn('FROM revision', selects[0])
+
+    def test_search_post_runs_one_select(self):
+        db.session.add_all([ToDo(task='Task 1', description='Description 1'),
+                            ToDo(task='Task 2', description='Description 2')])
+        db.session.commit()
+
+        with count_selects(db.engine) as selects:
+            response = self.app.post(url_for('main.index'),
+                                     data={'search': 'Task 1'})
+
+        self.assertIn(b'Task 1', response.data)
+        self.assertNotIn(b'Task 2', response.data)
+        self.assertEqual(len(selects), 1)
+
     def test_add_route_post(self):
         response = self.app.post(url_for('main.add'), data={
             'task': "Test Task",
@@ -157,7 +227,7 @@ class FlaskRoutesTestCase(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertNotIn(b'Test Task', response.data)
 
-        deleted_todo = ToDo.query.get(todo.id)
+        deleted_todo = db.session.get(ToDo, todo.id)
         self.assertIsNone(deleted_todo)
 
     def test_edit_post(self):
@@ -173,7 +243,7 @@ class FlaskRoutesTestCase(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertIn(b'New Task', response.data)
 
-        updated_todo = ToDo.query.get(todo.id)
+        updated_todo = db.session.get(ToDo, todo.id)
         self.assertEqual(updated_todo.task, "New Task")
 
 
@@ -200,10 +270,10 @@ class TestToDoService(unittest.TestCase):
         mock_logger.error.assert_not_called()
 
     @patch('app.services.todo_service.logger')
-    @patch('app.models.ToDo.query')
-    def test_get_all_todos_success(self, mock_query, mock_logger):
-        mock_query.all.return_value = [
-            ToDo(task='Test Task', description='Test Description')]
+    @patch('app.db.session.execute')
+    def test_get_all_todos_success(self, mock_execute, mock_logger):
+        mock_execute.return_value.all.return_value = [
+            todo_service.TodoRow(1, 'Test Task', 'Test Description', None)]
         result = todo_service.get_all_todos()
         self.assertEqual(len(result), 1)
         self.assertEqual(result[0].task, 'Test Task')
@@ -222,9 +292,9 @@ class TestToDoService(unittest.TestCase):
 
     @patch('app.services.todo_service.flash')
     @patch('app.services.todo_service.logger')
-    @patch('app.models.ToDo.query')
-    def test_get_all_todos_exception(self, mock_query, mock_logger, mock_flash):
-        mock_query.all.side_effect = Exception('Test exception')
+    @patch('app.db.session.execute')
+    def test_get_all_todos_exception(self, mock_execute, mock_logger, mock_flash):
+        mock_execute.side_effect = Exception('Test exception')
         result = todo_service.get_all_todos()
         self.assertEqual(result, [])
         mock_flash.assert_called_with(
@@ -233,32 +303,36 @@ class TestToDoService(unittest.TestCase):
 
     @patch('app.services.todo_service.flash')
     @patch('app.services.todo_service.logger')
-    @patch('app.db.session.delete')
-    def test_delete_todo(self, mock_delete, mock_logger, mock_flash):
+    def test_delete_todo(self, mock_logger, mock_flash):
         todo = ToDo(task='Test Task', description='Test Description')
         db.session.add(todo)
         db.session.commit()
-        todo_service.delete_todo(todo.id)
+        todo_id = todo.id
 
-        mock_delete.assert_called()
+        with count_selects(db.engine) as selects:
+            todo_service.delete_todo(todo_id)
+
+        self.assertEqual(selects, [])
+        self.assertIsNone(db.session.get(ToDo, todo_id))
         mock_flash.assert_not_called()
-        mock_logger.info.assert_called_with('Deleted to_do: <ToDo Test Task>')
+        self.assertEqual(logged_message(mock_logger.info),
+                         f'Deleted to_do: id={todo_id}')
         mock_logger.error.assert_not_called()
 
     @patch('app.services.todo_service.flash')
     @patch('app.services.todo_service.logger')
-    @patch('app.db.session.delete')
-    def test_delete_todo_fails_when_todo_not_found(self, mock_delete, mock_logger, mock_flash):
+    def test_delete_todo_fails_when_todo_not_found(self, mock_logger, mock_flash):
         todo = ToDo(task='Test Task', description='Test Description')
         db.session.add(todo)
         db.session.commit()
         todo_service.delete_todo(3)
 
-        mock_delete.assert_not_called()
+        self.assertIsNotNone(db.session.get(ToDo, todo.id))
         mock_flash.assert_called_with(
             'Cannot delete a non-existing todo.', 'error')
         mock_logger.info.assert_not_called()
-        mock_logger.error.assert_called_with('Todo item not found: ID 3')
+        self.assertEqual(logged_message(mock_logger.error),
+                         'Todo item not found: ID 3')
 
     @patch('app.services.todo_service.flash')
     @patch('app.services.todo_service.logger')
@@ -268,12 +342,13 @@ class TestToDoService(unittest.TestCase):
         db.session.commit()
         todo_service.edit_todo(todo.id, task='Test Task',
                                description='New Description')
-        updated_todo = ToDo.query.get(todo.id)
+        updated_todo = db.session.get(ToDo, todo.id)
         print("\nupdated" + str(updated_todo))
 
         self.assertEqual(updated_todo.description, 'New Description')
         mock_flash.assert_not_called()
-        mock_logger.info.assert_called_with('Updated to_do: <ToDo Test Task>')
+        self.assertEqual(logged_message(mock_logger.info),
+                         f'Updated to_do: id={todo.id}')
         mock_logger.error.assert_not_called()
 
     @patch('app.services.todo_service.flash')
@@ -284,11 +359,12 @@ class TestToDoService(unittest.TestCase):
         db.session.commit()
         todo_service.edit_todo(todo.id, task='New Task',
                                description='Test Description')
-        updated_todo = ToDo.query.get(todo.id)
+        updated_todo = db.session.get(ToDo, todo.id)
 
         self.assertEqual(updated_todo.task, 'New Task')
         mock_flash.assert_not_called()
-        mock_logger.info.assert_called_with('Updated to_do: <ToDo New Task>')
+        self.assertEqual(logged_message(mock_logger.info),
+                         f'Updated to_do: id={todo.id}')
         mock_logger.error.assert_not_called()
 
     @patch('app.services.todo_service.flash')
@@ -299,13 +375,13 @@ class TestToDoService(unittest.TestCase):
         db.session.commit()
         todo_service.edit_todo(
             todo.id, task='', description='Test Description')
-        updated_todo = ToDo.query.get(todo.id)
+        updated_todo = db.session.get(ToDo, todo.id)
 
         self.assertEqual(updated_todo.task, 'Test Task')
         mock_flash.assert_called_with('Task cannot be empty.', 'error')
         mock_logger.info.assert_not_called()
-        mock_logger.error.assert_called_with(
-            'Error updating to_do: Task cannot be empty.')
+        self.assertEqual(logged_message(mock_logger.error),
+                         'Error updating to_do: Task cannot be empty.')
 
     @patch('app.services.todo_service.flash')
     @patch('app.services.todo_service.logger')
@@ -315,13 +391,14 @@ class TestToDoService(unittest.TestCase):
         db.session.commit()
         todo_service.edit_todo(
             3, task='New Task', description='Test Description')
-        updated_todo = ToDo.query.get(todo.id)
+        updated_todo = db.session.get(ToDo, todo.id)
 
         self.assertEqual(updated_todo.task, 'Test Task')
         mock_flash.assert_called_with(
             'Cannot edit a non-existing todo.', 'error')
         mock_logger.info.assert_not_called()
-        mock_logger.error.assert_called_with('Todo item not found: ID 3')
+        self.assertEqual(logged_message(mock_logger.error),
+                         'Todo item not found: ID 3')
 
     @patch('app.services.todo_service.flash')
     @patch('app.services.todo_service.logger')
@@ -331,14 +408,14 @@ class TestToDoService(unittest.TestCase):
         db.session.commit()
         todo_service.edit_todo(todo.id, task='x' * 33,
                                description='Test Description')
-        updated_todo = ToDo.query.get(todo.id)
+        updated_todo = db.session.get(ToDo, todo.id)
 
         self.assertEqual(updated_todo.task, 'Test Task')
         mock_flash.assert_called_with(
             'Task exceeds maximum length of 32 characters', 'error')
         mock_logger.info.assert_not_called()
-        mock_logger.error.assert_called_with(
-            'Error updating to_do: Task exceeds maximum length of 32 characters')
+        self.assertEqual(logged_message(mock_logger.error),
+                         'Error updating to_do: Task exceeds maximum length of 32 characters')
 
     @patch('app.services.todo_service.flash')
     @patch('app.services.todo_service.logger')
@@ -348,14 +425,14 @@ class TestToDoService(unittest.TestCase):
         db.session.commit()
         todo_service.edit_todo(todo.id, task='Test Task',
                                description='x' * 300)
-        updated_todo = ToDo.query.get(todo.id)
+        updated_todo = db.session.get(ToDo, todo.id)
 
         self.assertEqual(updated_todo.description, 'Test Description')
         mock_flash.assert_called_with(
             'Description exceeds maximum length of 256 characters', 'error')
         mock_logger.info.assert_not_called()
-        mock_logger.error.assert_called_with(
-            'Error updating to_do: Description exceeds maximum length of 256 characters')
+        self.assertEqual(logged_message(mock_logger.error),
+                         'Error updating to_do: Description exceeds maximum length of 256 characters')
 
     def test_get_todo_by_id_(self):
         todo = ToDo(task='Test Task', description='Test Description')
@@ -376,7 +453,8 @@ class TestToDoService(unittest.TestCase):
         result = todo_service.get_todo_by_id(3)
 
         self.assertIsNone(result)
-        mock_logger.error.assert_called_with('Todo item not found: ID 3')
+        self.assertEqual(logged_message(mock_logger.error),
+                         'Todo item not found: ID 3')
         mock_flash.assert_called_with(
             'Cannot get a non-existing todo.', 'error')
 
@@ -388,7 +466,8 @@ class TestToDoService(unittest.TestCase):
 
         result = todo_service.get_filtered_todos('Task')
 
-        self.assertEqual(result, todos)
+        self.assertEqual([(todo.id, todo.task) for todo in result.items],
+                         [(todo.id, todo.task) for todo in todos])
 
     def test_get_filtered_todos_empty_result(self):
         todos = [ToDo(task='Task 1', description='Description 1'),
@@ -398,38 +477,2376 @@ class TestToDoService(unittest.TestCase):
 
         result = todo_service.get_filtered_todos('Task 3')
 
-        self.assertEqual(result, [])
+        self.assertEqual(result.items, [])
 
     @patch('app.services.todo_service.flash')
     @patch('app.services.todo_service.logger')
-    @patch('app.services.todo_service.ToDo.query')
-    def test_get_filtered_todos_catch_operational_error(self, mock_query, mock_logger, mock_flash):
+    @patch('app.services.todo_service.search_service.search_statement')
+    def test_get_filtered_todos_catch_operational_error(self, mock_statement, mock_logger, mock_flash):
         search_query = 'Task'
-        ToDo.query.filter.side_effect = OperationalError(
+        mock_statement.side_effect = OperationalError(
             "any", "any", "any", "any")
 
         result = todo_service.get_filtered_todos(search_query)
 
-        self.assertEqual(result, [])
+        self.assertEqual(result.items, [])
         mock_logger.error.assert_called()
         mock_flash.assert_called_with(
             'A database connection error occurred. Please try again later.', 'error')
 
     @patch('app.services.todo_service.flash')
     @patch('app.services.todo_service.logger')
-    @patch('app.services.todo_service.ToDo.query')
-    def test_get_filtered_todos_catch_statement_error(self, mock_query, mock_logger, mock_flash):
+    @patch('app.services.todo_service.search_service.search_statement')
+    def test_get_filtered_todos_catch_statement_error(self, mock_statement, mock_logger, mock_flash):
         search_query = 'Task'
-        ToDo.query.filter.side_effect = StatementError(
+        mock_statement.side_effect = StatementError(
             "any", "any", "any", "any")
 
         result = todo_service.get_filtered_todos(search_query)
 
-        self.assertEqual(result, [])
+        self.assertEqual(result.items, [])
+        mock_logger.error.assert_called()
+        mock_flash.assert_called_with(
+            'An error occurred while processing your request. Check logs for more information.', 'error')
+
+
+class ToDoPaginationTestCase(unittest.TestCase):
+    """Unit tests for keyset pagination of todos"""
+
+    def setUp(self):
+        app = create_app(TestConfig)
+        self.app = app.test_client()
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        db.session.add_all([ToDo(task=f'Task {i}') for i in range(1, 8)])
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_first_page(self):
+        page = todo_service.get_todos_page(per_page=3)
+
+        self.assertEqual([todo.id for todo in page.items], [1, 2, 3])
+        self.assertEqual(page.next_cursor, 3)
+        self.assertIsNone(page.prev_cursor)
+
+    def test_page_after_cursor(self):
+        page = todo_service.get_todos_page(after=3, per_page=3)
+
+        self.assertEqual([todo.id for todo in page.items], [4, 5, 6])
+        self.assertEqual(page.next_cursor, 6)
+        self.assertEqual(page.prev_cursor, 4)
+
+    def test_last_page(self):
+        page = todo_service.get_todos_page(after=6, per_page=3)
+
+        self.assertEqual([todo.id for todo in page.items], [7])
+        self.assertIsNone(page.next_cursor)
+        self.assertEqual(page.prev_cursor, 7)
+
+    def test_page_before_cursor(self):
+        page = todo_service.get_todos_page(before=4, per_page=2)
+
+        self.assertEqual([todo.id for todo in page.items], [2, 3])
+        self.assertEqual(page.next_cursor, 3)
+        self.assertEqual(page.prev_cursor, 2)
+
+    def test_page_size_defaults_to_config(self):
+        page = todo_service.get_todos_page()
+
+        self.assertEqual(len(page.items), 7)
+        self.assertIsNone(page.next_cursor)
+
+    @patch('app.services.todo_service.flash')
+    @patch('app.services.todo_service.logger')
+    @patch('app.db.session.execute')
+    def test_page_exception(self, mock_execute, mock_logger, mock_flash):
+        mock_execute.side_effect = Exception('Test exception')
+
+        page = todo_service.get_todos_page()
+
+        self.assertEqual(page, ([], None, None))
         mock_logger.error.assert_called()
         mock_flash.assert_called_with(
             'An error occurred while processing your request. Check logs for more information.', 'error')
 
+    def test_index_renders_page_links(self):
+        self.app_context.app.config['TODOS_PER_PAGE'] = 3
+
+        response = self.app.get(url_for('main.index', after=3))
+
+        self.assertIn(b'Task 4', response.data)
+        self.assertNotIn(b'Task 3', response.data)
+        self.assertIn(b'after=6', response.data)
+        self.assertIn(b'before=4', response.data)
+
+
+class ToDoSearchTestCase(unittest.TestCase):
+    """Unit tests for the full-text todo search"""
+
+    def setUp(self):
+        app = create_app(TestConfig)
+        self.app = app.test_client()
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_search_matches_description(self):
+        db.session.add_all([ToDo(task='Groceries', description='buy milk'),
+                            ToDo(task='Laundry', description='whites')])
+        db.session.commit()
+
+        result = todo_service.get_filtered_todos('milk')
+
+        self.assertEqual([todo.task for todo in result.items], ['Groceries'])
+
+    def test_search_matches_word_prefix(self):
+        db.session.add(ToDo(task='Groceries'))
+        db.session.commit()
+
+        result = todo_service.get_filtered_todos('groc')
+
+        self.assertEqual(len(result.items), 1)
+
+    def test_search_ranks_task_above_description(self):
+        db.session.add_all([ToDo(task='Call', description='about milk'),
+                            ToDo(task='Milk', description='semi skimmed')])
+        db.session.commit()
+
+        result = todo_service.get_filtered_todos('milk')
+
+        self.assertEqual([todo.task for todo in result.items],
+                         ['Milk', 'Call'])
+
+    def test_search_is_paged(self):
+        db.session.add_all([ToDo(task=f'Task {i}') for i in range(5)])
+        db.session.commit()
+
+        first = todo_service.get_filtered_todos('task', per_page=2)
+        last = todo_service.get_filtered_todos('task', page=3, per_page=2)
+
+        self.assertEqual(len(first.items), 2)
+        self.assertEqual((first.next_page, first.prev_page), (2, None))
+        self.assertEqual(len(last.items), 1)
+        self.assertEqual((last.next_page, last.prev_page), (None, 2))
+
+    def test_search_index_follows_edits_and_deletes(self):
+        todo = ToDo(task='Old name')
+        db.session.add(todo)
+        db.session.commit()
+
+        todo_service.edit_todo(todo.id, 'New name', None)
+        self.assertEqual(todo_service.get_filtered_todos('old').items, [])
+        self.assertEqual(len(todo_service.get_filtered_todos('new').items), 1)
+
+        todo_service.delete_todo(todo.id)
+        self.assertEqual(todo_service.get_filtered_todos('new').items, [])
+
+    def test_search_without_words_returns_nothing(self):
+        db.session.add(ToDo(task='Task'))
+        db.session.commit()
+
+        result = todo_service.get_filtered_todos('"*')
+
+        self.assertEqual(result.items, [])
+
+    def test_index_search_page_links(self):
+        self.app_context.app.config['TODOS_PER_PAGE'] = 2
+        db.session.add_all([ToDo(task=f'Task {i}') for i in range(3)])
+        db.session.commit()
+
+        response = self.app.get(url_for('main.index', q='task', page=2))
+
+        self.assertIn(b'Task 2', response.data)
+        self.assertNotIn(b'Task 0', response.data)
+        self.assertIn(b'page=1', response.data)
+
+    def test_search_page_below_one_is_the_first(self):
+        db.session.add_all([ToDo(task=f'Task {i}') for i in range(3)])
+        db.session.commit()
+
+        response = self.app.get(url_for('main.index', q='task', page=0))
+        api_response = self.app.get(
+            url_for('api.list_todos', q='task', page=-2, limit=2))
+
+        self.assertIn(b'Task 0', response.data)
+        self.assertEqual([todo['task'] for todo in
+                          api_response.get_json()['todos']],
+                         ['Task 0', 'Task 1'])
+        self.assertIsNone(api_response.get_json()['prev_page'])
+
+
+class LoggerServiceTestCase(unittest.TestCase):
+    """Unit tests for the queued logging pipeline"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.log_file = os.path.join(self.tmp_dir.name, 'test.log')
+        self.logger = setup_logger('test_logger_service', self.log_file)
+        # records go to the queued handler only, not also to handlers of
+        # the root logger, such as those of the test runner, which format
+        # them on the calling thread
+        self.logger.propagate = False
+        self.handler = self.logger.handlers[-1]
+
+    def tearDown(self):
+        self.handler.listener.stop()
+        self.logger.removeHandler(self.handler)
+        self.logger.propagate = True
+        self.tmp_dir.cleanup()
+
+    def test_records_are_written_to_file(self):
+        self.logger.info('Inserted to_do: id=%s', 1)
+        self.handler.listener.stop()
+
+        with open(self.log_file) as log_file:
+            self.assertIn('Inserted to_do: id=1', log_file.read())
+
+    def test_messages_are_formatted_off_the_calling_thread(self):
+        formatted_on = []
+
+        class Arg:
+            def __str__(self):
+                formatted_on.append(threading.current_thread())
+                return 'arg'
+
+        self.logger.info('Formatting %s', Arg())
+        self.handler.listener.stop()
+
+        self.assertTrue(formatted_on)
+        self.assertNotIn(threading.current_thread(), formatted_on)
+
+    def test_setting_up_again_adds_no_handler(self):
+        handlers = list(self.logger.handlers)
+
+        logger = setup_logger('test_logger_service', self.log_file)
+
+        self.assertIs(logger, self.logger)
+        self.assertEqual(logger.handlers, handlers)
+
+    def test_listener_starts_with_the_first_record(self):
+        self.assertIsNone(self.handler.listener._thread)
+
+        self.logger.info('First record')
+
+        self.assertIsNotNone(self.handler.listener._thread)
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'needs os.fork')
+    def test_forked_process_writes_its_records(self):
+        self.logger.info('Before fork')
+
+        pid = os.fork()
+        if pid == 0:
+            try:
+                self.logger.info('In child')
+                self.handler.listener.stop()
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+        self.handler.listener.stop()
+
+        with open(self.log_file) as log_file:
+            content = log_file.read()
+        self.assertIn('Before fork', content)
+        self.assertIn('In child', content)
+
+    def test_records_are_dropped_when_queue_is_full(self):
+        handler = BoundedQueueHandler(queue.Queue(maxsize=1))
+        record = logging.makeLogRecord({'msg': 'test'})
+
+        handler.handle(record)
+        handler.handle(record)
+
+        self.assertEqual(handler.dropped, 1)
+
+
+class FakeRedis:
+    """A dict backed stand-in for the parts of redis.Redis the cache uses"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value.encode()
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def scan_iter(self, match):
+        prefix = match.rstrip('*')
+        return [key.encode() for key in self.data if key.startswith(prefix)]
+
+
+class CacheServiceTestCase(unittest.TestCase):
+    """Unit tests for the cache backends"""
+
+    def test_lru_cache_counts_hits_and_misses(self):
+        lru = LRUCache()
+        lru.set('a', 1)
+
+        lru.get('a')
+        lru.get('b')
+
+        self.assertEqual(lru.stats(),
+                         {'hits': 1, 'misses': 1, 'hit_ratio': 0.5})
+
+    def test_lru_cache_evicts_least_recently_used(self):
+        lru = LRUCache(max_entries=2)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+
+        lru.set('c', 3)
+
+        self.assertEqual(lru.peek('a'), 1)
+        self.assertIsNone(lru.peek('b'))
+        self.assertEqual(lru.peek('c'), 3)
+
+    def test_lru_cache_expires_entries(self):
+        lru = LRUCache(ttl=0)
+        lru.set('a', 1)
+
+        self.assertIsNone(lru.get('a'))
+
+    def test_redis_cache_round_trip(self):
+        redis_cache = RedisCache(FakeRedis())
+        redis_cache.set('todos:page:1', {'rows': [[1, 'Task', None]]})
+        redis_cache.set('todo:1', [1, 'Task', None])
+
+        self.assertEqual(redis_cache.get('todo:1'), [1, 'Task', None])
+        self.assertEqual(redis_cache.keys('todos:'), ['todos:page:1'])
+        redis_cache.clear()
+        self.assertIsNone(redis_cache.get('todo:1'))
+
+    def test_get_many_counts_each_key(self):
+        for backend in (LRUCache(), RedisCache(FakeRedis())):
+            backend.set('a', 1)
+
+            values = backend.get_many(['a', 'b'])
+
+            self.assertEqual(values, [1, None])
+            self.assertEqual(backend.stats()['misses'], 1)
+
+
+class ToDoCacheTestCase(unittest.TestCase):
+    """Unit tests for caching in the ToDo service"""
+
+    def setUp(self):
+        self.flask_app = create_app(TestConfig)
+        self.app_context = self.flask_app.app_context()
+        self.app_context.push()
+        db.create_all()
+        db.session.add_all([ToDo(task=f'Task {i}') for i in range(1, 5)])
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_get_todo_by_id_is_cached(self):
+        todo_service.get_todo_by_id(1)
+        db.session.expunge_all()
+
+        with count_selects(db.engine) as selects:
+            todo = todo_service.get_todo_by_id(1)
+
+        self.assertEqual(todo.task, 'Task 1')
+        # only the revision the entry is keyed by
+        self.assertEqual(len(selects), 1)
+        self.assertIn('FROM revision', selects[0])
+        self.assertEqual(cache.stats()['hits'], 1)
+
+    def test_edit_invalidates_cached_todo(self):
+        todo_service.get_todo_by_id(1)
+        db.session.expunge_all()
+
+        todo_service.edit_todo(1, 'Edited', None)
+
+        self.assertEqual(todo_service.get_todo_by_id(1).task, 'Edited')
+
+    def test_late_fill_is_not_served_after_a_write(self):
+        revision = todo_service.get_cache_revision(1)
+        todo_service.get_todos_page(per_page=2)
+        todo_service.get_todo_by_id(1)
+        page_key = todo_service.page_cache_key(1, revision, None, None, 2)
+        todo_key = todo_service.TODO_CACHE_KEY.format(1, revision, 1)
+        stale_page, stale_todo = cache.peek(page_key), cache.peek(todo_key)
+        db.session.expunge_all()
+
+        todo_service.edit_todo(1, 'Edited', None)
+        # fills read before the write and stored after it
+        cache.set(page_key, stale_page)
+        cache.set(todo_key, stale_todo)
+
+        self.assertEqual(todo_service.get_todos_page(per_page=2).items[0].task,
+                         'Edited')
+        self.assertEqual(todo_service.get_todo_by_id(1).task, 'Edited')
+
+    def test_delete_of_cached_todo(self):
+        todo_service.get_todo_by_id(1)
+        db.session.expunge_all()
+
+        todo_service.delete_todo(1)
+
+        self.assertIsNone(db.session.get(ToDo, 1))
+        self.assertIsNone(todo_service.find_todo(1))
+
+    def test_pages_are_cached(self):
+        todo_service.get_todos_page(per_page=2)
+
+        with count_selects(db.engine) as selects:
+            page = todo_service.get_todos_page(per_page=2)
+
+        self.assertEqual([todo.task for todo in page.items],
+                         ['Task 1', 'Task 2'])
+        self.assertEqual(len(selects), 1)
+        self.assertIn('FROM revision', selects[0])
+
+    def test_writes_do_not_list_cache_keys(self):
+        todo_service.get_todos_page(after=2, per_page=2)
+
+        with patch.object(type(cache.todos), 'keys',
+                          side_effect=AssertionError) as keys:
+            todo_service.edit_todo(3, 'Edited', None)
+            todo_service.bulk_delete_todos([4])
+        page = todo_service.get_todos_page(after=2, per_page=2)
+
+        keys.assert_not_called()
+        self.assertEqual([todo.task for todo in page.items], ['Edited'])
+
+    def test_add_invalidates_last_page(self):
+        todo_service.get_todos_page(per_page=2)
+        todo_service.get_todos_page(after=2, per_page=2)
+
+        todo_service.add_todo('Task 5', None)
+
+        page = todo_service.get_todos_page(after=2, per_page=2)
+        self.assertEqual(page.next_cursor, 4)
+
+    def test_redis_backend(self):
+        backend = RedisCache(FakeRedis())
+        self.flask_app.extensions['cache'] = backend
+        self.flask_app.extensions['todo_cache'] = backend
+
+        todo_service.get_todos_page(per_page=2)
+        todo_service.edit_todo(1, 'Edited', None)
+        page = todo_service.get_todos_page(per_page=2)
+
+        self.assertEqual(page.items[0].task, 'Edited')
+        self.assertEqual(cache.stats()['misses'], 2)
+
+
+class ToDoFragmentCacheTestCase(unittest.TestCase):
+    """Unit tests for the cached fragments of the todo listing"""
+
+    def setUp(self):
+        self.flask_app = create_app(TestConfig)
+        self.app = self.flask_app.test_client()
+        self.app_context = self.flask_app.app_context()
+        self.app_context.push()
+        db.create_all()
+        db.session.add_all([ToDo(task=f'Task {i}') for i in range(1, 4)])
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_rows_are_rendered_from_fragments(self):
+        todos = todo_service.get_todos_page().items
+        first = fragment_service.render_todo_rows(todos)
+
+        with patch.object(self.flask_app.jinja_env, 'get_template') as get:
+            second = fragment_service.render_todo_rows(todos)
+
+        get.assert_not_called()
+        self.assertEqual(first, second)
+        self.assertIn('Task 3', second)
+
+    def test_write_renders_only_the_changed_row(self):
+        fragment_service.render_todo_rows(todo_service.get_todos_page().items)
+
+        todo_service.edit_todo(2, 'Edited', None)
+        todos = todo_service.get_todos_page().items
+        misses = cache.stats()['misses']
+        rows = fragment_service.render_todo_rows(todos)
+
+        self.assertEqual(cache.stats()['misses'] - misses, 1)
+        self.assertIn('Edited', rows)
+        self.assertNotIn('Task 2', rows)
+
+    def test_fragments_are_escaped(self):
+        todo = db.session.get(ToDo, 1)
+        todo.task = '<b>bold</b>'
+        db.session.commit()
+
+        response = self.app.get(url_for('main.index'))
+
+        self.assertIn(b'&lt;b&gt;bold&lt;/b&gt;', response.data)
+
+
+class ToDoApiTestCase(unittest.TestCase):
+    """Integration tests for the JSON API"""
+
+    def setUp(self):
+        app = create_app(TestConfig)
+        self.app = app.test_client()
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_create_and_get_todo(self):
+        response = self.app.post(url_for('api.create_todo'), json={
+            'task': 'Test Task', 'description': 'Test Description'})
+
+        self.assertEqual(response.status_code, 201)
+        todo_id = response.get_json()['id']
+        response = self.app.get(url_for('api.get_todo', todo_id=todo_id))
+        self.assertEqual(response.get_json(), {
+            'id': todo_id, 'task': 'Test Task',
+            'description': 'Test Description'})
+
+    def test_create_todo_fails_validation(self):
+        response = self.app.post(url_for('api.create_todo'),
+                                 json={'task': 'x' * 33})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json()['errors'], [{
+            'index': 0,
+            'error': 'Task exceeds maximum length of 32 characters'}])
+
+    def test_get_missing_todo(self):
+        response = self.app.get(url_for('api.get_todo', todo_id=3))
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_list_todos_is_paged(self):
+        db.session.add_all([ToDo(task=f'Task {i}') for i in range(3)])
+        db.session.commit()
+
+        response = self.app.get(url_for('api.list_todos', limit=2))
+
+        body = response.get_json()
+        self.assertEqual([todo['task'] for todo in body['todos']],
+                         ['Task 0', 'Task 1'])
+        self.assertEqual(body['next_cursor'], 2)
+
+    def test_update_and_delete_todo(self):
+        todo = ToDo(task='Test Task')
+        db.session.add(todo)
+        db.session.commit()
+
+        response = self.app.put(url_for('api.update_todo', todo_id=todo.id),
+                                json={'task': 'New Task'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(db.session.get(ToDo, todo.id).task, 'New Task')
+
+        response = self.app.delete(url_for('api.delete_todo',
+                                           todo_id=todo.id))
+        self.assertEqual(response.status_code, 204)
+        response = self.app.delete(url_for('api.delete_todo',
+                                           todo_id=todo.id))
+        self.assertEqual(response.status_code, 404)
+
+    def test_bulk_create_uses_one_insert(self):
+        statements = []
+        sa.event.listen(db.engine, 'before_cursor_execute',
+                        lambda *args: statements.append(args[2]))
+
+        response = self.app.post(url_for('api.bulk_create_todos'), json={
+            'todos': [{'task': f'Task {i}'} for i in range(100)]})
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.get_json()['ids']), 100)
+        self.assertEqual(
+            len([s for s in statements if s.startswith('INSERT INTO to_do')]),
+            1)
+        self.assertEqual(db.session.scalar(
+            sa.select(sa.func.count()).select_from(ToDo)), 100)
+
+    def test_bulk_create_is_all_or_nothing(self):
+        response = self.app.post(url_for('api.bulk_create_todos'), json={
+            'todos': [{'task': 'Task'}, {'task': ''}]})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json()['errors'],
+                         [{'index': 1, 'error': 'Task cannot be empty.'}])
+        self.assertEqual(ToDo.query.count(), 0)
+
+    def test_bulk_update(self):
+        db.session.add_all([ToDo(task='Task 1'), ToDo(task='Task 2')])
+        db.session.commit()
+
+        response = self.app.put(url_for('api.bulk_update_todos'), json={
+            'todos': [{'id': 1, 'task': 'New 1'},
+                      {'id': 2, 'task': 'New 2', 'description': 'Desc'}]})
+
+        self.assertEqual(response.get_json(), {'updated': 2})
+        db.session.expire_all()
+        self.assertEqual(db.session.get(ToDo, 2).description, 'Desc')
+
+    def test_bulk_update_fails_when_todo_not_found(self):
+        db.session.add(ToDo(task='Task 1'))
+        db.session.commit()
+
+        response = self.app.put(url_for('api.bulk_update_todos'), json={
+            'todos': [{'id': 1, 'task': 'New 1'},
+                      {'id': 5, 'task': 'New 5'}]})
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.get_json()['ids'], [5])
+        db.session.expire_all()
+        self.assertEqual(db.session.get(ToDo, 1).task, 'Task 1')
+
+    def test_bulk_delete(self):
+        db.session.add_all([ToDo(task=f'Task {i}') for i in range(3)])
+        db.session.commit()
+
+        response = self.app.delete(url_for('api.bulk_delete_todos'),
+                                   json={'ids': [1, 3, 7]})
+
+        self.assertEqual(response.get_json(), {'deleted': 2})
+        self.assertEqual(ToDo.query.count(), 1)
+
+    def test_bulk_rejects_oversized_batches(self):
+        self.app_context.app.config['API_MAX_BATCH_SIZE'] = 1
+
+        response = self.app.delete(url_for('api.bulk_delete_todos'),
+                                   json={'ids': [1, 2]})
+
+        self.assertEqual(response.status_code, 413)
+
+
+class ToDoExportTestCase(unittest.TestCase):
+    """Integration tests for exporting todos"""
+
+    def setUp(self):
+        self.flask_app = create_app(TestConfig)
+        self.app = self.flask_app.test_client()
+        self.app_context = self.flask_app.app_context()
+        self.app_context.push()
+        db.create_all()
+        db.session.add_all([ToDo(task='Task 1', description='Description 1'),
+                            ToDo(task='Task, 2')])
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_export_ndjson(self):
+        response = self.app.get(url_for('api.export_todos'))
+
+        self.assertTrue(response.is_streamed)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        lines = response.get_data(as_text=True).splitlines()
+        self.assertEqual([json.loads(line) for line in lines], [
+            {'id': 1, 'task': 'Task 1', 'description': 'Description 1'},
+            {'id': 2, 'task': 'Task, 2', 'description': None}])
+
+    def test_export_csv(self):
+        response = self.app.get(url_for('api.export_todos', format='csv'))
+
+        rows = list(csv.reader(response.get_data(as_text=True).splitlines()))
+        self.assertEqual(rows, [['id', 'task', 'description'],
+                                ['1', 'Task 1', 'Description 1'],
+                                ['2', 'Task, 2', '']])
+
+    def test_export_rejects_unknown_format(self):
+        response = self.app.get(url_for('api.export_todos', format='xml'))
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_export_streams_in_chunks(self):
+        db.session.add_all([ToDo(task=f'Task {i}') for i in range(100)])
+        db.session.commit()
+
+        chunks = list(export_service.export_todos('ndjson', batch_size=10,
+                                                  chunk_size=512))
+
+        self.assertGreater(len(chunks), 2)
+        self.assertEqual(len(''.join(chunks).splitlines()), 102)
+
+    def test_export_command(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output = os.path.join(tmp_dir, 'todos.csv')
+            result = self.flask_app.test_cli_runner().invoke(
+                args=['todos', 'export', '--format', 'csv', '-o', output])
+
+            self.assertEqual(result.exit_code, 0)
+            with open(output) as export_file:
+                self.assertEqual(len(export_file.readlines()), 3)
+
+
+class ToDoImportTestCase(unittest.TestCase):
+    """Integration tests for importing todos"""
+
+    def setUp(self):
+        self.flask_app = create_app(TestConfig)
+        self.app_context = self.flask_app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def write_file(self, name, content):
+        path = os.path.join(self.tmp_dir.name, name)
+        with open(path, 'w', newline='') as import_file:
+            import_file.write(content)
+        return path
+
+    def test_import_ndjson_reports_errors(self):
+        records = import_service.read_records(io.StringIO(
+            '{"task": "Task 1", "description": "Description 1"}\n'
+            '\n'
+            '{"task": ""}\n'
+            'not json\n'
+            '{"task": "Task 2", "description": 3}\n'
+            '{"task": "Task 3"}\n'), 'ndjson')
+
+        result = import_service.import_todos(records, chunk_size=1)
+
+        self.assertEqual((result.imported, result.failed), (2, 3))
+        self.assertEqual(result.errors, [
+            (3, 'Task cannot be empty.'), (4, 'Line is not valid JSON.'),
+            (5, 'Description must be a string.')])
+        self.assertEqual([todo.task for todo in ToDo.query.all()],
+                         ['Task 1', 'Task 3'])
+
+    def test_import_csv_in_chunks(self):
+        records = import_service.read_records(io.StringIO(
+            'id,task,description\n' +
+            ''.join(f'{i},Task {i},\n' for i in range(25)) +
+            '99,' + 'x' * 33 + ',\n'), 'csv')
+        statements = []
+        sa.event.listen(db.engine, 'before_cursor_execute',
+                        lambda *args: statements.append(args[2]))
+
+        result = import_service.import_todos(records, chunk_size=10)
+
+        self.assertEqual((result.imported, result.failed), (25, 1))
+        self.assertEqual(result.errors, [
+            (27, 'Task exceeds maximum length of 32 characters')])
+        self.assertEqual(
+            len([s for s in statements if s.startswith('INSERT INTO to_do')]),
+            3)
+        self.assertIsNone(db.session.get(ToDo, 1).description)
+
+    def test_import_invalidates_cached_last_page(self):
+        todo_service.get_todos_page()
+        records = import_service.read_records(
+            io.StringIO('{"task": "Task 1"}\n'), 'ndjson')
+
+        import_service.import_todos(records)
+
+        self.assertEqual(len(todo_service.get_todos_page().items), 1)
+
+    def test_import_without_returning_keeps_other_entries(self):
+        todo_service.get_todos_page()
+        cache.set('fragment:kept', 'row')
+        records = import_service.read_records(
+            io.StringIO('{"task": "Task 1"}\n'), 'ndjson')
+
+        with patch.object(db.engine.dialect, 'insert_executemany_returning',
+                          False):
+            import_service.import_todos(records)
+
+        self.assertEqual(len(todo_service.get_todos_page().items), 1)
+        self.assertEqual(cache.peek('fragment:kept'), 'row')
+
+    def test_import_command(self):
+        path = self.write_file('todos.csv', 'task,description\nTask 1,\n,\n')
+
+        result = self.flask_app.test_cli_runner().invoke(
+            args=['todos', 'import', path])
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn('Imported 1 todos', result.output)
+        self.assertIn('line 3: Task cannot be empty.', result.output)
+
+
+class ToDoConditionalGetTestCase(unittest.TestCase):
+    """Integration tests for revalidating the todo listing"""
+
+    def setUp(self):
+        self.flask_app = create_app(TestConfig)
+        self.app = self.flask_app.test_client()
+        self.app_context = self.flask_app.app_context()
+        self.app_context.push()
+        db.create_all()
+        todo_service.add_todo('Task 1', None)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_writes_bump_the_revision(self):
+        revision, _ = todo_service.get_revision()
+
+        todo_service.edit_todo(1, 'Edited', None)
+        todo_service.bulk_add_todos([{'task': 'Task 2'}])
+        todo_service.delete_todo(1)
+
+        self.assertEqual(todo_service.get_revision()[0], revision + 3)
+
+    def test_index_sets_validators(self):
+        response = self.app.get(url_for('main.index'))
+
+        self.assertIsNotNone(response.get_etag()[0])
+        self.assertIsNotNone(response.last_modified)
+        self.assertTrue(response.cache_control.no_cache)
+
+    @patch('app.routes.render_template')
+    def test_matching_etag_is_not_modified(self, mock_render):
+        mock_render.return_value = 'listing'
+        etag = self.app.get(url_for('main.index')).get_etag()[0]
+        mock_render.reset_mock()
+
+        with count_selects(db.engine) as selects:
+            response = self.app.get(url_for('main.index'),
+                                    headers={'If-None-Match': f'"{etag}"'})
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.get_etag()[0], etag)
+        # only the revision row is read
+        self.assertEqual(len(selects), 1)
+        self.assertIn('FROM revision', selects[0])
+        mock_render.assert_not_called()
+
+    def test_write_changes_the_etag(self):
+        etag = self.app.get(url_for('main.index')).get_etag()[0]
+
+        todo_service.add_todo('Task 2', None)
+        response = self.app.get(url_for('main.index'),
+                                headers={'If-None-Match': f'"{etag}"'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Task 2', response.data)
+        self.assertNotEqual(response.get_etag()[0], etag)
+
+    def test_etag_depends_on_the_query_string(self):
+        first = self.app.get(url_for('main.index')).get_etag()[0]
+        search = self.app.get(url_for('main.index', q='task')).get_etag()[0]
+
+        self.assertNotEqual(first, search)
+
+    def test_pending_flashes_are_not_revalidated(self):
+        etag = self.app.get(url_for('main.index')).get_etag()[0]
+        with self.app.session_transaction() as session:
+            session['_flashes'] = [('error', 'Flashed')]
+
+        response = self.app.get(url_for('main.index'),
+                                headers={'If-None-Match': f'"{etag}"'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Flashed', response.data)
+        self.assertIsNone(response.get_etag()[0])
+
+    def test_etag_depends_on_the_csrf_token(self):
+        self.flask_app.config['WTF_CSRF_ENABLED'] = True
+        other = self.flask_app.test_client()
+        for client in (self.app, other):
+            client.get(url_for('main.index'))
+
+        first = self.app.get(url_for('main.index')).get_etag()[0]
+        second = other.get(url_for('main.index')).get_etag()[0]
+
+        self.assertNotEqual(first, second)
+
+
+class BenchmarkSuiteTestCase(unittest.TestCase):
+    """Unit tests for the benchmark suite"""
+
+    def test_percentile_uses_nearest_rank(self):
+        samples = list(range(1, 101))
+
+        self.assertEqual(benchmark_suite.percentile(samples, 50), 50)
+        self.assertEqual(benchmark_suite.percentile(samples, 99), 99)
+        self.assertEqual(benchmark_suite.percentile([7], 99), 7)
+
+    def test_run_reports_every_benchmark(self):
+        results = benchmark_suite.run(size=20, iterations=3, max_seconds=1)
+
+        self.assertEqual(results['meta']['size'], 20)
+        self.assertIn('route_index', results['results'])
+        self.assertEqual(results['results']['add_todo']['samples'], 3)
+
+    def test_compare_flags_regressions(self):
+        baseline = {'results': {'a': {'p50_ms': 1.0, 'ops_per_sec': 100},
+                                'b': {'p50_ms': 1.0, 'ops_per_sec': 100}}}
+        current = {'results': {'a': {'p50_ms': 1.1, 'ops_per_sec': 50},
+                               'b': {'p50_ms': 1.5, 'ops_per_sec': 100}}}
+
+        latency = benchmark_suite.compare(baseline, current, threshold=0.2)
+        throughput = benchmark_suite.compare(baseline, current, 0.2,
+                                             'ops_per_sec')
+
+        self.assertEqual([row[4] for row in latency], [False, True])
+        self.assertEqual([row[4] for row in throughput], [True, False])
+
+
+class InstrumentationTestCase(unittest.TestCase):
+    """Integration tests for the request timings and metrics"""
+
+    def setUp(self):
+        config = type('Config', (TestConfig,),
+                      {'INSTRUMENTATION_ENABLED': True})
+        self.flask_app = create_app(config)
+        self.app = self.flask_app.test_client()
+        self.app_context = self.flask_app.app_context()
+        self.app_context.push()
+        db.create_all()
+        db.session.add_all([ToDo(task=f'Task {i}') for i in range(1, 4)])
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_server_timing_counts_queries(self):
+        # the first listing reads the revision and the page
+        response = self.app.get(url_for('main.index'))
+
+        timing = response.headers['Server-Timing']
+        self.assertIn('db;desc="2 queries"', timing)
+        for phase in ('service;dur=', 'render;dur=', 'total;dur='):
+            self.assertIn(phase, timing)
+
+    def test_nested_service_calls_are_timed_once(self):
+        with self.flask_app.test_request_context():
+            self.flask_app.preprocess_request()
+            todo_service.get_todo_by_id(1)
+            timings = instrumentation.current_timings()
+
+        # the revision the cached todo is keyed by, then the todo
+        self.assertEqual(timings.queries, 2)
+        self.assertEqual(timings._depth['service'], 0)
+        self.assertGreater(timings.seconds['service'],
+                           timings.seconds['sql'])
+
+    def test_metrics_are_aggregated_by_endpoint(self):
+        self.app.get(url_for('main.index'))
+        self.app.get(url_for('main.index'))
+
+        response = self.app.get('/metrics')
+        text = response.get_data(as_text=True)
+
+        self.assertTrue(response.mimetype.startswith('text/plain'))
+        self.assertIn('todo_requests_total{endpoint="main.index",'
+                      'method="GET",status="200"} 2', text)
+        self.assertIn('todo_request_queries_bucket{endpoint="main.index",'
+                      'le="2"} 2', text)
+        self.assertIn('todo_cache_hits_total', text)
+
+    def test_instrumentation_is_opt_in(self):
+        app = create_app(TestConfig)
+        client = app.test_client()
+        with app.app_context():
+            db.create_all()
+
+            response = client.get(url_for('main.index'))
+
+            self.assertNotIn('Server-Timing', response.headers)
+            self.assertEqual(client.get('/metrics').status_code, 404)
+            db.session.remove()
+            db.drop_all()
+
+
+@unittest.skipUnless(importlib.util.find_spec('asgiref') and
+                     importlib.util.find_spec('aiosqlite'),
+                     'the ASGI mode needs asgiref and aiosqlite')
+class AsgiTestCase(unittest.TestCase):
+    """Integration tests for the ASGI entry point and async services"""
+
+    def setUp(self):
+        from app.asgi import AsgiApp
+
+        self.directory = tempfile.TemporaryDirectory()
+        uri = 'sqlite:///' + os.path.join(self.directory.name, 'asgi.db')
+        config = type('Config', (TestConfig,),
+                      {'SQLALCHEMY_DATABASE_URI': uri})
+        self.flask_app = create_app(config)
+        self.asgi_app = AsgiApp(self.flask_app)
+        with self.flask_app.app_context():
+            db.create_all()
+            db.session.add_all([ToDo(task=f'Task {i}', description='Note')
+                                for i in range(1, 4)])
+            db.session.commit()
+            db.session.remove()
+
+    def tearDown(self):
+        with self.flask_app.app_context():
+            db.drop_all()
+            db.engine.dispose()
+        asyncio.run(self._dispose())
+        self.directory.cleanup()
+
+    async def _dispose(self):
+        from app.services import async_todo_service
+        await async_todo_service.dispose_engine(self.flask_app)
+
+    async def request(self, method, path, query=b'', body=b'', app=None):
+        messages = [{'type': 'http.request', 'body': body,
+                     'more_body': False}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0) if messages else {
+                'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {'type': 'http', 'asgi': {'version': '3.0'},
+                 'http_version': '1.1', 'method': method, 'scheme': 'http',
+                 'path': path, 'raw_path': path.encode(), 'root_path': '',
+                 'query_string': query, 'server': ('localhost', 80),
+                 'client': ('127.0.0.1', 5000),
+                 'headers': [(b'host', b'localhost.localdomain'),
+                             (b'content-type', b'application/json'),
+                             (b'content-length', str(len(body)).encode())]}
+        await (app or self.asgi_app)(scope, receive, send)
+        body = b''.join(message.get('body', b'') for message in sent
+                        if message['type'] == 'http.response.body')
+        return sent[0]['status'], body
+
+    def test_reads_are_answered_natively(self):
+        with self.flask_app.app_context():
+            expected = self.flask_app.test_client().get(
+                '/api/v1/todos?limit=2').get_json()
+            cache.clear()
+
+        with patch('app.asgi.WsgiToAsgi.__call__') as wsgi:
+            status, body = asyncio.run(
+                self.request('GET', '/api/v1/todos', b'limit=2'))
+
+        wsgi.assert_not_called()
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body), expected)
+
+    def test_get_and_search_todo(self):
+        status, body = asyncio.run(self.request('GET', '/api/v1/todos/2'))
+        missing, _ = asyncio.run(self.request('GET', '/api/v1/todos/9'))
+        _, found = asyncio.run(
+            self.request('GET', '/api/v1/todos', b'q=task+3'))
+
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body)['task'], 'Task 2')
+        self.assertEqual(missing, 404)
+        self.assertEqual([todo['task'] for todo in json.loads(found)['todos']],
+                         ['Task 3'])
+
+    def test_shared_cache_is_called_off_the_event_loop(self):
+        threads = []
+
+        class ThreadRecordingRedis(FakeRedis):
+            def get(self, key):
+                threads.append(threading.get_ident())
+                return super().get(key)
+
+        backend = RedisCache(ThreadRecordingRedis())
+        self.flask_app.extensions['cache'] = backend
+        self.flask_app.extensions['todo_cache'] = backend
+
+        asyncio.run(self.request('GET', '/api/v1/todos/2'))
+        status, body = asyncio.run(self.request('GET', '/api/v1/todos/2'))
+
+        self.assertEqual(json.loads(body)['task'], 'Task 2')
+        self.assertEqual(backend.stats()['hits'], 1)
+        self.assertTrue(threads)
+        self.assertNotIn(threading.get_ident(), threads)
+
+    def test_other_routes_fall_back_to_flask(self):
+        status, body = asyncio.run(self.request(
+            'POST', '/api/v1/todos', body=b'{"task": "Added"}'))
+        _, page = asyncio.run(self.request('GET', '/index'))
+
+        self.assertEqual(status, 201)
+        self.assertEqual(json.loads(body)['task'], 'Added')
+        self.assertIn(b'Added', page)
+
+    def test_slow_requests_are_served_concurrently(self):
+        from app.asgi import AsgiApp
+
+        async def slow(app, args, owner_id):
+            await asyncio.sleep(0.2)
+            return 200, {}
+
+        app = AsgiApp(self.flask_app, {'api.list_todos': slow})
+
+        async def requests():
+            return await asyncio.gather(*[
+                self.request('GET', '/api/v1/todos', app=app)
+                for _ in range(20)])
+
+        started = time.perf_counter()
+        responses = asyncio.run(requests())
+
+        self.assertEqual([status for status, _ in responses], [200] * 20)
+        self.assertLess(time.perf_counter() - started, 1.0)
+
+    def test_events_streamed_natively(self):
+        self.flask_app.config.update(EVENTS_ENABLED=True,
+                                     EVENTS_POLL_INTERVAL=0.01,
+                                     EVENTS_MAX_DURATION=0.2)
+        with self.flask_app.app_context():
+            todo_service.bulk_add_todos([{'task': 'Added'}])
+            db.session.remove()
+        sent = []
+        # a client that stays connected
+        connected = asyncio.Event()
+
+        async def receive():
+            await connected.wait()
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {'type': 'http', 'asgi': {'version': '3.0'},
+                 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+                 'path': '/events', 'raw_path': b'/events', 'root_path': '',
+                 'query_string': b'last_event_id=0',
+                 'server': ('localhost', 80), 'client': ('127.0.0.1', 5000),
+                 'headers': [(b'host', b'localhost.localdomain')]}
+        with patch('app.asgi.WsgiToAsgi.__call__') as wsgi:
+            asyncio.run(self.asgi_app(scope, receive, send))
+
+        wsgi.assert_not_called()
+        self.assertIn((b'content-type', b'text/event-stream; charset=utf-8'),
+                      sent[0]['headers'])
+        body = b''.join(message.get('body', b'') for message in sent[1:])
+        self.assertIn(b'event: added\ndata: {"id": 4}', body)
+        self.assertFalse(sent[-1].get('more_body'))
+
+    def test_event_stream_ends_when_client_leaves(self):
+        self.flask_app.config['EVENTS_ENABLED'] = True
+        started = time.perf_counter()
+
+        status, _ = asyncio.run(self.request('GET', '/events'))
+
+        self.assertEqual(status, 200)
+        self.assertLess(time.perf_counter() - started, 1.0)
+
+
+class DbRoutingTestCase(unittest.TestCase):
+    """Integration tests for routing reads to replicas"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.flask_app = self.create_app('replica.db')
+        self.app = self.flask_app.test_client()
+        self.app_context = self.flask_app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.replica = self.flask_app.extensions['db_replicas'].engines[0]
+        db.metadata.create_all(self.replica)
+        db.session.add(ToDo(task='Primary task'))
+        db.session.commit()
+        with self.replica.begin() as connection:
+            connection.execute(sa.insert(ToDo), [{'task': 'Replica task'}])
+
+    def tearDown(self):
+        db.session.remove()
+        db.engine.dispose()
+        self.replica.dispose()
+        self.app_context.pop()
+        self.directory.cleanup()
+
+    def create_app(self, *replicas, **settings):
+        path = self.directory.name
+        config = type('Config', (TestConfig,), {
+            'SQLALCHEMY_DATABASE_URI':
+                'sqlite:///' + os.path.join(path, 'primary.db'),
+            'SQLALCHEMY_REPLICA_URIS':
+                ['sqlite:///' + os.path.join(path, name)
+                 for name in replicas],
+            'CACHE_BACKEND': 'null', **settings})
+        return create_app(config)
+
+    def test_uncached_pages_go_to_the_replica(self):
+        with self.flask_app.test_request_context():
+            page = todo_service.get_todos_page()
+            self.flask_app.extensions['todo_cache'] = LRUCache()
+            cached_page = todo_service.get_todos_page()
+
+        self.assertEqual([todo.task for todo in page.items],
+                         ['Replica task'])
+        # a lagging replica's rows would stay cached
+        self.assertEqual([todo.task for todo in cached_page.items],
+                         ['Primary task'])
+
+    def test_pages_read_from_the_replica_are_not_revalidated(self):
+        replica_page = self.app.get('/index')
+        self.flask_app.extensions['todo_cache'] = LRUCache()
+        cached_page = self.app.get('/index')
+
+        self.assertIn(b'Replica task', replica_page.data)
+        self.assertIsNone(replica_page.headers.get('ETag'))
+        self.assertIsNone(replica_page.last_modified)
+        self.assertIn(b'Primary task', cached_page.data)
+        self.assertIsNotNone(cached_page.headers.get('ETag'))
+
+    def test_writer_reads_its_queued_writes(self):
+        app = self.create_app('replica.db', DB_WRITE_QUEUE_ENABLED=True)
+        client = app.test_client()
+
+        client.post('/add', data={'task': 'Added task'})
+        own = client.get('/index')
+        other = app.test_client().get('/index')
+        app.extensions['write_queue'].stop()
+
+        self.assertIn(b'Added task', own.data)
+        self.assertNotIn(b'Added task', other.data)
+
+    def test_reads_go_to_the_replica(self):
+        with self.flask_app.test_request_context():
+            results = todo_service.get_filtered_todos('task')
+            todos = todo_service.get_all_todos()
+
+        self.assertEqual([todo.task for todo in results.items],
+                         ['Replica task'])
+        self.assertEqual([todo.task for todo in todos], ['Replica task'])
+
+    def test_writes_go_to_the_primary(self):
+        with self.flask_app.test_request_context():
+            todo_service.add_todo('Added', None)
+
+        self.assertIsNotNone(db.session.scalar(
+            sa.select(ToDo).where(ToDo.task == 'Added')))
+
+    def test_writer_reads_its_writes(self):
+        self.app.post(url_for('main.add'), data={'task': 'Added task'})
+
+        own = self.app.get(url_for('main.index', q='task'))
+        other = self.flask_app.test_client().get(
+            url_for('main.index', q='task'))
+
+        self.assertIn(b'Added task', own.data)
+        self.assertNotIn(b'Added task', other.data)
+        self.assertIn(b'Replica task', other.data)
+
+    def test_unhealthy_replica_falls_back_to_the_primary(self):
+        app = self.create_app(os.path.join('missing', 'replica.db'))
+
+        with app.test_request_context():
+            todos = todo_service.get_all_todos()
+            stats = app.test_client().get(url_for('api.stats')).get_json()
+
+        self.assertEqual([todo.task for todo in todos], ['Primary task'])
+        self.assertEqual(list(stats['replicas'].values()), [False])
+
+    def test_replicas_are_used_round_robin(self):
+        replicas = db_routing.ReplicaSet([db.engine, self.replica])
+
+        chosen = [replicas.choose() for _ in range(4)]
+
+        self.assertEqual(chosen, [db.engine, self.replica,
+                                  db.engine, self.replica])
+
+
+class SqliteTuningTestCase(unittest.TestCase):
+    """Integration tests for the SQLite tuning profile and write queue"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        uri = 'sqlite:///' + os.path.join(self.directory.name, 'tuned.db')
+        config = type('Config', (TestConfig,),
+                      {'SQLALCHEMY_DATABASE_URI': uri,
+                       'DB_WRITE_QUEUE_ENABLED': True})
+        self.flask_app = create_app(config)
+        self.app_context = self.flask_app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.write_queue = self.flask_app.extensions['write_queue']
+
+    def tearDown(self):
+        self.write_queue.stop()
+        db.session.remove()
+        db.drop_all()
+        db.engine.dispose()
+        self.app_context.pop()
+        self.directory.cleanup()
+
+    @contextmanager
+    def count_commits(self):
+        commits = []
+
+        def commit(conn):
+            commits.append(conn)
+
+        sa.event.listen(db.engine, 'commit', commit)
+        try:
+            yield commits
+        finally:
+            sa.event.remove(db.engine, 'commit', commit)
+
+    def submit_all(self, operations):
+        """Submits the operations from threads of their own."""
+        results = [None] * len(operations)
+
+        def submit(index, operation):
+            try:
+                results[index] = self.write_queue.submit(operation,
+                                                         DEFAULT_OWNER_ID)
+            except Exception as e:
+                results[index] = e
+
+        threads = [threading.Thread(target=submit, args=(index, operation))
+                   for index, operation in enumerate(operations)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_pragmas_applied_to_connections(self):
+        with db.engine.connect() as connection:
+            pragma = connection.exec_driver_sql
+
+            self.assertEqual(pragma('PRAGMA journal_mode').scalar(), 'wal')
+            self.assertEqual(pragma('PRAGMA synchronous').scalar(), 1)
+            self.assertEqual(pragma('PRAGMA busy_timeout').scalar(), 5000)
+            self.assertEqual(pragma('PRAGMA cache_size').scalar(), -65536)
+
+    def test_pragmas_off(self):
+        config = {**vars(TestConfig), 'SQLITE_TUNING': False}
+
+        self.assertEqual(db_pool.sqlite_pragmas(config), {})
+
+    def test_write_queue_off_by_default(self):
+        app = create_app(TestConfig)
+
+        self.assertNotIn('write_queue', app.extensions)
+
+    def test_queued_writes_share_a_commit(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def first(owner_id):
+            started.set()
+            release.wait(5)
+            return todo_service._insert_todo(owner_id, 'First', None)
+
+        first_thread = threading.Thread(target=self.write_queue.submit,
+                                        args=(first, DEFAULT_OWNER_ID))
+        first_thread.start()
+        started.wait(5)
+        with self.count_commits() as commits:
+            # queued while the writer waits on the first write
+            submitter = threading.Thread(target=self.submit_all, args=([
+                lambda owner_id, i=i: todo_service._insert_todo(
+                    owner_id, f'Task {i}', None)
+                for i in range(5)],))
+            submitter.start()
+            while self.write_queue._queue.qsize() < 5:
+                time.sleep(0.01)
+            release.set()
+            submitter.join()
+            first_thread.join()
+
+        self.assertEqual(len(commits), 2)
+        self.assertEqual(db.session.scalar(sa.select(sa.func.count(ToDo.id))),
+                         6)
+
+    def test_failing_write_only_fails_itself(self):
+        def fail(owner_id):
+            todo_service._insert_todo(owner_id, 'Failing', None)
+            raise ValueError('Bad write')
+
+        results = self.submit_all([
+            lambda owner_id: todo_service._insert_todo(owner_id, 'Kept',
+                                                       None), fail])
+
+        self.assertIsInstance(results[0], int)
+        self.assertIsInstance(results[1], ValueError)
+        self.assertEqual(db.session.scalars(sa.select(ToDo.task)).all(),
+                         ['Kept'])
+
+    def test_services_write_through_queue(self):
+        with self.flask_app.test_request_context():
+            revision, _ = todo_service.get_revision()
+            todo_service.add_todo('Queued', 'Note')
+            todo_id = db.session.scalar(sa.select(ToDo.id))
+            todo_service.edit_todo(todo_id, 'Edited', 'Note')
+
+            self.assertEqual(todo_service.find_todo(todo_id).task, 'Edited')
+            self.assertEqual(todo_service.get_revision()[0], revision + 2)
+
+            todo_service.delete_todo(todo_id)
+
+            self.assertIsNone(todo_service.find_todo(todo_id))
+
+
+class WriteBehindTestCase(unittest.TestCase):
+    """Integration tests for the write-behind of todo inserts"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.flask_app.extensions['write_behind'].stop()
+        db.session.remove()
+        db.drop_all()
+        db.engine.dispose()
+        self.app_context.pop()
+        self.directory.cleanup()
+
+    def create_app(self, **settings):
+        uri = 'sqlite:///' + os.path.join(self.directory.name, 'behind.db')
+        config = type('Config', (TestConfig,),
+                      {'SQLALCHEMY_DATABASE_URI': uri,
+                       'DB_WRITE_BEHIND_ENABLED': True, **settings})
+        self.flask_app = create_app(config)
+        self.app_context = self.flask_app.app_context()
+        self.app_context.push()
+        db.create_all()
+        return self.flask_app.extensions['write_behind']
+
+    def count(self):
+        return db.session.scalar(sa.select(sa.func.count(ToDo.id)))
+
+    def test_inserts_committed_in_batches(self):
+        write_behind = self.create_app(DB_WRITE_BEHIND_MAX_ITEMS=10)
+        inserts = []
+        sa.event.listen(db.engine, 'before_cursor_execute',
+                        lambda conn, cursor, statement, *args:
+                        inserts.append(statement)
+                        if statement.startswith('INSERT INTO to_do')
+                        else None)
+
+        with self.flask_app.test_request_context():
+            revision, _ = todo_service.get_revision()
+            for number in range(25):
+                todo_service.add_todo(f'Task {number}', None)
+            write_behind.stop()
+
+            self.assertEqual(self.count(), 25)
+            self.assertLessEqual(len(inserts), 3)
+            self.assertGreater(todo_service.get_revision()[0], revision)
+            self.assertEqual(len(todo_service.get_all_todos()), 25)
+
+    def test_full_batch_not_held_for_linger(self):
+        write_behind = self.create_app(DB_WRITE_BEHIND_MAX_ITEMS=3,
+                                       DB_WRITE_BEHIND_LINGER_MS=10000)
+
+        futures = [write_behind.enqueue(todo_service._insert_todo,
+                                        DEFAULT_OWNER_ID, f'Task {number}',
+                                        None)
+                   for number in range(3)]
+
+        self.assertEqual([future.result(timeout=5) for future in futures],
+                         [1, 2, 3])
+
+    def test_acknowledged_insert_is_committed(self):
+        self.create_app(DB_WRITE_BEHIND_ACK=True,
+                        DB_WRITE_BEHIND_LINGER_MS=10000,
+                        DB_WRITE_BEHIND_MAX_ITEMS=1)
+
+        with self.flask_app.test_request_context():
+            todo_service.add_todo('Acknowledged', None)
+
+            self.assertEqual(self.count(), 1)
+
+    @patch('app.services.todo_service.flash')
+    def test_invalid_insert_rejected_before_queueing(self, mock_flash):
+        write_behind = self.create_app()
+
+        with self.flask_app.test_request_context():
+            todo_service.add_todo('x' * 100, None)
+            write_behind.stop()
+
+        mock_flash.assert_called_once()
+        self.assertEqual(self.count(), 0)
+
+
+class AssetsTestCase(unittest.TestCase):
+    """Integration tests for the static asset pipeline"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.output = os.path.join(cls.directory.name, 'dist')
+        cls.config = type('Config', (TestConfig,),
+                          {'ASSETS_FOLDER': cls.output})
+        cls.static_folder = create_app(cls.config).static_folder
+        cls.manifest = assets.build(cls.static_folder, cls.output)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def setUp(self):
+        # the manifest is only read when the app is created
+        self.flask_app = create_app(self.config)
+        self.app = self.flask_app.test_client()
+        self.app_context = self.flask_app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_minify_css(self):
+        css = '/*! kept */\n/* dropped */\n.a > .b ,\n.c {\n  color: red;\n}'
+
+        self.assertEqual(assets.minify_css(css),
+                         '/*! kept */ .a>.b,.c{color:red}')
+
+    def test_build_fingerprints_and_compresses(self):
+        built = self.manifest['style.css']
+        path = os.path.join(self.output, built)
+        with open(path, 'rb') as file:
+            data = file.read()
+        with open(path + '.gz', 'rb') as file:
+            compressed = file.read()
+
+        self.assertRegex(built, r'^style\.[0-9a-f]{12}\.css$')
+        self.assertNotIn(b'\n', data)
+        self.assertEqual(gzip.decompress(compressed), data)
+        self.assertIn('vendor/bootstrap/bootstrap.min.css', self.manifest)
+        with open(os.path.join(self.output, 'manifest.json')) as file:
+            self.assertEqual(json.load(file), self.manifest)
+
+    def test_build_is_reproducible(self):
+        output = os.path.join(self.directory.name, 'rebuilt')
+
+        self.assertEqual(assets.build(self.static_folder, output),
+                         self.manifest)
+
+    def test_rebuild_only_removes_the_previous_build(self):
+        source = os.path.join(self.directory.name, 'source')
+        output = os.path.join(self.directory.name, 'shared')
+        os.makedirs(os.path.join(source, 'css'))
+        os.makedirs(output)
+        kept = os.path.join(output, 'kept.txt')
+        with open(kept, 'w') as file:
+            file.write('not built')
+        with open(os.path.join(source, 'css', 'a.css'), 'w') as file:
+            file.write('.a { color: red; }')
+        first = assets.build(source, output)['css/a.css']
+        with open(os.path.join(source, 'css', 'a.css'), 'w') as file:
+            file.write('.a { color: blue; }')
+
+        second = assets.build(source, output)['css/a.css']
+
+        self.assertNotEqual(first, second)
+        self.assertFalse(os.path.exists(os.path.join(output, first)))
+        self.assertTrue(os.path.isfile(os.path.join(output, second)))
+        self.assertTrue(os.path.isfile(kept))
+
+    def test_build_refuses_to_overwrite_the_sources(self):
+        source = os.path.join(self.directory.name, 'static')
+        os.makedirs(source)
+        with open(os.path.join(source, 'a.css'), 'w') as file:
+            file.write('.a { color: red; }')
+
+        for output in (source, self.directory.name):
+            with self.assertRaises(ValueError):
+                assets.build(source, output)
+        self.assertTrue(os.path.isfile(os.path.join(source, 'a.css')))
+
+    def test_pages_link_built_assets(self):
+        # live.js is only linked with the live updates on
+        self.flask_app.config['EVENTS_ENABLED'] = True
+
+        response = self.app.get(url_for('main.index'))
+        page = response.get_data(as_text=True)
+
+        for built in self.manifest.values():
+            self.assertIn(f'/assets/{built}', page)
+        self.assertNotIn('cdn.jsdelivr.net', page)
+
+    def test_asset_served_immutable_and_precompressed(self):
+        url = url_for('assets.asset', filename=self.manifest['style.css'])
+
+        response = self.app.get(url, headers={'Accept-Encoding': 'gzip'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content_encoding, 'gzip')
+        self.assertEqual(response.mimetype, 'text/css')
+        self.assertIn('Accept-Encoding', response.vary)
+        self.assertTrue(response.cache_control.immutable)
+        self.assertEqual(response.cache_control.max_age,
+                         assets.IMMUTABLE_MAX_AGE)
+        response.close()
+
+        response = self.app.get(url, headers={'Accept-Encoding': 'identity'})
+
+        self.assertIsNone(response.content_encoding)
+        self.assertTrue(response.get_data(as_text=True).startswith('.'))
+        response.close()
+
+    def test_static_files_linked_without_build(self):
+        config = type('Config', (TestConfig,), {
+            'ASSETS_FOLDER': os.path.join(self.directory.name, 'none')})
+
+        with create_app(config).test_request_context():
+            self.assertEqual(assets.asset_url('style.css'),
+                             '/static/style.css')
+
+
+class CompressionTestCase(unittest.TestCase):
+    """Integration tests for the response compression"""
+
+    def setUp(self):
+        self.flask_app = create_app(TestConfig)
+        self.app = self.flask_app.test_client()
+        self.app_context = self.flask_app.app_context()
+        self.app_context.push()
+        db.create_all()
+        db.session.add_all([ToDo(task=f'Task {i}', description='Note ' * 20)
+                            for i in range(1, 51)])
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_html_gzipped(self):
+        plain = self.app.get(url_for('main.index'))
+
+        response = self.app.get(url_for('main.index'),
+                                headers={'Accept-Encoding': 'gzip'})
+
+        self.assertIsNone(plain.content_encoding)
+        self.assertEqual(response.content_encoding, 'gzip')
+        self.assertIn('Accept-Encoding', response.vary)
+        self.assertLess(len(response.data), len(plain.data))
+        self.assertEqual(gzip.decompress(response.data), plain.data)
+
+    @unittest.skipUnless(compression.brotli, 'brotli is not installed')
+    def test_json_prefers_brotli(self):
+        plain = self.app.get(url_for('api.list_todos'))
+
+        response = self.app.get(url_for('api.list_todos'),
+                                headers={'Accept-Encoding': 'gzip, br'})
+
+        self.assertEqual(response.content_encoding, 'br')
+        self.assertEqual(compression.brotli.decompress(response.data),
+                         plain.data)
+
+    def test_streamed_export_compressed_as_generated(self):
+        plain = self.app.get(url_for('api.export_todos', format='csv'))
+
+        response = self.app.get(url_for('api.export_todos', format='csv'),
+                                headers={'Accept-Encoding': 'gzip'})
+
+        self.assertTrue(response.is_streamed)
+        self.assertIsNone(response.content_length)
+        self.assertEqual(response.content_encoding, 'gzip')
+        self.assertEqual(gzip.decompress(response.data), plain.data)
+
+    def test_small_response_left_alone(self):
+        response = self.app.get(url_for('api.get_todo', todo_id=1),
+                                headers={'Accept-Encoding': 'gzip'})
+
+        self.assertIsNone(response.content_encoding)
+        self.assertIn('Accept-Encoding', response.vary)
+
+    def test_other_mimetypes_left_alone(self):
+        self.flask_app.add_url_rule(
+            '/stream', 'stream', lambda: self.flask_app.response_class(
+                iter(['data: x\n\n'] * 100), mimetype='text/event-stream'))
+
+        response = self.app.get('/stream',
+                                headers={'Accept-Encoding': 'gzip'})
+
+        self.assertIsNone(response.content_encoding)
+        self.assertNotIn('Accept-Encoding', response.vary)
+
+    def test_compressed_listing_still_revalidated(self):
+        response = self.app.get(url_for('main.index'),
+                                headers={'Accept-Encoding': 'gzip'})
+        etag, weak = response.get_etag()
+
+        self.assertTrue(weak)
+
+        response = self.app.get(url_for('main.index'), headers={
+            'Accept-Encoding': 'gzip', 'If-None-Match': f'W/"{etag}"'})
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_compression_off(self):
+        config = type('Config', (TestConfig,),
+                      {'COMPRESSION_ENABLED': False})
+        app = create_app(config)
+
+        self.assertNotIn(compression.compress_response,
+                         app.after_request_funcs[None])
+
+
+class TenancyTestCase(unittest.TestCase):
+    """Integration tests for scoping the todos by owner"""
+
+    def setUp(self):
+        config = type('Config', (TestConfig,),
+                      {'OWNER_HEADER': 'X-Owner-Id'})
+        self.flask_app = create_app(config)
+        self.app = self.flask_app.test_client()
+        self.app_context = self.flask_app.app_context()
+        self.app_context.push()
+        db.create_all()
+        db.session.add_all([
+            ToDo(task='Milk', description='Mine'),
+            ToDo(task='Milk', description='Theirs', owner_id=2),
+            ToDo(task='Bread', description='Theirs', owner_id=2)])
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def get(self, path, owner_id):
+        return self.app.get(path, headers={'X-Owner-Id': str(owner_id)})
+
+    def test_listing_only_holds_own_todos(self):
+        mine = self.get(url_for('api.list_todos'), 1).get_json()
+        theirs = self.get(url_for('api.list_todos'), 2).get_json()
+
+        self.assertEqual([todo['id'] for todo in mine['todos']], [1])
+        self.assertEqual([todo['id'] for todo in theirs['todos']], [2, 3])
+
+    def test_missing_header_rejected(self):
+        api = self.app.get(url_for('api.list_todos'))
+        page = self.app.get(url_for('main.index'))
+
+        self.assertEqual((api.status_code, page.status_code), (400, 400))
+        self.assertNotIn(b'Mine', page.data)
+
+    def test_search_only_finds_own_todos(self):
+        response = self.get(url_for('api.list_todos', q='milk'), 2)
+
+        self.assertEqual([todo['description'] for todo in
+                          response.get_json()['todos']], ['Theirs'])
+
+    def test_search_index_is_keyed_by_owner(self):
+        statement = todo_service.search_page_statement(
+            2, 'milk', 1, 10, db.engine.dialect.name)
+
+        match = str(statement.compile(
+            compile_kwargs={'literal_binds': True}))
+        # the owner ID is matched in the index, not as a word of the query
+        self.assertIn('owner_id : "2" AND {task description}', match)
+        response = self.get(url_for('api.list_todos', q='2'), 2)
+        self.assertEqual(response.get_json()['todos'], [])
+
+    def test_other_owners_todo_not_found(self):
+        get = self.get(url_for('api.get_todo', todo_id=2), 1)
+        put = self.app.put(url_for('api.update_todo', todo_id=2),
+                           json={'task': 'Stolen'},
+                           headers={'X-Owner-Id': '1'})
+        delete = self.app.delete(url_for('api.delete_todo', todo_id=2),
+                                 headers={'X-Owner-Id': '1'})
+
+        self.assertEqual((get.status_code, put.status_code,
+                          delete.status_code), (404, 404, 404))
+        todo = db.session.get(ToDo, 2)
+        self.assertEqual((todo.task, todo.owner_id), ('Milk', 2))
+
+    def test_invalid_header_rejected(self):
+        for value in ('abc', '0', '-1'):
+            response = self.get(url_for('api.list_todos'), value)
+
+            self.assertEqual(response.status_code, 400)
+
+    def test_created_todo_belongs_to_owner(self):
+        response = self.app.post(url_for('api.create_todo'),
+                                 json={'task': 'Eggs'},
+                                 headers={'X-Owner-Id': '3'})
+
+        todo = db.session.get(ToDo, response.get_json()['id'])
+        self.assertEqual(todo.owner_id, 3)
+
+    def test_writes_only_change_own_revision(self):
+        first = self.get(url_for('main.index'), 1)
+        second = self.get(url_for('main.index'), 2)
+
+        with tenancy.as_owner(2):
+            todo_service.bulk_add_todos([{'task': 'Eggs'}])
+
+        self.assertNotEqual(first.get_etag(), second.get_etag())
+        self.assertEqual(self.get(url_for('main.index'), 1).get_etag(),
+                         first.get_etag())
+        self.assertNotEqual(self.get(url_for('main.index'),
+                                     2).get_etag(), second.get_etag())
+
+    def test_as_owner(self):
+        with tenancy.as_owner(2):
+            tasks = [todo.task for todo in todo_service.get_all_todos()]
+            self.assertEqual(tenancy.current_owner_id(), 2)
+
+        self.assertEqual(tasks, ['Milk', 'Bread'])
+        self.assertEqual(tenancy.current_owner_id(), DEFAULT_OWNER_ID)
+
+    def test_export_and_import_by_owner(self):
+        runner = self.flask_app.test_cli_runner()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'todos.ndjson')
+            runner.invoke(args=['todos', 'export', '--owner', '2',
+                                '-o', path])
+            result = runner.invoke(args=['todos', 'import', path,
+                                         '--owner', '4'])
+
+        self.assertIn('Imported 2 todos', result.output)
+        with tenancy.as_owner(4):
+            self.assertEqual([todo.task for todo in
+                              todo_service.get_all_todos()],
+                             ['Milk', 'Bread'])
+
+    def test_asgi_reads_owner_header(self):
+        from app.asgi import AsgiApp
+
+        async def owner(app, args, owner_id):
+            return 200, {'owner_id': owner_id}
+
+        app = AsgiApp(self.flask_app, {'api.list_todos': owner})
+
+        def request(headers):
+            sent = []
+
+            async def receive():
+                return {'type': 'http.request', 'body': b'',
+                        'more_body': False}
+
+            async def send(message):
+                sent.append(message)
+
+            asyncio.run(app({
+                'type': 'http', 'asgi': {'version': '3.0'},
+                'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+                'path': '/api/v1/todos', 'raw_path': b'/api/v1/todos',
+                'root_path': '', 'query_string': b'',
+                'server': ('localhost', 80), 'client': ('127.0.0.1', 5000),
+                'headers': [(b'host', b'localhost.localdomain')] + headers},
+                receive, send))
+            body = b''.join(message.get('body', b'') for message in sent
+                            if message['type'] == 'http.response.body')
+            return sent[0]['status'], json.loads(body)
+
+        self.assertEqual(request([(b'x-owner-id', b'7')]),
+                         (200, {'owner_id': 7}))
+        self.assertEqual(request([]), (
+            400, {'error': 'Missing or invalid owner header.'}))
+        self.assertEqual(request([(b'x-owner-id', b'x')])[0], 400)
+
+
+class SoftDeleteTestCase(unittest.TestCase):
+    """Integration tests for soft deleting and purging todos"""
+
+    def setUp(self):
+        config = type('Config', (TestConfig,), {'SOFT_DELETE_ENABLED': True})
+        self.flask_app = create_app(config)
+        self.app = self.flask_app.test_client()
+        self.app_context = self.flask_app.app_context()
+        self.app_context.push()
+        db.create_all()
+        db.session.add_all([ToDo(task=f'Task {i}', description='Milk')
+                            for i in range(1, 6)])
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def deleted_ids(self):
+        return db.session.scalars(sa.select(ToDo.id).where(
+            ToDo.deleted_at.is_not(None)).order_by(ToDo.id)).all()
+
+    def test_delete_leaves_a_hidden_tombstone(self):
+        with self.flask_app.test_request_context():
+            todo_service.get_todo_by_id(2)
+            todo_service.delete_todo(2)
+
+            self.assertEqual(self.deleted_ids(), [2])
+            self.assertIsNone(todo_service.find_todo(2))
+            self.assertEqual([todo.id for todo in
+                              todo_service.get_todos_page().items],
+                             [1, 3, 4, 5])
+            self.assertNotIn(2, [todo.id for todo in
+                                 todo_service.get_filtered_todos(
+                                     'milk').items])
+            self.assertEqual(len(todo_service.get_all_todos()), 4)
+        export = self.app.get(url_for('api.export_todos'))
+        self.assertEqual(len(export.get_data(as_text=True).splitlines()), 4)
+
+    def test_deleted_todo_cannot_be_changed(self):
+        self.app.delete(url_for('api.delete_todo', todo_id=2))
+
+        delete = self.app.delete(url_for('api.delete_todo', todo_id=2))
+        put = self.app.put(url_for('api.update_todo', todo_id=2),
+                           json={'task': 'Back'})
+
+        self.assertEqual((delete.status_code, put.status_code), (404, 404))
+
+    def test_bulk_delete_counts_live_todos(self):
+        self.app.delete(url_for('api.delete_todo', todo_id=1))
+
+        response = self.app.delete(url_for('api.bulk_delete_todos'),
+                                   json={'ids': [1, 2, 3]})
+
+        self.assertEqual(response.get_json(), {'deleted': 2})
+        self.assertEqual(self.deleted_ids(), [1, 2, 3])
+
+    def test_purge_in_batches(self):
+        self.app.delete(url_for('api.bulk_delete_todos'),
+                        json={'ids': [1, 2, 3]})
+        statements = []
+        sa.event.listen(db.engine, 'before_cursor_execute',
+                        lambda *args: statements.append(args[2]))
+
+        purged = todo_service.purge_todos(batch_size=2)
+
+        self.assertEqual(purged, 3)
+        self.assertEqual(
+            len([s for s in statements if s.startswith('DELETE')]), 2)
+        self.assertEqual(db.session.scalars(
+            sa.select(ToDo.id).order_by(ToDo.id)).all(), [4, 5])
+        self.assertEqual(len(todo_service.get_filtered_todos('milk').items),
+                         2)
+
+    def test_purge_keeps_recent_tombstones(self):
+        self.app.delete(url_for('api.delete_todo', todo_id=1))
+
+        self.assertEqual(todo_service.purge_todos(older_than=3600), 0)
+        self.assertEqual(self.deleted_ids(), [1])
+
+    def test_purge_command(self):
+        self.app.delete(url_for('api.delete_todo', todo_id=1))
+
+        result = self.flask_app.test_cli_runner().invoke(
+            args=['todos', 'purge', '--batch-size', '10'])
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn('Purged 1 deleted todos', result.output)
+        self.assertEqual(self.deleted_ids(), [])
+
+    def test_hard_delete_by_default(self):
+        self.flask_app.config['SOFT_DELETE_ENABLED'] = False
+
+        self.app.delete(url_for('api.delete_todo', todo_id=1))
+
+        self.assertIsNone(db.session.get(ToDo, 1))
+
+
+class JobsTestCase(unittest.TestCase):
+    """Integration tests for the background jobs"""
+
+    def setUp(self):
+        self.flask_app = create_app(TestConfig)
+        self.app = self.flask_app.test_client()
+        self.app_context = self.flask_app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def post_async(self, todos):
+        return self.app.post(url_for('api.bulk_create_todos'),
+                             json={'todos': todos},
+                             headers={'Prefer': 'respond-async'})
+
+    def test_bulk_create_queued_as_job(self):
+        response = self.post_async([{'task': 'Task 1'}, {'task': 'Task 2'}])
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.headers['Preference-Applied'],
+                         'respond-async')
+        job = self.app.get(response.headers['Location']).get_json()
+        self.assertEqual((job['name'], job['status']),
+                         ('todos.bulk_add', 'queued'))
+        self.assertEqual(db.session.scalar(
+            sa.select(sa.func.count()).select_from(ToDo)), 0)
+
+    def test_worker_runs_queued_jobs(self):
+        location = self.post_async([{'task': 'Task 1'},
+                                    {'task': 'Task 2'}]).headers['Location']
+
+        result = self.flask_app.test_cli_runner().invoke(
+            args=['jobs', 'worker', '--burst'])
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn('Ran 1 jobs.', result.output)
+        job = self.app.get(location).get_json()
+        self.assertEqual((job['status'], job['result']), ('done', [1, 2]))
+        self.assertIsNotNone(job['finished_at'])
+        self.assertEqual(len(todo_service.get_all_todos()), 2)
+
+    def test_failed_job_records_its_error(self):
+        response = self.app.put(url_for('api.bulk_update_todos'),
+                                json={'todos': [{'id': 9, 'task': 'Edit'}]},
+                                headers={'Prefer': 'respond-async'})
+
+        job_service.work(burst=True)
+
+        job = self.app.get(response.headers['Location']).get_json()
+        self.assertEqual(job['status'], 'failed')
+        self.assertEqual(job['error'], 'Todo item not found: ID [9]')
+
+    def test_job_runs_as_its_owner(self):
+        with tenancy.as_owner(3):
+            job_id = job_service.enqueue('todos.bulk_add',
+                                         [{'task': 'Task 1'}])
+
+        self.assertIsNone(job_service.get_job(job_id))
+        job_service.work(burst=True)
+
+        self.assertEqual(db.session.scalar(sa.select(ToDo.owner_id)), 3)
+        self.assertEqual(
+            self.app.get(url_for('api.get_job', job_id=job_id)).status_code,
+            404)
+
+    def test_job_claimed_once(self):
+        job_service.enqueue('todos.purge')
+
+        job = job_service.claim_job()
+
+        self.assertEqual(job.status, 'running')
+        self.assertIsNone(job_service.claim_job())
+
+    def test_unknown_job_rejected(self):
+        with self.assertRaises(ValueError):
+            job_service.enqueue('todos.unknown')
+
+
+class EventsTestCase(unittest.TestCase):
+    """Integration tests for the live updates of the listing"""
+
+    def setUp(self):
+        config = type('Config', (TestConfig,), {
+            'EVENTS_ENABLED': True, 'EVENTS_POLL_INTERVAL': 0.01,
+            'EVENTS_MAX_DURATION': 0.1, 'EVENTS_MAX_BATCH': 3})
+        self.flask_app = create_app(config)
+        self.app = self.flask_app.test_client()
+        self.app_context = self.flask_app.app_context()
+        self.app_context.push()
+        db.create_all()
+        todo_service.bulk_add_todos([{'task': f'Task {i}'}
+                                     for i in range(1, 4)])
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def events(self):
+        return [tuple(row) for row in db.session.execute(
+            sa.select(TodoEvent.kind, TodoEvent.todo_id)
+            .order_by(TodoEvent.id))]
+
+    def test_writes_record_events(self):
+        with self.flask_app.test_request_context():
+            todo_service.add_todo('Task 4', None)
+            todo_service.edit_todo(1, 'Edited', None)
+            todo_service.delete_todo(2)
+        todo_service.bulk_update_todos([{'id': 3, 'task': 'Edited'}])
+        todo_service.bulk_delete_todos([3, 9])
+
+        self.assertEqual(self.events()[3:], [
+            ('added', 4), ('updated', 1), ('deleted', 2), ('updated', 3),
+            ('deleted', 3)])
+
+    def test_large_batches_record_a_reset(self):
+        todo_service.bulk_add_todos([{'task': 'Task'}] * 4)
+
+        self.assertEqual(self.events()[-1], ('reset', None))
+        self.assertEqual(len(self.events()), 4)
+
+    def test_failed_write_records_nothing(self):
+        with self.assertRaises(TodoNotFoundException):
+            todo_service.bulk_update_todos([{'id': 9, 'task': 'Edited'}])
+
+        self.assertEqual(len(self.events()), 3)
+
+    def test_listing_subscribes_from_its_last_event(self):
+        response = self.app.get(url_for('main.index'))
+
+        html = response.get_data(as_text=True)
+        self.assertIn('data-live-url="/events?last_event_id=3"', html)
+        self.assertIn('data-live-append="true"', html)
+        self.assertIn('<tr data-todo-id="1">', html)
+        self.assertIn('live.js', html)
+
+    def test_stream_resumes_after_last_event_id(self):
+        todo_service.bulk_delete_todos([1])
+
+        response = self.app.get(url_for('main.events'),
+                                headers={'Last-Event-ID': '3'})
+
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        self.assertEqual(response.headers['Cache-Control'], 'no-cache')
+        self.assertEqual(response.get_data(as_text=True),
+                         'retry: 1000\n\n'
+                         'id: 4\nevent: deleted\ndata: {"id": 1}\n\n')
+
+    def test_stream_sends_heartbeats(self):
+        self.flask_app.config['EVENTS_HEARTBEAT'] = 0
+
+        response = self.app.get(url_for('main.events'))
+
+        self.assertIn(event_service.HEARTBEAT, response.get_data(as_text=True))
+
+    def test_pruned_events_make_clients_reset(self):
+        todo_service.bulk_delete_todos([1])
+
+        self.assertEqual(event_service.prune_events(older_than=0), 3)
+        response = self.app.get(url_for('main.events', last_event_id=1))
+
+        self.assertEqual(self.events(), [('deleted', 1)])
+        self.assertIn('id: 4\nevent: reset\n',
+                      response.get_data(as_text=True))
+
+    def test_owner_with_no_events_after_a_prune(self):
+        self.assertEqual(event_service.prune_events(older_than=0), 2)
+
+        stream = ''.join(event_service.stream_events(2, last_event_id=0))
+
+        self.assertEqual(stream, 'retry: 1000\n\n')
+
+    def test_clients_past_the_last_event_never_reset(self):
+        todo_service.bulk_delete_todos([1])
+        db.session.add(TodoEvent(owner_id=2, kind='added', todo_id=4))
+        db.session.commit()
+        event_service.prune_events(older_than=0)
+
+        response = self.app.get(url_for('main.events', last_event_id=4))
+
+        self.assertEqual(self.events(), [('deleted', 1), ('added', 4)])
+        self.assertNotIn('event: reset', response.get_data(as_text=True))
+
+    def test_row_fragment(self):
+        response = self.app.get(url_for('main.todo_row', todo_id=2))
+        missing = self.app.get(url_for('main.todo_row', todo_id=9))
+
+        self.assertIn('<tr data-todo-id="2">', response.get_data(as_text=True))
+        self.assertIn('Task 2', response.get_data(as_text=True))
+        self.assertEqual(missing.status_code, 404)
+
+    def test_events_off_by_default(self):
+        self.assertFalse(Config.EVENTS_ENABLED)
+        self.flask_app.config['EVENTS_ENABLED'] = False
+
+        todo_service.bulk_delete_todos([1])
+        html = self.app.get(url_for('main.index')).get_data(as_text=True)
+
+        self.assertEqual(len(self.events()), 3)
+        self.assertEqual(self.app.get(url_for('main.events')).status_code,
+                         404)
+        self.assertNotIn('data-live-url', html)
+
+
+class ListingRowsTestCase(unittest.TestCase):
+    """Tests for the read-only rows of the listings"""
+
+    def setUp(self):
+        self.flask_app = create_app(TestConfig)
+        self.app = self.flask_app.test_client()
+        self.app_context = self.flask_app.app_context()
+        self.app_context.push()
+        db.create_all()
+        todo_service.bulk_add_todos([
+            {'task': f'Task {i}', 'description': f'Description {i}'}
+            for i in range(1, 4)])
+        db.session.remove()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_listings_do_not_load_todos_into_the_session(self):
+        with self.flask_app.test_request_context():
+            listings = [todo_service.get_all_todos(),
+                        todo_service.get_todos_page().items,
+                        todo_service.get_todos_page().items,
+                        todo_service.get_filtered_todos('Task').items]
+
+            self.assertEqual(len(db.session.identity_map), 0)
+        for todos in listings:
+            self.assertEqual([todo.task for todo in todos],
+                             ['Task 1', 'Task 2', 'Task 3'])
+            self.assertFalse(any(isinstance(todo, ToDo) for todo in todos))
+
+    def test_cached_page_rows_are_slotted(self):
+        with self.flask_app.test_request_context():
+            todo_service.get_todos_page()
+            todo = todo_service.get_todos_page().items[0]
+
+        self.assertIsInstance(todo, todo_service.TodoRow)
+        self.assertFalse(hasattr(todo, '__dict__'))
+        self.assertEqual(todo.description, 'Description 1')
+        self.assertIsNotNone(todo.updated_at)
+
+    def test_listing_rows_are_rendered(self):
+        response = self.app.get(url_for('main.index'))
+
+        self.assertIn(b'Description 2', response.data)
+        self.assertIn(b'data-todo-id="3"', response.data)
+
+
+class SharedDatabaseTestCase(unittest.TestCase):
+    """Tests for two processes serving the same database"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        config = type('Config', (TestConfig,), {
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(
+                self.tmp_dir.name, 'shared.db'),
+            'CACHE_LOCAL_TODOS': False})
+        # each app stands for a process with its own in-memory cache, left
+        # to the rendered rows by default
+        self.writer_app = create_app(config)
+        self.reader_app = create_app(config)
+        self.writer = self.writer_app.test_client()
+        self.reader = self.reader_app.test_client()
+        with self.writer_app.app_context():
+            db.create_all()
+            todo_service.bulk_add_todos([{'task': 'Task 1'}])
+
+    def tearDown(self):
+        for app in (self.writer_app, self.reader_app):
+            with app.app_context():
+                db.session.remove()
+                db.engine.dispose()
+        self.tmp_dir.cleanup()
+
+    def test_write_of_another_process_changes_the_etag(self):
+        etag = self.reader.get('/index').get_etag()[0]
+
+        self.writer.post('/add', data={'task': 'Task 2'})
+        response = self.reader.get('/index',
+                                   headers={'If-None-Match': f'"{etag}"'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.get_etag()[0], etag)
+
+    def test_todos_are_not_cached_per_process_by_default(self):
+        self.reader.get('/index')
+        self.reader.get('/todos/1/row')
+
+        self.writer.post('/edit/1', data={'task': 'Edited'})
+
+        self.assertIn(b'Edited', self.reader.get('/index').data)
+        self.assertIn(b'Edited', self.reader.get('/todos/1/row').data)
+
+    def test_job_run_by_the_worker_is_served(self):
+        etag = self.reader.get('/index').get_etag()[0]
+        self.reader.get('/api/v1/todos')
+        self.reader.put('/api/v1/todos/bulk',
+                        json={'todos': [{'id': 1, 'task': 'Edited'}]},
+                        headers={'Prefer': 'respond-async'})
+
+        # the writer app stands for the `flask jobs worker` process
+        result = self.writer_app.test_cli_runner().invoke(
+            args=['jobs', 'worker', '--burst'])
+        response = self.reader.get('/index',
+                                   headers={'If-None-Match': f'"{etag}"'})
+
+        self.assertIn('Ran 1 jobs.', result.output)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Edited', response.data)
+        self.assertEqual(self.reader.get('/api/v1/todos').get_json()
+                         ['todos'][0]['task'], 'Edited')
+
+    def test_import_of_another_process_is_served(self):
+        path = os.path.join(self.tmp_dir.name, 'todos.ndjson')
+        with open(path, 'w') as file:
+            file.write('{"task": "Imported"}\n')
+        etag = self.reader.get('/index').get_etag()[0]
+
+        result = self.writer_app.test_cli_runner().invoke(
+            args=['todos', 'import', path])
+        response = self.reader.get('/index',
+                                   headers={'If-None-Match': f'"{etag}"'})
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Imported', response.data)
+
+    @patch('app.services.cache_service.create_cache')
+    def test_shared_backend_caches_todos(self, mock_create_cache):
+        mock_create_cache.return_value = RedisCache(FakeRedis())
+        app = create_app(type('Config', (TestConfig,),
+                              {'CACHE_LOCAL_TODOS': False}))
+
+        with app.app_context():
+            self.assertIs(cache.todos, cache.backend)
+        with self.reader_app.app_context():
+            self.assertIsInstance(cache.todos, NullCache)
+
+
+class DbPoolTestCase(unittest.TestCase):
+    """Unit tests for the connection pool settings and stats"""
+
+    def test_engine_options_for_server_databases(self):
+        config = {**vars(Config), 'DB_POOL_SIZE': 2,
+                  'SQLALCHEMY_DATABASE_URI': 'postgresql://db/todo',
+                  'SQLALCHEMY_ENGINE_OPTIONS': {'pool_recycle': 60}}
+
+        options = db_pool.engine_options(config)
+
+        self.assertEqual(options['pool_size'], 2)
+        self.assertEqual(options['pool_recycle'], 60)
+        self.assertTrue(options['pool_pre_ping'])
+
+    def test_engine_options_leave_sqlite_pool_alone(self):
+        options = db_pool.engine_options(vars(TestConfig))
+
+        self.assertEqual(options, {})
+
+    def test_stats_endpoint_counts_checkouts(self):
+        app = create_app(TestConfig)
+        client = app.test_client()
+        with app.app_context():
+            db.create_all()
+
+            client.get(url_for('main.index'))
+            stats = client.get(url_for('api.stats')).get_json()
+
+            self.assertEqual(stats['pool']['pool'], 'StaticPool')
+            self.assertGreaterEqual(stats['pool']['checkout'], 1)
+            self.assertIn('hit_ratio', stats['cache'])
+            db.session.remove()
+            db.drop_all()
+
 
 if __name__ == '__main__':
     unittest.main(verbosity=2)
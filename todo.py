@@ -10,20 +10,17 @@ csp = {
         "'self'"
     ],
     'script-src': [
-        "'self'",
-        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/js/bootstrap.bundle.min.js'
+        "'self'"
     ],
     'style-src': [
-        "'self'",
-        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/css/bootstrap.min.css'
+        "'self'"
     ],
     'img-src': [
         "'self'",
         'data:'
     ],
     'font-src': [
-        "'self'",
-        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/css/bootstrap.min.css'
+        "'self'"
     ],
     'frame-ancestors': [
         "'self'"